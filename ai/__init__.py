@@ -0,0 +1 @@
+import src.config  # noqa: F401  Carga el .env antes de leer la configuración de la IA
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Configuración de la caché de respuestas de IA (variables de entorno)
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() != "false"
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", "3600"))  # Segundos que una respuesta se considera válida
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024"))  # Entradas máximas en memoria
+AI_CACHE_SQLITE_PATH = os.getenv("AI_CACHE_SQLITE_PATH")  # Fichero SQLite opcional que sobrevive a reinicios
+AI_CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("AI_CACHE_SQLITE_MAX_ENTRIES", "100000"))  # Filas máximas en el fichero
+AI_CACHE_SQLITE_PURGE_EVERY = int(os.getenv("AI_CACHE_SQLITE_PURGE_EVERY", "100"))  # Escrituras entre limpiezas
+
+
+def make_cache_key(model, messages, parameters, schema=None):
+    """
+    Calcula la clave de caché como el hash SHA-256 de (modelo, mensajes, parámetros de la respuesta, schema).
+    """
+    schema_repr = None
+    if schema is not None:
+        schema_repr = schema.model_json_schema() if hasattr(schema, "model_json_schema") else repr(schema)
+    payload = json.dumps(
+        {"model": model, "messages": messages, "parameters": parameters, "schema": schema_repr},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AIResponseCache:
+    """
+    Caché de respuestas de IA direccionada por contenido: LRU en memoria con TTL y,
+    opcionalmente, un segundo nivel persistente en un fichero SQLite local.
+    El fichero se limpia al crear la caché y cada purge_every escrituras (purge): se borran las filas
+    caducadas y, si quedan más de sqlite_max_entries, las que caducan antes.
+    Es segura para usar desde varios hilos.
+    """
+
+    def __init__(self, max_entries=AI_CACHE_MAX_ENTRIES, ttl=AI_CACHE_TTL, sqlite_path=None,
+                 sqlite_max_entries=AI_CACHE_SQLITE_MAX_ENTRIES, purge_every=AI_CACHE_SQLITE_PURGE_EVERY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self.sqlite_max_entries = sqlite_max_entries
+        self.purge_every = purge_every
+        self._writes_since_purge = 0
+        self.purged = 0
+        self._entries = OrderedDict()  # clave -> (instante de expiración, respuesta)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        if sqlite_path:
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS ai_response_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._execute("CREATE INDEX IF NOT EXISTS ix_ai_response_cache_expires_at ON ai_response_cache (expires_at)")
+            self.purge()
+
+    def _execute(self, sql, params=()):
+        # Una conexión por operación: sqlite3 no permite compartir conexiones entre hilos
+        conn = sqlite3.connect(self.sqlite_path, timeout=5)
+        try:
+            with conn:
+                cursor = conn.execute(sql, params)
+                return cursor.fetchone() if cursor.description else cursor.rowcount
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Devuelve la respuesta cacheada para key o None si no existe o ha caducado."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+        value = self._get_persistent(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.persistent_hits += 1
+            self._store_in_memory(key, value, now + self.ttl)
+        return value
+
+    def set(self, key, value):
+        """Guarda una respuesta en memoria y, si está configurado, en el fichero SQLite."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store_in_memory(key, value, expires_at)
+            self._writes_since_purge += 1
+            purge = bool(self.sqlite_path) and self._writes_since_purge >= self.purge_every
+            if purge:
+                self._writes_since_purge = 0
+        if self.sqlite_path:
+            self._execute(
+                "INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            if purge:
+                self.purge()
+
+    def purge(self):
+        """
+        Borra del fichero SQLite las filas caducadas y, por encima de sqlite_max_entries, las que caducan
+        antes (las más antiguas, ya que todas tienen el mismo TTL). Devuelve cuántas filas ha borrado.
+        """
+        if not self.sqlite_path:
+            return 0
+        deleted = self._execute("DELETE FROM ai_response_cache WHERE expires_at <= ?", (time.time(),))
+        deleted += self._execute(
+            "DELETE FROM ai_response_cache WHERE key IN "
+            "(SELECT key FROM ai_response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.sqlite_max_entries,),
+        )
+        with self._lock:
+            self.purged += deleted
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.persistent_hits = 0
+        if self.sqlite_path:
+            self._execute("DELETE FROM ai_response_cache")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent_hits": self.persistent_hits,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "persistent": bool(self.sqlite_path),
+                "persistent_purged": self.purged,
+            }
+
+    def _store_in_memory(self, key, value, expires_at):
+        # Debe llamarse con el lock adquirido
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_persistent(self, key, now):
+        if not self.sqlite_path:
+            return None
+        row = self._execute("SELECT value, expires_at FROM ai_response_cache WHERE key = ?", (key,))
+        if row and row[1] > now:
+            return row[0]
+        return None
+
+
+# Instancia compartida por todo el proceso
+ai_response_cache = AIResponseCache(sqlite_path=AI_CACHE_SQLITE_PATH)
@@ -1,11 +1,16 @@
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from dataclasses import dataclass, asdict
+import httpx
 from openai import AzureOpenAI
+from .ia_cache import ai_response_cache, make_cache_key, AI_CACHE_ENABLED
+from .ia_rate_limit import ai_rate_limiter, estimate_tokens
+from .ia_singleflight import ai_single_flight, AI_SINGLEFLIGHT_ENABLED
+from .ia_resilience import ai_caller, classify_error, AIClientUnavailableError, AI_TIMEOUT
+from src.metrics import observe_ai_call, ai_cache_hits, ai_deduplicated
 
 
-# Cargar variables de entorno
-load_dotenv()
-
 # clase Enum para los tipos de respuesta
 class ResponseType:
     TECHNICAL = "technical"
@@ -13,106 +18,247 @@ class ResponseType:
     ANALYTICS = "analytics"
     DEFAULT = "default"
 
-# Configuración de parámetros de OpenAI por defecto
-v_max_tokens = 4096  # Máximo de tokens para la respuesta
-v_temperature = 1.0  # Controla la aleatoriedad de las respuestas
-v_top_p = 1.0  # Controla la diversidad de las respuestas
-v_frecuency_penalty = 0.0  # Penaliza la repetición de palabras
-v_presence_penalty = 0.0  # Penaliza la repetición de temas  
+# Tipos de respuesta deterministas cuyas respuestas se cachean por defecto
+CACHEABLE_RESPONSE_TYPES = {ResponseType.TECHNICAL, ResponseType.ANALYTICS}
+
+# Pool de conexiones HTTP compartido con Azure OpenAI (variables de entorno)
+AI_HTTP_MAX_CONNECTIONS = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "20"))
+AI_HTTP_MAX_KEEPALIVE = int(os.getenv("AI_HTTP_MAX_KEEPALIVE", "10"))
+AI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AI_HTTP_KEEPALIVE_EXPIRY", "60"))
+
+
+@dataclass(frozen=True)
+class AIParameters:
+    """Parámetros de muestreo de una llamada a la IA. Inmutable: cada llamada usa su propio perfil."""
+    max_tokens: int = 4096  # Máximo de tokens para la respuesta
+    temperature: float = 1.0  # Controla la aleatoriedad de las respuestas
+    top_p: float = 1.0  # Controla la diversidad de las respuestas
+    frequency_penalty: float = 0.0  # Penaliza la repetición de palabras
+    presence_penalty: float = 0.0  # Penaliza la repetición de temas
+
+    def as_kwargs(self):
+        return asdict(self)
+
 
 #Configuración de parámetros de IA para diferentes tipos de respuestas
-def set_parameters_to_technical():
-    global v_max_tokens, v_temperature, v_top_p, v_frecuency_penalty, v_presence_penalty
-    """Configura los parámetros de IA para respuestas técnicas."""
-    v_max_tokens = 4096
-    v_temperature = 0.2
-    v_top_p = 0.4
-    v_frecuency_penalty = 0.0
-    v_presence_penalty = 0.0
-
-def set_parameters_to_creative():
-    global v_max_tokens, v_temperature, v_top_p, v_frecuency_penalty, v_presence_penalty
-    """Configura los parámetros de IA para respuestas creativas."""
-    v_max_tokens = 4096
-    v_temperature = 1.5
-    v_top_p = 1.0
-    v_frecuency_penalty = 0.0
-    v_presence_penalty = 1.0
-
-def set_parameters_to_analitycs():  
-    global v_max_tokens, v_temperature, v_top_p, v_frecuency_penalty, v_presence_penalty
-    """Configura los parámetros de IA para respuestas analíticas."""
-    v_max_tokens = 4096
-    v_temperature = 0.5
-    v_top_p = 0.8
-    v_frecuency_penalty = 0.5
-    v_presence_penalty = 0.0
-    
-def set_parameters_to_default():    
-    global v_max_tokens, v_temperature, v_top_p, v_frecuency_penalty, v_presence_penalty
-    """Configura los parámetros de IA a los valores por defecto."""
-    v_max_tokens = 4096
-    v_temperature = 1.0
-    v_top_p = 1.0
-    v_frecuency_penalty = 0.0
-    v_presence_penalty = 0.0      
+RESPONSE_PROFILES = {
+    ResponseType.TECHNICAL: AIParameters(temperature=0.2, top_p=0.4),
+    ResponseType.CREATIVE: AIParameters(temperature=1.5, top_p=1.0, presence_penalty=1.0),
+    ResponseType.ANALYTICS: AIParameters(temperature=0.5, top_p=0.8, frequency_penalty=0.5),
+    ResponseType.DEFAULT: AIParameters(),
+}
+
+
+def get_parameters(response_type):
+    """Devuelve el perfil de parámetros para el tipo de respuesta (DEFAULT si no se reconoce)."""
+    return RESPONSE_PROFILES.get(response_type, RESPONSE_PROFILES[ResponseType.DEFAULT])
 
 
 def create_ai_client():
     """
-    Crea un cliente de OpenAI configurado para Azure.
+    Crea un cliente de OpenAI configurado para Azure, con un pool de conexiones httpx
+    con keep-alive para reutilizar las conexiones TLS entre llamadas. Los reintentos del SDK se
+    desactivan: los gestiona ai_caller (ia_resilience) junto con los plazos y el circuit breaker.
     """
     try:
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=AI_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=AI_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=AI_HTTP_KEEPALIVE_EXPIRY,
+            )
+        )
         client = AzureOpenAI(
         api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        http_client=http_client,
+        timeout=AI_TIMEOUT,
+        max_retries=0,
         )
         return client
     except Exception as e:
         print(f"Error al crear el cliente de OpenAI: {e}")
         return None
 
-def process_message_with_AI(message, context, response_type=ResponseType.DEFAULT, schema=None):
-    client = create_ai_client()
+
+# Cliente compartido por todo el proceso; se crea la primera vez que se necesita
+_ai_client = None
+_ai_client_lock = threading.Lock()
+
+def get_ai_client():
+    """
+    Devuelve el cliente de OpenAI compartido del proceso, creándolo una sola vez.
+    El cliente y su pool httpx son seguros para usarse desde varios hilos.
+    """
+    global _ai_client
+    if _ai_client is None:
+        with _ai_client_lock:
+            if _ai_client is None:
+                _ai_client = create_ai_client()
+    return _ai_client
+
+def reset_ai_client(close=True):
+    """
+    Cierra y descarta el cliente compartido. Útil tras un fork o en tests, para que
+    cada proceso abra su propio pool de conexiones. Tras un fork se usa close=False:
+    los sockets heredados pertenecen al proceso padre y no deben cerrarse desde el hijo.
+    """
+    global _ai_client
+    with _ai_client_lock:
+        if _ai_client is not None and close:
+            _ai_client.close()
+        _ai_client = None
+
+def process_message_with_AI(message, context, response_type=ResponseType.DEFAULT, schema=None, use_cache=None, deadline=None):
+    """
+    Envía el mensaje a Azure OpenAI y devuelve el contenido de la respuesta.
+    use_cache permite forzar (True) o saltarse (False) la caché de respuestas; con None
+    solo se cachean los tipos deterministas de CACHEABLE_RESPONSE_TYPES.
+    deadline son los segundos máximos de la operación con sus reintentos (por defecto AI_DEADLINE).
+    Los fallos se lanzan como AIError (ia_resilience): AITimeoutError, AIRateLimitedError, AICircuitOpenError...
+    Las llamadas concurrentes idénticas (mismo modelo, mensajes, parámetros y schema) se agrupan:
+    solo una llega a Azure y las demás comparten su respuesta (ai_single_flight).
+    """
+    # Perfil de parámetros propio de esta llamada (sin estado global compartido entre hilos)
+    parameters = get_parameters(response_type)
+    model = os.getenv("AZURE_OPENAI_MODEL")
+    messages = context + [{"role": "user", "content": message}]
+
+    if use_cache is None:
+        use_cache = response_type in CACHEABLE_RESPONSE_TYPES
+    cache_key = None
+    if use_cache and AI_CACHE_ENABLED:
+        cache_key = make_cache_key(model, messages, parameters.as_kwargs(), schema)
+        cached = ai_response_cache.get(cache_key)
+        if cached is not None:
+            ai_cache_hits.inc(response_type=response_type)
+            return cached
+
+    def call():
+        return _call_ai(model, messages, parameters, response_type, schema, cache_key, deadline)
+
+    if not AI_SINGLEFLIGHT_ENABLED:
+        return call()
+    # La clave de agrupación es la misma que la de la caché, aunque esta llamada no use la caché
+    flight_key = cache_key or make_cache_key(model, messages, parameters.as_kwargs(), schema)
+    # Entre workers el resultado se comparte a través del nivel SQLite de la caché: solo es posible si la
+    # llamada la usa (sin recheck, ai_single_flight no toma el bloqueo de fichero y agrupa solo en el proceso)
+    recheck = (lambda: ai_response_cache.get(cache_key)) if cache_key and ai_response_cache.sqlite_path else None
+    # Quien espera a la llamada de otro hilo no lo hace más que su propio plazo
+    content, shared = ai_single_flight.do(flight_key, call, recheck=recheck, timeout=deadline or ai_caller.deadline)
+    if shared:
+        ai_deduplicated.inc(response_type=response_type, scope=shared)
+    return content
+
+def _call_ai(model, messages, parameters, response_type, schema=None, cache_key=None, deadline=None):
+    # Llamada real a Azure (la que hace el líder de cada grupo de llamadas idénticas)
+    client = get_ai_client()
     if not client:
-        return "Error al crear el cliente de OpenAI."
+        raise AIClientUnavailableError("Error al crear el cliente de OpenAI.")
 
-    # Switch para seleccionar el método según response_type
-    parameter_setters = {
-        ResponseType.TECHNICAL: set_parameters_to_technical,
-        ResponseType.CREATIVE: set_parameters_to_creative,
-        ResponseType.ANALYTICS: set_parameters_to_analitycs,
-        ResponseType.DEFAULT: set_parameters_to_default
-    }
-    parameter_setters.get(response_type, set_parameters_to_default)()
+    def attempt(timeout):
+        # Cada intento (reintentos y hedging incluidos) respeta la cuota de peticiones y tokens por minuto;
+        # la espera se descuenta del plazo del intento y, si lo agotaría, falla con AIRateLimitedError
+        timeout -= ai_rate_limiter.acquire(estimate_tokens(messages, parameters.max_tokens), timeout)
+        started = time.perf_counter()
+        try:
+            if schema:
+                # Usar el método parse si se pasa un schema
+                response = client.beta.chat.completions.parse(
+                    model=model,
+                    messages=messages,
+                    response_format=schema,
+                    timeout=timeout,
+                    **parameters.as_kwargs()
+                )
+            else:
+                # Usar el método estándar si no hay schema
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    timeout=timeout,
+                    **parameters.as_kwargs()
+                )
+        except Exception as e:
+            observe_ai_call(response_type, started, error=e)
+            raise
+        observe_ai_call(response_type, started, usage=response.usage)
+        return response.choices[0].message.content
 
-    try:
-        if schema:
-            # Usar el método parse si se pasa un schema
-            response = client.beta.chat.completions.parse(
-                model=os.getenv("AZURE_OPENAI_MODEL"),
-                messages=context + [{"role": "user", "content": message}],
-                response_format=schema,
-                max_tokens=v_max_tokens,
-                temperature=v_temperature,
-                top_p=v_top_p,
-                frequency_penalty=v_frecuency_penalty,
-                presence_penalty=v_presence_penalty
-            )
-            return response.choices[0].message.content
-        else:
-            # Usar el método estándar si no hay schema
-            response = client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_MODEL"),
-                messages=context + [{"role": "user", "content": message}],
-                max_tokens=v_max_tokens,
-                temperature=v_temperature,
-                top_p=v_top_p,
-                frequency_penalty=v_frecuency_penalty,
-                presence_penalty=v_presence_penalty
+    content = ai_caller.call(attempt, label=response_type, deadline=deadline)
+    # Solo se cachean las respuestas correctas
+    if cache_key and content is not None:
+        ai_response_cache.set(cache_key, content)
+    return content
+
+def stream_message_with_AI(message, context, response_type=ResponseType.DEFAULT, use_cache=None):
+    """
+    Variante en streaming de process_message_with_AI (sin schema) que usa stream=True.
+    Devuelve un generador con los fragmentos de texto según llegan de Azure; al terminar, la respuesta
+    completa se guarda en la caché si procede. Los errores se lanzan como AIError, igual que en
+    process_message_with_AI.
+    """
+    parameters = get_parameters(response_type)
+    model = os.getenv("AZURE_OPENAI_MODEL")
+    messages = context + [{"role": "user", "content": message}]
+
+    if use_cache is None:
+        use_cache = response_type in CACHEABLE_RESPONSE_TYPES
+    cache_key = None
+    if use_cache and AI_CACHE_ENABLED:
+        cache_key = make_cache_key(model, messages, parameters.as_kwargs())
+        cached = ai_response_cache.get(cache_key)
+        if cached is not None:
+            ai_cache_hits.inc(response_type=response_type)
+            yield cached
+            return
+
+    client = get_ai_client()
+    if not client:
+        raise AIClientUnavailableError("Error al crear el cliente de OpenAI.")
+
+    def attempt(timeout):
+        # Plazos, reintentos y circuit breaker solo cubren la apertura del stream: una vez emitido
+        # un fragmento ya no se puede repetir la llamada. timeout limita también la espera entre fragmentos
+        timeout -= ai_rate_limiter.acquire(estimate_tokens(messages, parameters.max_tokens), timeout)
+        started = time.perf_counter()
+        try:
+            return started, client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True,
+                timeout=timeout,
+                **parameters.as_kwargs()
             )
-            return response.choices[0].message.content
-    except Exception as e:
-        return f"Error al procesar el mensaje con IA: {e}"
+        except Exception as e:
+            observe_ai_call(response_type, started, error=e)
+            raise
 
+    started, stream = ai_caller.call(attempt, label=response_type, hedge=False)
+    usage = None
+    parts = []
+    try:
+        for chunk in stream:
+            # El uso de tokens solo llega en el último chunk si el servicio lo incluye
+            usage = getattr(chunk, "usage", None) or usage
+            # Azure envía primero un chunk sin choices con los resultados del filtro de contenido
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    except GeneratorExit:
+        # El cliente se desconectó (Flask cierra el generador): la llamada queda como cancelada
+        observe_ai_call(response_type, started, usage=usage, cancelled=True)
+        raise
+    except Exception as e:
+        observe_ai_call(response_type, started, error=e)
+        raise classify_error(e) from e
+    finally:
+        # Cierra la respuesta HTTP de Azure: si no, al cortar el stream la conexión sigue recibiendo tokens
+        stream.close()
+    observe_ai_call(response_type, started, usage=usage)
+    if cache_key:
+        ai_response_cache.set(cache_key, "".join(parts))
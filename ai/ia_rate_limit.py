@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+from .ia_resilience import AIThrottledError
+
+
+# Cuota de la implementación de Azure OpenAI (0 = sin límite)
+AI_RATE_LIMIT_RPM = int(os.getenv("AI_RATE_LIMIT_RPM", "0"))  # Peticiones por minuto
+AI_RATE_LIMIT_TPM = int(os.getenv("AI_RATE_LIMIT_TPM", "0"))  # Tokens por minuto
+# Procesos que comparten la cuota: cada worker de gunicorn tiene su propio limitador y se queda con su parte
+# (gunicorn.conf.py fija WEB_CONCURRENCY al número de workers si no viene definido)
+AI_RATE_LIMIT_PROCESSES = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+class TokenBucket:
+    """
+    Token bucket seguro entre hilos que se rellena de forma continua a rate_per_minute.
+    Azure aplica la cuota en ventanas de 10 segundos, así que la ráfaga máxima es 1/6 de la cuota por minuto.
+    """
+
+    def __init__(self, rate_per_minute, burst_seconds=10):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1, timeout=None):
+        """
+        Bloquea hasta poder consumir amount unidades. Devuelve los segundos esperados.
+        Con timeout, si la espera necesaria lo superaría lanza AIThrottledError sin esperar ni consumir nada.
+        """
+        # Una petición mayor que la ráfaga se limita a la capacidad para no bloquear para siempre
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            if timeout is not None and waited + delay >= timeout:
+                raise AIThrottledError("Cuota local de Azure OpenAI agotada: la espera superaría el plazo de la llamada",
+                                         retry_after=delay)
+            time.sleep(delay)
+            waited += delay
+
+    def refund(self, amount=1):
+        """Devuelve amount unidades consumidas por una llamada que finalmente no se hizo."""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+class AIRateLimiter:
+    """
+    Limita las llamadas a la IA según la cuota de peticiones y de tokens por minuto. El limitador es local
+    al proceso, así que la cuota se reparte a partes iguales entre los processes que la comparten.
+    """
+
+    def __init__(self, requests_per_minute=AI_RATE_LIMIT_RPM, tokens_per_minute=AI_RATE_LIMIT_TPM,
+                 processes=AI_RATE_LIMIT_PROCESSES):
+        requests_per_minute /= processes
+        tokens_per_minute /= processes
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self, estimated_tokens, timeout=None):
+        """
+        Espera a que la cuota permita la llamada y devuelve los segundos esperados. timeout son los segundos
+        que quedan de plazo: si la espera lo superaría se lanza AIThrottledError en lugar de bloquear.
+        """
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire(1, timeout)
+        if self.tokens:
+            try:
+                waited += self.tokens.acquire(estimated_tokens, None if timeout is None else timeout - waited)
+            except AIThrottledError:
+                if self.requests:
+                    self.requests.refund(1)
+                raise
+        with self._lock:
+            self.calls += 1
+            if waited:
+                self.throttled += 1
+                self.waited_seconds += waited
+        return waited
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+def estimate_tokens(messages, max_tokens):
+    """
+    Estimación de los tokens que Azure descuenta de la cuota: ~4 caracteres por token del prompt
+    más el max_tokens solicitado para la respuesta.
+    """
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return prompt_chars // 4 + max_tokens
+
+
+# Instancia compartida por todo el proceso
+ai_rate_limiter = AIRateLimiter()
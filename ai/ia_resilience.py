@@ -0,0 +1,263 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from email.utils import parsedate_to_datetime
+
+import openai
+from src.metrics import ai_retries, ai_hedged_requests, ai_circuit_rejections
+
+
+# Plazos, reintentos, peticiones de cobertura (hedging) y circuit breaker de las llamadas a Azure OpenAI
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "60"))  # Segundos máximos de cada intento
+AI_DEADLINE = float(os.getenv("AI_DEADLINE", "120"))  # Segundos máximos de la operación completa (con reintentos)
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "2"))  # Reintentos tras el primer intento
+AI_RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))  # Base del backoff exponencial
+AI_RETRY_MAX_DELAY = float(os.getenv("AI_RETRY_MAX_DELAY", "20"))  # Espera máxima entre intentos
+AI_HEDGE_AFTER = float(os.getenv("AI_HEDGE_AFTER", "0"))  # Segundos sin respuesta tras los que se lanza una segunda petición (0 = sin hedging)
+AI_HEDGE_MAX_WORKERS = int(os.getenv("AI_HEDGE_MAX_WORKERS", "16"))
+AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "5"))  # Fallos seguidos que abren el circuito
+AI_BREAKER_RESET = float(os.getenv("AI_BREAKER_RESET", "30"))  # Segundos con el circuito abierto antes de probar de nuevo
+
+
+class AIError(Exception):
+    """Error de una llamada a la IA. retryable indica si tiene sentido repetirla; retry_after, cuándo (segundos)."""
+    retryable = False
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AIClientUnavailableError(AIError):
+    """No se pudo crear el cliente de Azure OpenAI (configuración ausente o no válida)."""
+
+
+class AITimeoutError(AIError):
+    """La llamada superó su plazo."""
+    retryable = True
+
+
+class AIRateLimitedError(AIError):
+    """Azure rechazó la llamada por cuota (429)."""
+    retryable = True
+
+
+class AIThrottledError(AIRateLimitedError):
+    """La cuota local (ai_rate_limiter) no permite la llamada dentro de su plazo: no llegó a enviarse a Azure."""
+
+
+class AIUpstreamError(AIError):
+    """Error transitorio de Azure (5xx o de conexión)."""
+    retryable = True
+
+
+class AIRequestError(AIError):
+    """Azure rechazó la petición (4xx distinto de 429): repetirla no cambiaría el resultado."""
+
+
+class AICircuitOpenError(AIError):
+    """El circuito está abierto: Azure ha fallado repetidamente y la llamada no se intenta."""
+
+
+def _retry_after_seconds(response):
+    # Azure envía retry-after-ms o Retry-After (segundos o fecha HTTP)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error):
+    """Convierte una excepción del SDK de OpenAI (o de red) en la AIError tipada correspondiente."""
+    if isinstance(error, AIError):
+        return error
+    message = f"Error al procesar el mensaje con IA: {error}"
+    if isinstance(error, (openai.APITimeoutError, TimeoutError)):
+        return AITimeoutError(message)
+    if isinstance(error, openai.RateLimitError):
+        return AIRateLimitedError(message, retry_after=_retry_after_seconds(error.response))
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code >= 500 or error.status_code in (408, 409):
+            return AIUpstreamError(message, retry_after=_retry_after_seconds(error.response))
+        return AIRequestError(message)
+    if isinstance(error, (openai.APIConnectionError, ConnectionError)):
+        return AIUpstreamError(message)
+    return AIRequestError(message)
+
+
+def retry_delay(attempt, retry_after=None, base=AI_RETRY_BASE_DELAY, cap=AI_RETRY_MAX_DELAY):
+    """
+    Espera antes del reintento número attempt (0 = primer reintento): backoff exponencial con jitter completo
+    (aleatorio entre 0 y base * 2^attempt, hasta cap). Si Azure indica Retry-After se espera al menos eso.
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker seguro entre hilos. Tras failure_threshold fallos seguidos se abre y rechaza las llamadas
+    durante reset_timeout segundos; después deja pasar una sola llamada de prueba (semiabierto): si va bien
+    se cierra y si falla vuelve a abrirse.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=AI_BREAKER_FAILURES, reset_timeout=AI_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Lanza AICircuitOpenError si la llamada no debe intentarse."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN and now >= self.opened_at + self.reset_timeout:
+                self.state = self.HALF_OPEN  # Esta llamada es la de prueba
+                return
+            # Abierto, o semiabierto con la llamada de prueba todavía en curso
+            remaining = max(0.0, self.opened_at + self.reset_timeout - now)
+            self.rejected += 1
+        raise AICircuitOpenError("Azure OpenAI no está disponible en este momento (circuito abierto)", retry_after=remaining)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold > 0:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_response(self):
+        """Azure respondió con un error que no indica falta de disponibilidad (4xx o cuota): la prueba cierra el circuito."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.failures = 0
+
+    def release(self):
+        """La llamada admitida por before_call no llegó a intentarse: si era la de prueba, otra podrá hacerla."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN  # Conserva opened_at: la siguiente llamada vuelve a ser de prueba
+
+    def reset(self):
+        self.record_success()
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+# Pool para las peticiones con hedging (la original y la de cobertura corren en paralelo)
+_hedge_pool = ThreadPoolExecutor(max_workers=AI_HEDGE_MAX_WORKERS, thread_name_prefix="ai-hedge")
+
+
+class ResilientCaller:
+    """
+    Ejecuta una operación contra Azure con plazo total, reintentos acotados (backoff con jitter que respeta
+    Retry-After), hedging opcional y circuit breaker. attempt(timeout) hace un único intento con el plazo
+    indicado y lanza la excepción original si falla; las que salen de call son siempre AIError.
+    """
+
+    def __init__(self, breaker=None, max_retries=AI_MAX_RETRIES, attempt_timeout=AI_TIMEOUT, deadline=AI_DEADLINE,
+                 hedge_after=AI_HEDGE_AFTER, sleep=time.sleep):
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.sleep = sleep
+
+    def call(self, attempt, label="", deadline=None, hedge=True):
+        """
+        Devuelve el resultado del primer intento correcto. label es el tipo de respuesta (para las métricas),
+        deadline sustituye al plazo total por defecto y hedge=False desactiva el hedging (p. ej. en streaming).
+        """
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        retries = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except AICircuitOpenError:
+                ai_circuit_rejections.inc(response_type=label)
+                raise
+            # Toda llamada admitida informa al circuito de su resultado; si no llega a intentarse se libera,
+            # para que una llamada de prueba (semiabierto) nunca deje el circuito bloqueado
+            resolved = False
+            try:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise AITimeoutError("Se agotó el plazo de la llamada a la IA")
+                try:
+                    result = self._attempt(attempt, min(self.attempt_timeout, remaining), hedge, label)
+                except Exception as e:
+                    error = classify_error(e)
+                    # Solo los errores de disponibilidad cuentan para el circuito (no los 4xx ni la cuota)
+                    if isinstance(error, (AITimeoutError, AIUpstreamError)):
+                        self.breaker.record_failure()
+                        resolved = True
+                    elif not isinstance(error, AIThrottledError):
+                        self.breaker.record_response()
+                        resolved = True
+                    delay = retry_delay(retries, error.retry_after) if error.retryable else None
+                    if delay is None or retries >= self.max_retries or time.monotonic() + delay >= deadline_at:
+                        raise error from e
+                    ai_retries.inc(response_type=label, error=type(error).__name__)
+                    self.sleep(delay)
+                    retries += 1
+                    continue
+                self.breaker.record_success()
+                resolved = True
+                return result
+            finally:
+                if not resolved:
+                    self.breaker.release()
+
+    def _attempt(self, attempt, timeout, hedge, label):
+        if not hedge or not self.hedge_after or self.hedge_after >= timeout:
+            return attempt(timeout)
+        # Hedging: si la petición no responde en hedge_after segundos se lanza otra igual y gana la primera en responder
+        primary = _hedge_pool.submit(attempt, timeout)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        ai_hedged_requests.inc(response_type=label)
+        pending = {primary, _hedge_pool.submit(attempt, timeout - self.hedge_after)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # La otra petición no se puede cancelar: termina en segundo plano y se descarta
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+
+# Instancia compartida por todo el proceso (un único circuito para la implementación de Azure)
+ai_caller = ResilientCaller()
@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl  # Bloqueos de fichero entre procesos (solo POSIX)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+from .ia_cache import AI_CACHE_ENABLED, AI_CACHE_SQLITE_PATH
+from .ia_resilience import AITimeoutError
+
+
+# Agrupación de llamadas idénticas en curso (variables de entorno)
+AI_SINGLEFLIGHT_ENABLED = os.getenv("AI_SINGLEFLIGHT_ENABLED", "true").lower() != "false"
+# Directorio compartido por los workers para agrupar también entre procesos (vacío = solo dentro del proceso)
+AI_SINGLEFLIGHT_LOCK_DIR = os.getenv("AI_SINGLEFLIGHT_LOCK_DIR")
+AI_SINGLEFLIGHT_LOCK_TIMEOUT = float(os.getenv("AI_SINGLEFLIGHT_LOCK_TIMEOUT", "120"))  # Segundos máximos de espera
+
+
+class _Call:
+    """Llamada en curso: el líder la ejecuta y los seguidores esperan a que termine."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Agrupa las llamadas concurrentes con la misma clave: la primera (líder) ejecuta la función y
+    las demás esperan su resultado (o su excepción) en lugar de repetir la llamada.
+    Con lock_dir el líder de cada proceso toma además un bloqueo de fichero por clave, de modo que
+    entre workers solo uno llama a la IA; los demás, al obtener el bloqueo, vuelven a consultar el
+    resultado con recheck (p. ej. la caché de respuestas compartida) antes de llamar ellos.
+    Es segura para usar desde varios hilos.
+    """
+
+    def __init__(self, lock_dir=None, lock_timeout=AI_SINGLEFLIGHT_LOCK_TIMEOUT):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        self._calls = {}  # clave -> _Call
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.deduplicated = 0
+        self.cross_process_deduplicated = 0
+        self.follower_timeouts = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None, timeout=None):
+        """
+        Ejecuta fn() una sola vez para todas las llamadas concurrentes con la misma key.
+        Devuelve (resultado, compartido), donde compartido es None si esta llamada ejecutó fn,
+        "process" si esperó a otra del mismo proceso o "cross_process" si recheck devolvió el
+        resultado que obtuvo otro worker.
+        timeout son los segundos máximos que se espera a la llamada de otro hilo (None = sin límite):
+        agotados, se lanza AITimeoutError y el líder sigue con su llamada.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.follower_timeouts += 1
+                raise AITimeoutError(f"La llamada idéntica en curso no terminó en {timeout:g} s")
+            with self._lock:
+                self.deduplicated += 1
+            if call.error is not None:
+                raise call.error
+            return call.result, "process"
+        try:
+            call.result, shared = self._run_leader(key, fn, recheck)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, shared
+
+    def _run_leader(self, key, fn, recheck):
+        # Sin recheck no hay forma de compartir el resultado entre procesos: solo se agrupa en el proceso
+        if not self.lock_dir or recheck is None:
+            return fn(), None
+        path = os.path.join(self.lock_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".lock")
+        lock_file, locked = self._open_file_lock(path)
+        try:
+            if locked:
+                result = recheck()
+                if result is not None:
+                    with self._lock:
+                        self.cross_process_deduplicated += 1
+                    return result, "cross_process"
+            return fn(), None
+        finally:
+            if locked:
+                # El fichero se borra antes de soltar el bloqueo para que el directorio no crezca con cada
+                # clave; quien estuviera esperando detecta el borrado en _open_file_lock y abre uno nuevo
+                self._unlink(path)
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _open_file_lock(self, path):
+        """Abre y bloquea el fichero de path. Devuelve (fichero, bloqueado); bloqueado es False si se agotó lock_timeout."""
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            lock_file = open(path, "a")
+            locked = self._acquire_file_lock(lock_file, deadline)
+            if not locked or self._is_current(lock_file, path):
+                return lock_file, locked
+            # El líder anterior borró (y quizá otro recreó) el fichero mientras se esperaba: el bloqueo
+            # obtenido es de un fichero huérfano y no excluye a nadie, se repite con el fichero actual
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    @staticmethod
+    def _is_current(lock_file, path):
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(lock_file.fileno())
+        return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _acquire_file_lock(self, lock_file, deadline):
+        # flock no admite timeout: se reintenta sin bloquear hasta agotarlo (entonces se llama sin bloqueo)
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "deduplicated": self.deduplicated,
+                "cross_process_deduplicated": self.cross_process_deduplicated,
+                "follower_timeouts": self.follower_timeouts,
+                "cross_process": bool(self.lock_dir),
+            }
+
+
+def cross_process_lock_dir(lock_dir=AI_SINGLEFLIGHT_LOCK_DIR, shared_cache=AI_CACHE_ENABLED and AI_CACHE_SQLITE_PATH):
+    """
+    Devuelve el directorio de bloqueos entre procesos, o None si no hay un nivel de caché compartido
+    (AI_CACHE_SQLITE_PATH) por el que los demás workers puedan leer el resultado del líder: sin él, el
+    bloqueo solo haría que los workers llamasen a Azure por turnos. En ese caso avisa al arrancar.
+    """
+    if lock_dir and not shared_cache:
+        logging.getLogger(__name__).warning(
+            "AI_SINGLEFLIGHT_LOCK_DIR se ignora: la agrupación entre procesos necesita la caché de respuestas "
+            "con AI_CACHE_SQLITE_PATH; solo se agrupan las llamadas dentro de cada proceso")
+        return None
+    return lock_dir
+
+
+# Instancia compartida por todo el proceso
+ai_single_flight = SingleFlight(lock_dir=cross_process_lock_dir())
@@ -1,11 +1,11 @@
-from .ia_client import ResponseType, process_message_with_AI
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .ia_client import ResponseType, process_message_with_AI, stream_message_with_AI
 from src.models.task import Task
 
-def create_task_description(task_dict: dict) -> dict:
-    """
-    Recibe un diccionario tipo Task (con description vacía) y devuelve el mismo diccionario
-    pero con la descripción generada por la IA. Solo 'title' es obligatorio.
-    """
+def _description_messages(task_dict: dict):
+    # Contexto y mensaje de usuario para generar la descripción (compartidos con la variante en streaming)
     if not task_dict.get("title"):
         raise ValueError("El campo 'title' es obligatorio para generar la descripción.")
 
@@ -27,19 +27,44 @@ def create_task_description(task_dict: dict) -> dict:
     if task_dict.get("risk_mitigation"):
         user_message += f"Mitigación de riesgos: {task_dict['risk_mitigation']} "
     user_message += "Por favor, genera una descripción detallada y profesional para esta tarea."
+    return context, user_message
+
+def create_task_description(task_dict: dict, use_cache=None) -> dict:
+    """
+    Recibe un diccionario tipo Task (con description vacía) y devuelve el mismo diccionario
+    pero con la descripción generada por la IA. Solo 'title' es obligatorio.
+    """
+    context, user_message = _description_messages(task_dict)
 
     # Llamada a la IA
     descripcion_generada = process_message_with_AI(
         message=user_message,
         context=context,
-        response_type=ResponseType.CREATIVE  # O el tipo que desees, por ejemplo ResponseType.TECHNICAL
+        response_type=ResponseType.CREATIVE,  # O el tipo que desees, por ejemplo ResponseType.TECHNICAL
+        use_cache=use_cache
     )
 
     # Devolvemos el mismo dict pero con la descripción generada
     task_dict["description"] = descripcion_generada
     return task_dict
 
-def create_task_category(task_dict: dict) -> dict:
+def stream_task_description(task_dict: dict, use_cache=None):
+    """
+    Variante en streaming de create_task_description. Valida la tarea al llamarla y devuelve un generador
+    de tuplas (campo, fragmento); al agotarse, task_dict contiene la descripción completa.
+    """
+    context, user_message = _description_messages(task_dict)
+
+    def generate():
+        parts = []
+        for chunk in stream_message_with_AI(user_message, context, ResponseType.CREATIVE, use_cache):
+            parts.append(chunk)
+            yield "description", chunk
+        task_dict["description"] = "".join(parts)
+
+    return generate()
+
+def create_task_category(task_dict: dict, use_cache=None) -> dict:
     """
     Recibe un diccionario tipo Task (con category vacía o None) y devuelve el mismo diccionario
     pero con la categoría generada por la IA (debe ser un valor válido de CategoryEnum).
@@ -64,14 +89,15 @@ def create_task_category(task_dict: dict) -> dict:
     categoria_generada = process_message_with_AI(
         message=user_message,
         context=context,
-        response_type=ResponseType.ANALYTICS  # O el tipo que desees, por ejemplo ResponseType.TECHNICAL
+        response_type=ResponseType.ANALYTICS,  # O el tipo que desees, por ejemplo ResponseType.TECHNICAL
+        use_cache=use_cache
     )
 
     # Devolvemos el mismo dict pero con la categoría generada
     task_dict["category"] = categoria_generada.strip()
     return task_dict
 
-def create_task_effort_estimate(task_dict: dict) -> dict:
+def create_task_effort_estimate(task_dict: dict, use_cache=None) -> dict:
     """
     Recibe un diccionario tipo Task (sin effort_hours) y devuelve el mismo diccionario
     pero con el esfuerzo estimado en horas generado por la IA (campo numérico).
@@ -97,7 +123,8 @@ def create_task_effort_estimate(task_dict: dict) -> dict:
     estimate_str = process_message_with_AI(
         message=user_message,
         context=context,
-        response_type=ResponseType.ANALYTICS
+        response_type=ResponseType.ANALYTICS,
+        use_cache=use_cache
     )
 
     # Intentar convertir la respuesta a float
@@ -109,17 +136,26 @@ def create_task_effort_estimate(task_dict: dict) -> dict:
     task_dict["effort_hours"] = effort_hours
     return task_dict
 
-def create_task_audit(task_dict: dict) -> dict:
+def create_task_audit(task_dict: dict, use_cache=None) -> dict:
     """
     Recibe un diccionario tipo Task (sin risk_analysis ni risk_mitigation) y devuelve el mismo diccionario
     con ambos campos generados por la IA. Los campos obligatorios son: title, description, priority y category.
     """
+    _check_audit_fields(task_dict)
+    # --- PRIMERA PETICIÓN: Análisis de riesgos ---
+    create_task_risk_analysis(task_dict, use_cache)
+    # --- SEGUNDA PETICIÓN: Plan de mitigación (depende del análisis) ---
+    create_task_risk_mitigation(task_dict, use_cache)
+    return task_dict
+
+def _check_audit_fields(task_dict: dict):
     required_fields = ["title", "description", "priority", "category"]
     for field in required_fields:
         if not task_dict.get(field):
             raise ValueError(f"El campo '{field}' es obligatorio para auditar la tarea.")
 
-    # --- PRIMERA PETICIÓN: Análisis de riesgos ---
+def _risk_analysis_messages(task_dict: dict):
+    _check_audit_fields(task_dict)
     context_risk = [
         {"role": "system", "content": "Eres un experto en gestión de proyectos de software. Analiza los posibles riesgos de la siguiente tarea y devuelve solo el análisis de riesgos, sin texto adicional. No más de 100 palabras."}
     ]
@@ -131,14 +167,26 @@ def create_task_audit(task_dict: dict) -> dict:
         f"Responsable: {task_dict.get('assigned_to', '')}\n"
         "¿Qué riesgos pueden surgir en esta tarea?"
     )
+    return context_risk, user_message_risk
+
+def create_task_risk_analysis(task_dict: dict, use_cache=None) -> dict:
+    """
+    Primera parte de la auditoría: añade al diccionario el campo risk_analysis generado por la IA.
+    """
+    context_risk, user_message_risk = _risk_analysis_messages(task_dict)
     risk_analysis = process_message_with_AI(
         message=user_message_risk,
         context=context_risk,
-        response_type=ResponseType.ANALYTICS
+        response_type=ResponseType.ANALYTICS,
+        use_cache=use_cache
     )
     task_dict["risk_analysis"] = risk_analysis.strip()
+    return task_dict
 
-    # --- SEGUNDA PETICIÓN: Plan de mitigación ---
+def _risk_mitigation_messages(task_dict: dict):
+    _check_audit_fields(task_dict)
+    if not task_dict.get("risk_analysis"):
+        raise ValueError("El campo 'risk_analysis' es obligatorio para generar el plan de mitigación.")
     context_mitigation = [
         {"role": "system", "content": "Eres un experto en gestión de proyectos de software. A partir del análisis de riesgos y los datos de la tarea, genera un plan de mitigación de riesgos. Devuelve solo el plan, sin texto adicional. No más de 100 palabras"}
     ]
@@ -151,11 +199,149 @@ def create_task_audit(task_dict: dict) -> dict:
         f"Análisis de riesgos: {task_dict['risk_analysis']}\n"
         "¿Qué plan de mitigación propones para estos riesgos?"
     )
+    return context_mitigation, user_message_mitigation
+
+def create_task_risk_mitigation(task_dict: dict, use_cache=None) -> dict:
+    """
+    Segunda parte de la auditoría: añade al diccionario el campo risk_mitigation a partir de risk_analysis.
+    """
+    context_mitigation, user_message_mitigation = _risk_mitigation_messages(task_dict)
     risk_mitigation = process_message_with_AI(
         message=user_message_mitigation,
         context=context_mitigation,
-        response_type=ResponseType.ANALYTICS
+        response_type=ResponseType.ANALYTICS,
+        use_cache=use_cache
     )
     task_dict["risk_mitigation"] = risk_mitigation.strip()
+    return task_dict
+
+def stream_task_audit(task_dict: dict, use_cache=None):
+    """
+    Variante en streaming de create_task_audit. Valida la tarea al llamarla y devuelve un generador
+    de tuplas (campo, fragmento): primero risk_analysis y después risk_mitigation. Al agotarse,
+    task_dict contiene ambos campos completos.
+    """
+    _check_audit_fields(task_dict)
+
+    def generate():
+        parts = []
+        context_risk, user_message_risk = _risk_analysis_messages(task_dict)
+        for chunk in stream_message_with_AI(user_message_risk, context_risk, ResponseType.ANALYTICS, use_cache):
+            parts.append(chunk)
+            yield "risk_analysis", chunk
+        task_dict["risk_analysis"] = "".join(parts).strip()
+
+        parts = []
+        context_mitigation, user_message_mitigation = _risk_mitigation_messages(task_dict)
+        for chunk in stream_message_with_AI(user_message_mitigation, context_mitigation, ResponseType.ANALYTICS, use_cache):
+            parts.append(chunk)
+            yield "risk_mitigation", chunk
+        task_dict["risk_mitigation"] = "".join(parts).strip()
+
+    return generate()
+
+# Grafo de etapas del enriquecimiento: nombre -> (dependencias, función, campo que genera, campos que lee).
+# estimate y risk_analysis solo dependen de categorize, así que se ejecutan en paralelo.
+ENRICH_STAGES = {
+    "describe": ((), create_task_description, "description", ("title",)),
+    "categorize": (("describe",), create_task_category, "category", ("title", "description")),
+    "estimate": (("categorize",), create_task_effort_estimate, "effort_hours", ("title", "description", "category")),
+    "risk_analysis": (("categorize",), create_task_risk_analysis, "risk_analysis", ("title", "description", "priority", "category")),
+    "risk_mitigation": (("risk_analysis",), create_task_risk_mitigation, "risk_mitigation",
+                        ("title", "description", "priority", "category", "risk_analysis")),
+}
+
+# Pool de hilos compartido para las etapas del enriquecimiento (los hilos se crean bajo demanda)
+_enrich_pool = ThreadPoolExecutor(max_workers=int(os.getenv("AI_ENRICH_MAX_WORKERS", "8")), thread_name_prefix="ai-enrich")
+
+def _run_stage(function, task_dict, use_cache):
+    start = time.perf_counter()
+    result = function(task_dict, use_cache)
+    return result, (time.perf_counter() - start) * 1000
+
+def check_enrich_fields(task_dict: dict):
+    """
+    Comprueba que la tarea trae todo lo que leen las etapas que se van a ejecutar y que ninguna etapa
+    anterior genera (p. ej. priority para la auditoría), para fallar antes de hacer ninguna llamada a la IA.
+    """
+    generated = {field for _, _, field, _ in ENRICH_STAGES.values()}
+    for name, (_, _, field, reads) in ENRICH_STAGES.items():
+        if task_dict.get(field) not in (None, ""):
+            continue  # Etapa omitida: no lee nada
+        for required in reads:
+            if required not in generated and not task_dict.get(required):
+                raise ValueError(f"El campo '{required}' es obligatorio para enriquecer la tarea (etapa {name}).")
+
+def enrich_task(task_dict: dict, use_cache=None) -> dict:
+    """
+    Ejecuta describe → categorize → estimate / auditoría como un grafo de dependencias,
+    lanzando en paralelo las etapas independientes. Las etapas cuyo campo ya viene relleno
+    se omiten. Devuelve la tarea enriquecida y el tiempo en ms de cada etapa.
+    Si una etapa falla no se lanza ninguna más y se espera a las que estén en curso antes de propagar el error.
+    """
+    check_enrich_fields(task_dict)
+    start = time.perf_counter()
+    task = dict(task_dict)
+    timings = {}
+    done = set()
+    pending = dict(ENRICH_STAGES)
+    running = {}
+    try:
+        while pending or running:
+            ready = [name for name, (deps, _, _, _) in pending.items() if all(d in done for d in deps)]
+            for name in ready:
+                _, function, field, _ = pending.pop(name)
+                if task.get(field) not in (None, ""):
+                    timings[name] = None  # Etapa omitida: el campo ya venía en la petición
+                    done.add(name)
+                else:
+                    # Cada etapa trabaja sobre su propia copia para no compartir el dict entre hilos
+                    running[_enrich_pool.submit(_run_stage, function, dict(task), use_cache)] = (name, field)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, field = running.pop(future)
+                result, elapsed = future.result()
+                task[field] = result[field]
+                timings[name] = round(elapsed, 1)
+                done.add(name)
+    except BaseException:
+        # Las etapas aún en cola se cancelan y las que ya corren se esperan: ninguna sigue
+        # llamando a la IA (ni ocupando el pool) después de que la petición haya respondido
+        for future in running:
+            future.cancel()
+        wait(running)
+        raise
+    return {
+        "task": task,
+        "timings_ms": timings,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
 
-    return task_dict
\ No newline at end of file
+# Operaciones disponibles en los endpoints batch
+BATCH_OPERATIONS = {
+    "describe": create_task_description,
+    "categorize": create_task_category,
+    "estimate": create_task_effort_estimate,
+    "audit": create_task_audit,
+}
+
+# Pool acotado para los lotes: limita cuántas llamadas a la IA hay en vuelo a la vez
+_batch_pool = ThreadPoolExecutor(max_workers=int(os.getenv("AI_BATCH_MAX_WORKERS", "8")), thread_name_prefix="ai-batch")
+
+def _run_batch_item(function, task_dict, use_cache):
+    try:
+        return {"result": function(dict(task_dict), use_cache)}
+    except Exception as e:
+        return {"error": str(e)}
+
+def run_batch(operation: str, task_dicts: list, use_cache=None) -> list:
+    """
+    Aplica la operación de IA indicada a cada tarea de la lista usando el pool acotado
+    (y el rate limiter de ia_client). Devuelve los resultados en el orden de entrada,
+    con un campo error en los elementos que hayan fallado.
+    """
+    function = BATCH_OPERATIONS[operation]
+    futures = [_batch_pool.submit(_run_batch_item, function, task_dict, use_cache) for task_dict in task_dicts]
+    return [dict(index=i, **future.result()) for i, future in enumerate(futures)]
@@ -0,0 +1,59 @@
+import json
+from .ia_client import ResponseType, process_message_with_AI
+from src.managers.user_story_manager import UserStoryManager
+from src.managers.task_manager import TaskManager
+from src.schemas.user_story_schema import UserStorySchema
+from src.schemas.task_schema import TaskSchemas
+
+response_limit = 1500
+
+def generate_user_story_from_prompt(prompt: str) -> dict:
+    """
+    Genera con la IA una historia de usuario a partir de un prompt en lenguaje natural y la guarda.
+    Devuelve el id de la historia creada. Lanza ValueError si la respuesta de la IA no es válida.
+    """
+    # Contexto de rol system para la IA
+    context = [
+        {"role": "system", "content": "Eres un experto en desarrollo de software y en la creación de historias de usuario siguiendo buenas prácticas ágiles. Tu tarea es generar historias de usuario claras, concisas y útiles para equipos de desarrollo."}
+    ]
+    response = process_message_with_AI(prompt, context, ResponseType.ANALYTICS, UserStorySchema)
+    try:
+        user_story_data = json.loads(response)
+        validated = UserStorySchema(**user_story_data)
+    except Exception as e:
+        raise ValueError(f"Respuesta IA inválida: {str(e)}")
+    user_story = UserStoryManager().add_user_story(validated.model_dump())
+    return {"user_story_id": user_story.id}
+
+def generate_tasks_for_user_story(user_story_id: int) -> dict:
+    """
+    Descompone con la IA una historia de usuario en tareas y las guarda con un único INSERT.
+    Devuelve el número de tareas creadas. Lanza ValueError si la historia no existe o la respuesta no es válida.
+    """
+    user_story = UserStoryManager().get_user_story(user_story_id)
+    if not user_story:
+        raise ValueError("Historia de usuario no encontrada")
+    # Construir prompt para la IA
+    prompt = f"Genera una lista de tareas detalladas para la siguiente historia de usuario: {user_story.to_dict()}"
+
+    context = [
+        {"role": "system", "content": f"Eres un experto en gestión de proyectos ágiles y descomposición de historias de usuario en tareas técnicas. Se te va a dar una historia de usuario en formato json y debes devolver SOLO un array de objetos JSON puros (sin saltos de linea) en base al model que tienes en el parámetro response_format. Creame al menos 2 tasks dentro del array pero no más de 4, y cada task que no tenga más de 200 palabras. En cualquier caso el límite total en tu respuesta no puede superar las {response_limit} palabras"},]
+
+    response = process_message_with_AI(prompt, context, ResponseType.CREATIVE, TaskSchemas)
+    try:
+        tasks_data = json.loads(response)
+        validated_tasks = TaskSchemas(**tasks_data)
+    except Exception as e:
+        raise ValueError(f"Respuesta IA inválida: {str(e)}")
+    # Guardar todas las tareas en base de datos con un único INSERT
+    TaskManager().add_tasks([
+        task.model_copy(update={'user_story_id': user_story_id}).model_dump()
+        for task in validated_tasks.TaskSchemasList
+    ])
+    return {"user_story_id": user_story_id, "created": len(validated_tasks.TaskSchemasList)}
+
+# Trabajos en segundo plano disponibles para JobManager
+JOB_HANDLERS = {
+    "generate_user_story": generate_user_story_from_prompt,
+    "generate_tasks": generate_tasks_for_user_story,
+}
@@ -0,0 +1 @@
+# Benchmarks reproducibles del proyecto (se ejecutan sin conexión contra SQLite).
@@ -0,0 +1,317 @@
+"""
+Simulador local de Azure OpenAI para pruebas de carga sin consumir cuota. Habla el mismo protocolo
+que usa ai/ia_client.py: POST /openai/deployments/<modelo>/chat/completions con respuesta completa,
+con stream=True (SSE, incluido el primer chunk sin choices del filtro de contenido y el de uso final)
+y con response_format json_schema (el método parse del SDK).
+
+Las respuestas son deterministas: dependen solo de los mensajes y del schema, así que la misma petición
+devuelve siempre el mismo contenido (en streaming o no). Con schema se genera un JSON válido para él
+(TaskSchemas, UserStorySchema o cualquier otro modelo de pydantic); sin schema, un texto acorde a lo que
+pide el prompt de sistema (una categoría, un número de horas o un párrafo).
+
+La latencia sigue la distribución elegida y una fracción configurable de las peticiones falla con 500
+o con 429 (con Retry-After y retry-after-ms, como Azure). GET /stats devuelve los contadores.
+
+Uso:
+    python -m benchmarks.azure_openai_simulator --port 8089 --latency lognormal --latency-ms 800 --rate-limit-rate 0.05
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089 AZURE_OPENAI_API_KEY=simulador AZURE_OPENAI_API_VERSION=2024-10-21 \\
+        AZURE_OPENAI_MODEL=gpt-4o python main.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from flask import Flask, Response, request, jsonify
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Respuestas de texto según lo que pide el prompt de sistema (la primera regla que coincide)
+CATEGORIES = ["Backend", "Frontend", "Testing", "Documentación", "Otro"]
+WORDS = ("el equipo revisará los requisitos implementará los cambios necesarios validará la integración con los "
+         "servicios existentes documentará las decisiones técnicas y coordinará el despliegue con las pruebas de "
+         "aceptación para reducir riesgos de regresión y retrasos en la entrega").split()
+
+
+@dataclass
+class SimulatorConfig:
+    """Comportamiento del simulador. Las latencias están en milisegundos y las tasas entre 0 y 1."""
+    latency: str = "lognormal"  # Distribución de la latencia hasta la respuesta (o hasta el primer chunk)
+    latency_ms: float = 0.0  # Valor fijo, mediana (lognormal), media (exponential) o máximo (uniform)
+    latency_sigma: float = 0.5  # Dispersión de la lognormal
+    latency_max_ms: float = 30000.0  # Recorte de la cola de la distribución
+    chunk_delay_ms: float = 0.0  # Pausa entre chunks en streaming
+    chunk_words: int = 3  # Palabras por chunk en streaming
+    error_rate: float = 0.0  # Fracción de peticiones que fallan con 500
+    rate_limit_rate: float = 0.0  # Fracción de peticiones rechazadas con 429
+    retry_after: float = 1.0  # Segundos indicados en Retry-After de los 429
+    text_words: int = 60  # Palabras de las respuestas de texto libre
+    seed: int = None  # Semilla de latencias y fallos (las respuestas son deterministas siempre)
+
+    def __post_init__(self):
+        if self.latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency debe ser una de {LATENCY_DISTRIBUTIONS}")
+
+
+def sample_latency(config, rnd):
+    """Latencia en segundos según la distribución configurada, recortada a latency_max_ms."""
+    if config.latency_ms <= 0:
+        return 0.0
+    if config.latency == "fixed":
+        value = config.latency_ms
+    elif config.latency == "uniform":
+        value = rnd.uniform(0, config.latency_ms)
+    elif config.latency == "exponential":
+        value = rnd.expovariate(1 / config.latency_ms)
+    else:
+        value = config.latency_ms * rnd.lognormvariate(0, config.latency_sigma)
+    return min(value, config.latency_max_ms) / 1000
+
+
+def _request_rng(messages, response_format):
+    # Generador aleatorio propio de cada petición, sembrado con su contenido: respuestas deterministas
+    payload = json.dumps({"messages": messages, "response_format": response_format}, sort_keys=True, ensure_ascii=False)
+    return random.Random(hashlib.sha256(payload.encode("utf-8")).hexdigest())
+
+
+def _sentence(rnd, words):
+    text = " ".join(rnd.choice(WORDS) for _ in range(max(1, words)))
+    return text[0].upper() + text[1:] + "."
+
+
+def fake_from_schema(schema, rnd, root=None, name=""):
+    """
+    Genera un valor válido para el JSON schema (el que envía el SDK en modo strict: $defs/$ref, anyOf, enum,
+    objetos, arrays, cadenas y números). En los anyOf con null se elige null, como haría el modelo con los
+    campos de solo serialización (id, created_at, version). Los enteros sin límites quedan entre 1 y 8 y los
+    arrays entre 2 y 4 elementos, igual que piden los prompts y validadores de la aplicación.
+    """
+    root = root or schema
+    if "$ref" in schema:
+        return fake_from_schema(root["$defs"][schema["$ref"].split("/")[-1]], rnd, root, name)
+    if "anyOf" in schema:
+        options = schema["anyOf"]
+        if any(option.get("type") == "null" for option in options):
+            return None
+        return fake_from_schema(options[0], rnd, root, name)
+    if "enum" in schema:
+        return rnd.choice(schema["enum"])
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: fake_from_schema(value, rnd, root, key) for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        count = rnd.randint(schema.get("minItems", 2), schema.get("maxItems", 4))
+        return [fake_from_schema(schema.get("items", {}), rnd, root, name) for _ in range(count)]
+    if kind == "integer":
+        return rnd.randint(schema.get("minimum", 1), schema.get("maximum", 8))
+    if kind == "number":
+        return round(rnd.uniform(schema.get("minimum", 1), schema.get("maximum", 16)) * 2) / 2
+    if kind == "boolean":
+        return rnd.random() < 0.5
+    if kind == "null":
+        return None
+    # Cadenas: más largas en los campos de texto libre
+    return _sentence(rnd, 30 if "description" in name else 4)
+
+
+def fake_text(messages, rnd, words):
+    """Respuesta de texto libre acorde al prompt de sistema de ai/ia_task_manager.py."""
+    system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    if re.search(r"categor", system, re.IGNORECASE) and "Backend" in system:
+        return rnd.choice(CATEGORIES)
+    if re.search(r"número .*horas", system):
+        return str(rnd.choice([1, 2, 3, 4, 6, 8, 12, 16]))
+    return _sentence(rnd, words)
+
+
+def _usage(messages, content):
+    # Aproximación de 4 caracteres por token, suficiente para las métricas de la aplicación
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4 + 1
+    completion_tokens = len(content) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+class Simulator:
+    """Estado del simulador (configuración, contadores y aleatoriedad de latencias y fallos). Seguro entre hilos."""
+
+    def __init__(self, config=None):
+        self.config = config or SimulatorConfig()
+        self._rnd = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "streamed": 0, "parsed": 0, "errors": 0, "rate_limited": 0}
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.counters[name] += 1
+
+    def _draw(self):
+        # Latencia y resultado de la petición: "ok", "error" o "rate_limited"
+        with self._lock:
+            latency = sample_latency(self.config, self._rnd)
+            roll = self._rnd.random()
+        if roll < self.config.rate_limit_rate:
+            return latency, "rate_limited"
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            return latency, "error"
+        return latency, "ok"
+
+    def content_for(self, body):
+        """Contenido determinista de la respuesta a una petición de chat completions."""
+        messages = body.get("messages", [])
+        response_format = body.get("response_format")
+        rnd = _request_rng(messages, response_format)
+        if response_format and response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            return json.dumps(fake_from_schema(schema, rnd), ensure_ascii=False)
+        return fake_text(messages, rnd, self.config.text_words)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, config=asdict(self.config))
+
+
+def _error(status, code, message, headers=None):
+    return jsonify({"error": {"code": code, "message": message}}), status, headers or {}
+
+
+def create_simulator_app(config=None):
+    """Aplicación WSGI del simulador. Acepta las rutas de Azure y la ruta /chat/completions de OpenAI."""
+    simulator = Simulator(config)
+    app = Flask(__name__)
+    app.extensions["simulator"] = simulator
+
+    @app.route('/openai/deployments/<deployment>/chat/completions', methods=['POST'])
+    @app.route('/chat/completions', methods=['POST'], defaults={'deployment': None})
+    def chat_completions(deployment):
+        body = request.get_json(silent=True)
+        if not body or not body.get("messages"):
+            return _error(400, "BadRequest", "messages es obligatorio")
+        model = deployment or body.get("model", "simulador")
+        simulator._count("requests")
+        latency, outcome = simulator._draw()
+        if outcome == "rate_limited":
+            # Azure rechaza por cuota sin esperar a procesar la petición
+            simulator._count("rate_limited")
+            retry_after = simulator.config.retry_after
+            return _error(429, "429", "Requests have exceeded the rate limit (simulador).",
+                          {"Retry-After": str(max(1, round(retry_after))), "retry-after-ms": str(int(retry_after * 1000))})
+        time.sleep(latency)
+        if outcome == "error":
+            simulator._count("errors")
+            return _error(500, "InternalServerError", "Error simulado del servicio.")
+
+        content = simulator.content_for(body)
+        if body.get("response_format"):
+            simulator._count("parsed")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = _usage(body["messages"], content)
+        if body.get("stream"):
+            simulator._count("streamed")
+            return Response(_stream(simulator.config, completion_id, created, model, content, usage),
+                            mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+        return jsonify({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content, "refusal": None}}],
+            "usage": usage,
+        })
+
+    @app.route('/stats', methods=['GET'])
+    def stats():
+        return jsonify(simulator.stats())
+
+    return app
+
+
+def _stream(config, completion_id, created, model, content, usage):
+    def chunk(choices, **extra):
+        data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": choices, **extra}
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    # Primer chunk sin choices: resultados del filtro de contenido de Azure
+    yield chunk([], prompt_filter_results=[{"prompt_index": 0, "content_filter_results": {}}])
+    words = content.split(" ")
+    step = max(1, config.chunk_words)
+    for start in range(0, len(words), step):
+        text = " ".join(words[start:start + step]) + (" " if start + step < len(words) else "")
+        yield chunk([{"index": 0, "delta": {"role": "assistant", "content": text}, "finish_reason": None}])
+        if config.chunk_delay_ms:
+            time.sleep(config.chunk_delay_ms / 1000)
+    yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+    yield chunk([], usage=usage)
+    yield "data: [DONE]\n\n"
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # Sin una línea de log por petición: en una prueba de carga solo añade ruido y coste
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def start_simulator(config=None, host="127.0.0.1", port=0):
+    """
+    Arranca el simulador en un hilo (servidor de werkzeug con un hilo por petición) y devuelve
+    (servidor, url). Se detiene con servidor.shutdown().
+    """
+    server = make_server(host, port, create_simulator_app(config), threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="azure-openai-simulator").start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def add_simulator_arguments(parser):
+    """Opciones de línea de comandos de SimulatorConfig (compartidas con benchmarks.bench_ai)."""
+    defaults = SimulatorConfig()
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default=defaults.latency, help="Distribución de la latencia")
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms,
+                        help="Valor fijo, mediana (lognormal), media (exponential) o máximo (uniform)")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma, help="Dispersión de la lognormal")
+    parser.add_argument("--latency-max-ms", type=float, default=defaults.latency_max_ms)
+    parser.add_argument("--chunk-delay-ms", type=float, default=defaults.chunk_delay_ms, help="Pausa entre chunks en streaming")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fracción de respuestas 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="Fracción de respuestas 429")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after, help="Segundos de Retry-After en los 429")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla de latencias y fallos")
+
+
+def config_from_args(args):
+    return SimulatorConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        latency_max_ms=args.latency_max_ms,
+        chunk_delay_ms=args.chunk_delay_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_simulator_arguments(parser)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, create_simulator_app(config_from_args(args)), threaded=True)
+    print(f"Simulador de Azure OpenAI en http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Prueba de carga de las rutas de IA (/ai/tasks/* y /user-stories/<id>/generate-tasks) contra el simulador
+de Azure OpenAI (benchmarks.azure_openai_simulator), sin consumir cuota. Levanta en este proceso el simulador
+y la aplicación (servidor de werkzeug con un hilo por petición y SQLite en un fichero temporal), lanza
+--requests peticiones por ruta con --concurrency en paralelo y mide el throughput, la latencia p50/p95/p99 y
+las respuestas por código de estado. generate-tasks se mide de extremo a extremo: desde el POST hasta que
+el trabajo termina (consultando /jobs/<id>).
+
+Las peticiones llevan títulos distintos y Cache-Control: no-cache (salvo con --use-cache), así que se miden
+las llamadas al simulador y no la caché de respuestas. Los plazos, reintentos, circuit breaker, cuota y
+single-flight de la aplicación se configuran con sus variables de entorno habituales (AI_TIMEOUT, AI_MAX_RETRIES...).
+
+Uso:
+    python -m benchmarks.bench_ai --requests 200 --concurrency 16 --latency lognormal --latency-ms 800 --output ai.json
+    python -m benchmarks.bench_ai --error-rate 0.02 --rate-limit-rate 0.05 --route "POST /ai/tasks/enrich"
+    # Contra una aplicación ya desplegada (p. ej. gunicorn) con AZURE_OPENAI_ENDPOINT apuntando al simulador
+    python -m benchmarks.bench_ai --target http://127.0.0.1:8000 --user-story-id 1
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import httpx
+from flask import Flask
+from sqlalchemy import insert
+from werkzeug.serving import make_server
+from benchmarks.azure_openai_simulator import (
+    QuietRequestHandler, start_simulator, add_simulator_arguments, config_from_args,
+)
+from benchmarks.bench_routes import TEMPLATES_DIR, fake_task, fake_user_story, percentile
+
+JOB_POLL_INTERVAL = 0.02  # Segundos entre consultas del estado de un trabajo
+JOB_TIMEOUT = 300  # Segundos máximos de espera de un trabajo
+BATCH_SIZE = 10  # Tareas por petición en las rutas batch
+API_VERSION = "2024-10-21"
+
+
+def ai_task(i, *fields):
+    # Tarea con título único (para no medir la caché) y solo los campos que pide la ruta
+    task = fake_task(i)
+    task["title"] = f"Tarea de carga {i}"
+    task["category"] = "Backend"
+    return {field: task[field] for field in ("title",) + fields}
+
+
+def read_sse(response):
+    # Consume el stream entero: un evento error cuenta como fallo aunque el estado HTTP sea 200
+    body = "".join(response.iter_text())
+    return "event: error" not in body
+
+
+def build_cases(user_story_ids):
+    """
+    Casos de la prueba: (nombre, función(client, i) -> (código de estado, correcta)).
+    Cada función hace una operación completa; para generate-tasks incluye la espera del trabajo.
+    """
+    def post(path, payload):
+        def run(client, i):
+            response = client.post(path, json=payload(i))
+            return response.status_code, response.status_code == 200
+        return run
+
+    def stream(path, payload):
+        def run(client, i):
+            with client.stream("POST", path, json=payload(i)) as response:
+                ok = read_sse(response) if response.status_code == 200 else False
+            return response.status_code, ok
+        return run
+
+    def generate_tasks(client, i):
+        response = client.post(f"/user-stories/{user_story_ids[i % len(user_story_ids)]}/generate-tasks")
+        if response.status_code != 202:
+            return response.status_code, False
+        job_url = f"/jobs/{response.json()['id']}"
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while time.monotonic() < deadline:
+            job = client.get(job_url).json()
+            if job["status"] in ("completado", "error"):
+                return response.status_code, job["status"] == "completado"
+            time.sleep(JOB_POLL_INTERVAL)
+        return response.status_code, False
+
+    return [
+        ("POST /ai/tasks/describe", post("/ai/tasks/describe", lambda i: ai_task(i, "priority"))),
+        ("POST /ai/tasks/describe/stream", stream("/ai/tasks/describe/stream", lambda i: ai_task(i, "priority"))),
+        ("POST /ai/tasks/categorize", post("/ai/tasks/categorize", lambda i: ai_task(i, "description"))),
+        ("POST /ai/tasks/estimate", post("/ai/tasks/estimate", lambda i: ai_task(i, "description", "category"))),
+        ("POST /ai/tasks/audit", post("/ai/tasks/audit", lambda i: ai_task(i, "description", "priority", "category"))),
+        ("POST /ai/tasks/audit/stream", stream("/ai/tasks/audit/stream", lambda i: ai_task(i, "description", "priority", "category"))),
+        ("POST /ai/tasks/enrich", post("/ai/tasks/enrich", lambda i: ai_task(i, "priority"))),
+        ("POST /ai/tasks/describe/batch", post("/ai/tasks/describe/batch",
+                                               lambda i: [ai_task(i * BATCH_SIZE + j) for j in range(BATCH_SIZE)])),
+        ("POST /user-stories/<id>/generate-tasks", generate_tasks),
+    ]
+
+
+def run_case(client, fn, requests, concurrency):
+    """Lanza requests operaciones con concurrency en paralelo y resume latencias y códigos de estado."""
+    def timed(i):
+        t0 = time.perf_counter()
+        try:
+            status, ok = fn(client, i)
+        except httpx.HTTPError as e:
+            status, ok = type(e).__name__, False
+        return time.perf_counter() - t0, status, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _, _ in outcomes)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "errors": sum(1 for _, _, ok in outcomes if not ok),
+        "status_codes": dict(sorted(Counter(str(status) for _, status, _ in outcomes).items())),
+    }
+
+
+def create_bench_app(database_uri):
+    """Aplicación con las rutas CRUD, de trabajos y de IA, como la de create_app pero sin la toolbar de depuración."""
+    from src.db import db
+    from src.routes.task_routes import create_tasks_blueprint
+    from src.routes.user_story_routes import create_user_stories_blueprint
+    from src.routes.job_routes import create_jobs_blueprint
+    from src.routes.ai_routes import create_ai_blueprint
+    app = Flask(__name__, template_folder=TEMPLATES_DIR)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    app.register_blueprint(create_tasks_blueprint())
+    app.register_blueprint(create_user_stories_blueprint())
+    app.register_blueprint(create_jobs_blueprint())
+    app.register_blueprint(create_ai_blueprint())
+    return app
+
+
+def point_ai_client_at(simulator_url, model="gpt-4o"):
+    """Configura el cliente de ai/ia_client.py para que llame al simulador (y lo recrea si ya existía)."""
+    os.environ["AZURE_OPENAI_ENDPOINT"] = simulator_url
+    os.environ["AZURE_OPENAI_API_KEY"] = "simulador"
+    os.environ["AZURE_OPENAI_API_VERSION"] = API_VERSION
+    os.environ["AZURE_OPENAI_MODEL"] = model
+    from ai.ia_client import reset_ai_client
+    reset_ai_client()
+
+
+def run_load(requests, concurrency, config=None, only=None, use_cache=False, target=None, simulator_url=None, user_story_ids=None):
+    """
+    Mide las rutas de IA. Sin target arranca la aplicación en este proceso (y el simulador con config, salvo
+    que se indique simulator_url); con target mide esa aplicación, que ya debe apuntar a un simulador y
+    tener las historias user_story_ids para generate-tasks.
+    """
+    headers = {} if use_cache else {"Cache-Control": "no-cache"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    cleanup = []
+    try:
+        if target is None:
+            if simulator_url is None:
+                simulator, simulator_url = start_simulator(config)
+                cleanup.append(simulator.shutdown)
+            point_ai_client_at(simulator_url)
+            tmp = tempfile.TemporaryDirectory()
+            cleanup.append(tmp.cleanup)
+            app = create_bench_app(f"sqlite:///{os.path.join(tmp.name, 'bench_ai.db')}")
+            cleanup.append(lambda: dispose_engine(app))
+            user_story_ids = seed_user_stories(app, max(1, requests))
+            server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+            threading.Thread(target=server.serve_forever, daemon=True, name="bench-ai-app").start()
+            cleanup.append(server.shutdown)
+            target = f"http://127.0.0.1:{server.server_port}"
+
+        from ai.ia_resilience import ai_caller
+        results = {}
+        with httpx.Client(base_url=target, headers=headers, limits=limits, timeout=JOB_TIMEOUT) as client:
+            for name, fn in build_cases(user_story_ids or [1]):
+                if only and name not in only:
+                    continue
+                # Cada ruta empieza con el circuito cerrado (solo afecta a la aplicación de este proceso)
+                ai_caller.breaker.reset()
+                results[name] = run_case(client, fn, requests, concurrency)
+        return results
+    finally:
+        for close in reversed(cleanup):
+            close()
+
+
+def seed_user_stories(app, count):
+    from src.db import db
+    from src.models.user_story import UserStory
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(UserStory), [UserStory.row_from_dict(fake_user_story(i)) for i in range(count)])
+        db.session.commit()
+        ids = [row.id for row in db.session.query(UserStory.id).order_by(UserStory.id)]
+        db.session.remove()
+    return ids
+
+
+def dispose_engine(app):
+    from src.db import db
+    with app.app_context():
+        db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Operaciones por ruta")
+    parser.add_argument("--concurrency", type=int, default=8, help="Operaciones en paralelo")
+    parser.add_argument("--route", action="append", help="Medir solo esta ruta (se puede repetir)")
+    parser.add_argument("--use-cache", action="store_true", help="No enviar Cache-Control: no-cache")
+    parser.add_argument("--target", help="URL de una aplicación ya arrancada (por defecto se arranca en este proceso)")
+    parser.add_argument("--simulator-url", help="URL de un simulador ya arrancado (por defecto se arranca en este proceso)")
+    parser.add_argument("--user-story-id", type=int, action="append", help="Historias para generate-tasks (con --target)")
+    parser.add_argument("--output", help="Fichero JSON con los resultados")
+    add_simulator_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    results = run_load(args.requests, args.concurrency, config, args.route, args.use_cache,
+                       args.target, args.simulator_url, args.user_story_id)
+    for route, r in results.items():
+        print(f"{route:<40} {r['throughput_rps']:>8.1f} ops/s  p50 {r['p50_ms']:>9.1f}  p95 {r['p95_ms']:>9.1f}  "
+              f"p99 {r['p99_ms']:>9.1f} ms  errores {r['errors']:>4}  {r['status_codes']}", file=sys.stderr)
+
+    if args.output:
+        document = {
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "target": args.target,
+                "simulator": args.simulator_url or vars(config),
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Benchmark reproducible de las rutas CRUD de task_routes.py y user_story_routes.py sobre SQLite
+con el cliente de pruebas de Flask (sin red ni servidor). Para cada ruta mide el throughput,
+la latencia p50/p95/p99 y las sentencias SQL por petición, guarda los resultados en JSON y,
+si se indica un baseline, marca como regresión lo que empeore por encima de los umbrales.
+
+Las rutas /ai/* y las que encolan trabajos de IA no se incluyen: dependen de Azure OpenAI.
+
+Uso:
+    python -m benchmarks.bench_routes --rows 1000 100000 --requests 200 --output bench.json
+    python -m benchmarks.bench_routes --baseline benchmarks/baseline.json   # sale con 1 si hay regresiones
+    python -m benchmarks.bench_routes --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from flask import Flask
+from sqlalchemy import event, insert
+from src.db import db
+from src.entity_cache import entity_cache
+from src.models.task import Task
+from src.models.user_story import UserStory
+from src.routes.task_routes import create_tasks_blueprint
+from src.routes.user_story_routes import create_user_stories_blueprint
+from src.utils import encode_cursor
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'templates')
+SEED_CHUNK = 10000
+TASKS_PER_STORY = 10
+# Umbrales por defecto: empeoramiento relativo admitido en latencia p95 y throughput
+DEFAULT_LATENCY_THRESHOLD = 0.25
+DEFAULT_THROUGHPUT_THRESHOLD = 0.25
+
+STATUSES = ["pendiente", "en progreso", "en revisión", "completada"]
+PRIORITIES = ["baja", "media", "alta", "bloqueante"]
+
+
+def fake_task(i, user_story_id=None):
+    return {
+        "title": f"Tarea de benchmark {i}",
+        "description": "Descripción de longitud media para simular una tarea real. " * 3,
+        "priority": PRIORITIES[i % len(PRIORITIES)],
+        "effort_hours": 1 + i % 8,
+        "status": STATUSES[i % len(STATUSES)],
+        "assigned_to": f"Equipo {i % 5}",
+        "user_story_id": user_story_id,
+    }
+
+
+def fake_user_story(i):
+    return {
+        "project": f"Proyecto {i % 20}",
+        "role": "Como usuario",
+        "goal": f"objetivo {i}",
+        "reason": "aportar valor",
+        "description": "Historia de usuario de benchmark. " * 3,
+        "priority": PRIORITIES[i % len(PRIORITIES)],
+        "story_points": 1 + i % 8,
+        "effort_hours": 4 + i % 16,
+    }
+
+
+def seed(rows):
+    """Inserta rows tareas y una historia por cada TASKS_PER_STORY tareas, en bloques executemany."""
+    stories = max(1, rows // TASKS_PER_STORY)
+    for start in range(0, stories, SEED_CHUNK):
+        batch = [UserStory.row_from_dict(fake_user_story(i)) for i in range(start, min(stories, start + SEED_CHUNK))]
+        db.session.execute(insert(UserStory), batch)
+    for start in range(0, rows, SEED_CHUNK):
+        batch = [Task.row_from_dict(fake_task(i, 1 + i % stories)) for i in range(start, min(rows, start + SEED_CHUNK))]
+        db.session.execute(insert(Task), batch)
+    db.session.commit()
+    return stories
+
+
+def build_cases(tasks, stories):
+    """
+    Casos de benchmark: (nombre, número máximo de peticiones o None, función(client, state, i) -> response).
+    Cada petición usa ids o cursores distintos para no medir solo los cachés en proceso.
+    state comparte los ids creados entre casos (las rutas DELETE borran lo creado por las POST).
+    """
+    rnd = random.Random(42)
+
+    def task_id():
+        return rnd.randint(1, tasks)
+
+    def story_id():
+        return rnd.randint(1, stories)
+
+    def post_task(client, state, i):
+        response = client.post('/tasks', json=fake_task(i))
+        state['tasks'].append(response.get_json()['id'])
+        return response
+
+    def post_tasks_bulk(client, state, i):
+        response = client.post('/tasks/bulk', json=[fake_task(i * 100 + j) for j in range(100)])
+        state['bulk_tasks'].append(response.get_json()['ids'])
+        return response
+
+    def post_user_story(client, state, i):
+        response = client.post('/user_stories', json=fake_user_story(i))
+        state['user_stories'].append(response.get_json()['id'])
+        return response
+
+    return [
+        ("GET /tasks", None, lambda c, s, i: c.get(f"/tasks?limit=50&cursor={encode_cursor(task_id())}")),
+        ("GET /tasks?status", None, lambda c, s, i: c.get(f"/tasks?limit=50&status=pendiente&cursor={encode_cursor(task_id())}")),
+        ("GET /tasks?project", None, lambda c, s, i: c.get(f"/tasks?limit=50&project=Proyecto {i % 20}&cursor={encode_cursor(task_id())}")),
+        ("GET /tasks/export", 20, lambda c, s, i: c.get(f"/tasks/export?format=ndjson&user_story_id={story_id()}")),
+        ("GET /tasks/<id>", None, lambda c, s, i: c.get(f"/tasks/{task_id()}")),
+        ("PUT /tasks/<id>", None, lambda c, s, i: c.put(f"/tasks/{task_id()}", json=fake_task(i, story_id()))),
+        ("POST /tasks", None, post_task),
+        ("DELETE /tasks/<id>", None, lambda c, s, i: c.delete(f"/tasks/{s['tasks'].pop()}")),
+        ("POST /tasks/bulk", 20, post_tasks_bulk),
+        ("PATCH /tasks/bulk", 20, lambda c, s, i: c.patch('/tasks/bulk', json={
+            "ids": [task_id() for _ in range(100)], "changes": {"assigned_to": f"Equipo {i}"}})),
+        ("DELETE /tasks/bulk", 20, lambda c, s, i: c.delete('/tasks/bulk', json={"ids": s['bulk_tasks'].pop()})),
+        ("GET /user_stories", None, lambda c, s, i: c.get(f"/user_stories?limit=50&cursor={encode_cursor(story_id())}")),
+        ("GET /user_stories/export", 20, lambda c, s, i: c.get(f"/user_stories/export?format=ndjson&project=Proyecto {i % 20}")),
+        ("GET /user_stories/<id>", None, lambda c, s, i: c.get(f"/user_stories/{story_id()}")),
+        ("PUT /user_stories/<id>", None, lambda c, s, i: c.put(f"/user_stories/{story_id()}", json=fake_user_story(i))),
+        ("POST /user_stories", None, post_user_story),
+        ("DELETE /user_stories/<id>", None, lambda c, s, i: c.delete(f"/user_stories/{s['user_stories'].pop()}")),
+        ("GET /user-stories (HTML)", 5, lambda c, s, i: c.get('/user-stories')),
+        ("GET /user-stories/<id>/tasks (HTML)", None, lambda c, s, i: c.get(f"/user-stories/{story_id()}/tasks")),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    # Percentil por el método del rango más cercano
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_case(client, state, statements, fn, requests):
+    latencies = []
+    sql_counts = []
+    entity_cache.clear()
+    start = time.perf_counter()
+    for i in range(requests):
+        before_sql = statements[0]
+        t0 = time.perf_counter()
+        response = fn(client, state, i)
+        response.get_data()  # Consume las respuestas en streaming
+        latencies.append(time.perf_counter() - t0)
+        sql_counts.append(statements[0] - before_sql)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "sql_statements_per_request": round(sum(sql_counts) / requests, 2),
+    }
+
+
+def run_scale(rows, requests, only=None):
+    """Crea una base de datos SQLite en un fichero temporal con rows tareas y mide todas las rutas."""
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__, template_folder=TEMPLATES_DIR)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+        app.register_blueprint(create_tasks_blueprint())
+        app.register_blueprint(create_user_stories_blueprint())
+        results = {}
+        with app.app_context():
+            db.create_all()
+            stories = seed(rows)
+            # Contador de sentencias SQL ejecutadas contra el engine
+            statements = [0]
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.__setitem__(0, statements[0] + 1))
+            client = app.test_client()
+            state = {'tasks': [], 'bulk_tasks': [], 'user_stories': []}
+            for name, cap, fn in build_cases(rows, stories):
+                if only and name not in only:
+                    continue
+                results[name] = run_case(client, state, statements, fn, min(requests, cap or requests))
+            db.session.remove()
+            db.engine.dispose()
+    return results
+
+
+def compare(results, baseline, latency_threshold=DEFAULT_LATENCY_THRESHOLD, throughput_threshold=DEFAULT_THROUGHPUT_THRESHOLD):
+    """
+    Compara los resultados con el baseline (misma estructura) y devuelve la lista de regresiones.
+    Las sentencias SQL son deterministas, así que cualquier aumento cuenta como regresión.
+    """
+    regressions = []
+    for rows, routes in results.items():
+        for route, current in routes.items():
+            reference = baseline.get(rows, {}).get(route)
+            if not reference:
+                continue
+            if current["p95_ms"] > reference["p95_ms"] * (1 + latency_threshold):
+                regressions.append(f"[{rows}] {route}: p95 {reference['p95_ms']} -> {current['p95_ms']} ms")
+            if current["throughput_rps"] < reference["throughput_rps"] * (1 - throughput_threshold):
+                regressions.append(f"[{rows}] {route}: throughput {reference['throughput_rps']} -> {current['throughput_rps']} req/s")
+            if current["sql_statements_per_request"] > reference["sql_statements_per_request"]:
+                regressions.append(
+                    f"[{rows}] {route}: SQL por petición {reference['sql_statements_per_request']} -> {current['sql_statements_per_request']}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000], help="Tamaños de la base de datos (p. ej. 1000 100000 1000000)")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por ruta")
+    parser.add_argument("--route", action="append", help="Medir solo esta ruta (se puede repetir)")
+    parser.add_argument("--output", help="Fichero JSON con los resultados")
+    parser.add_argument("--baseline", help="Baseline JSON con el que comparar")
+    parser.add_argument("--save-baseline", help="Guardar los resultados como nuevo baseline")
+    parser.add_argument("--latency-threshold", type=float, default=DEFAULT_LATENCY_THRESHOLD)
+    parser.add_argument("--throughput-threshold", type=float, default=DEFAULT_THROUGHPUT_THRESHOLD)
+    args = parser.parse_args()
+
+    results = {}
+    for rows in args.rows:
+        print(f"== {rows} tareas ==", file=sys.stderr)
+        results[str(rows)] = run_scale(rows, args.requests, args.route)
+        for route, r in results[str(rows)].items():
+            print(f"{route:<38} {r['throughput_rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  "
+                  f"p99 {r['p99_ms']:>8.2f} ms  SQL {r['sql_statements_per_request']:>5}", file=sys.stderr)
+
+    document = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "requests": args.requests,
+        },
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(document, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.latency_threshold, args.throughput_threshold)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("Sin regresiones respecto al baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
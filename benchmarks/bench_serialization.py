@@ -0,0 +1,73 @@
+"""
+Micro-benchmark de la serialización de listados: compara filas/segundo del camino anterior
+(objetos ORM -> TaskSchema.model_validate -> TaskSchemas.model_dump -> jsonify) con el
+camino rápido de src/serializers.py (filas de columnas -> TypeAdapter.dump_json).
+
+Uso: python -m benchmarks.bench_serialization --rows 20000 --repeat 5
+"""
+import argparse
+import time
+from flask import Flask, jsonify
+from sqlalchemy import insert
+from src.db import db
+from src.models.task import Task
+from src.models.user_story import UserStory  # Registra la tabla referenciada por la FK de tasks
+from src.managers.task_manager import TaskManager
+from src.schemas.task_schema import TaskSchema, TaskSchemas
+from src.serializers import dump_tasks_json, json_list_response
+
+
+def seed(rows):
+    task = {
+        "title": "Tarea de benchmark",
+        "description": "Descripción de longitud media para simular una tarea real. " * 3,
+        "priority": "alta",
+        "effort_hours": 3.5,
+        "status": "en progreso",
+        "assigned_to": "Backend Team",
+    }
+    db.session.execute(insert(Task), [Task.row_from_dict(task) for _ in range(rows)])
+    db.session.commit()
+
+
+def before(limit):
+    # Camino original de GET /tasks
+    tasks = Task.query.order_by(Task.id).limit(limit).all()
+    return jsonify(TaskSchemas(TaskSchemasList=[TaskSchema.model_validate(t) for t in tasks]).model_dump()).get_data()
+
+
+def after(limit):
+    rows, _ = TaskManager().get_tasks_page(limit=limit)
+    return json_list_response('TaskSchemasList', dump_tasks_json(rows)).get_data()
+
+
+def measure(function, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        function(rows)
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    with app.test_request_context():
+        db.create_all()
+        seed(args.rows)
+        results = {"antes": measure(before, args.rows, args.repeat), "después": measure(after, args.rows, args.repeat)}
+    for name, rate in results.items():
+        print(f"{name:>8}: {rate:12,.0f} filas/s")
+    print(f"  mejora: {results['después'] / results['antes']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
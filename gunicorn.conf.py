@@ -0,0 +1,45 @@
+# Configuración de gunicorn para producción: gunicorn -c gunicorn.conf.py
+# Recarga sin cortar peticiones: kill -HUP <pid del maestro> (con preload, el código nuevo
+# requiere USR2 + QUIT del maestro antiguo, o reiniciar el contenedor con un rolling update).
+import multiprocessing
+import os
+
+wsgi_app = "src.app:create_app()"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Procesos (uno por núcleo por defecto) y hilos por proceso: las rutas de IA pasan la mayor parte
+# del tiempo esperando a Azure, así que los hilos permiten atender otras peticiones mientras tanto
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# La app reparte la cuota de Azure OpenAI (AI_RATE_LIMIT_RPM/TPM) entre los workers a partir de esta variable
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+
+# Carga la app una vez en el maestro y la comparte con los workers (copy-on-write)
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Las llamadas a la IA y los streams SSE pueden tardar: timeout amplio y tiempo de gracia
+# para terminar las peticiones en curso al reiniciar o recargar
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Reciclado periódico de workers (con jitter para que no reinicien todos a la vez)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    # Una sola vez al arrancar (en el maestro): los trabajos que dejó sin terminar una ejecución
+    # anterior y llevan más de JOB_STALE_TIMEOUT se marcan como error
+    from src.app import recover_jobs
+    recover_jobs(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    # worker.app.wsgi() devuelve la app ya cargada en el maestro (preload) o la carga ahora
+    from src.app import after_fork
+    after_fork(worker.app.wsgi())
@@ -1 +1,2 @@
 # Este archivo permite que Python trate este directorio como un paquete.
+import src.config  # noqa: F401  Carga el .env antes que el resto de módulos
@@ -0,0 +1,105 @@
+# Factoría de la aplicación Flask: la usan main.py (desarrollo), gunicorn (producción) y los comandos flask.
+import os
+import sys
+import click
+from flask import Flask
+from src.config import AI_ENABLED
+from src.db import db, init_db
+from src.metrics import init_metrics
+from src.routes.task_routes import create_tasks_blueprint
+from src.routes.user_story_routes import create_user_stories_blueprint
+from src.routes.job_routes import create_jobs_blueprint
+from src.routes.report_routes import create_reports_blueprint
+from src.routes.search_routes import create_search_blueprint
+
+# Ruta absoluta a la carpeta templates
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+
+def create_app(config=None):
+    """
+    Crea y configura la aplicación. config permite sobrescribir la configuración (p. ej. en tests,
+    SQLALCHEMY_DATABASE_URI). No crea el esquema: para eso está el comando upgrade-db.
+    Con AI_ENABLED=False no se registran los endpoints /ai/* ni se importa el SDK de OpenAI.
+    """
+    app = Flask(__name__, template_folder=TEMPLATES_DIR)
+    app.config.update(config or {})
+    app.config.setdefault('AI_ENABLED', AI_ENABLED)
+
+    # Configuración diferente para desarrollo vs producción
+    if os.environ.get('FLASK_ENV') == 'production':
+        app.debug = False
+        app.config['SECRET_KEY'] = app.config.get('SECRET_KEY') or os.environ.get('SECRET_KEY', 'production-secret-key')
+    else:
+        from flask_debugtoolbar import DebugToolbarExtension
+        app.debug = True
+        app.config['SECRET_KEY'] = app.config.get('SECRET_KEY') or 'dev'  # Necesario para la toolbar
+        app.config.setdefault('DEBUG_TB_INTERCEPT_REDIRECTS', False)  # Opcional, para no interceptar redirecciones
+        DebugToolbarExtension(app)
+
+    init_db(app)
+    init_metrics(app)
+    app.register_blueprint(create_tasks_blueprint())
+    app.register_blueprint(create_user_stories_blueprint())
+    app.register_blueprint(create_jobs_blueprint())
+    app.register_blueprint(create_reports_blueprint())
+    app.register_blueprint(create_search_blueprint())
+    if app.config['AI_ENABLED']:
+        from src.routes.ai_routes import create_ai_blueprint
+        app.register_blueprint(create_ai_blueprint())
+    register_commands(app)
+    return app
+
+
+def register_commands(app):
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Crea las tablas e índices que falten: flask --app main upgrade-db"""
+        from src.migrations import upgrade_schema
+        created = upgrade_schema()
+        click.echo(f"Índices creados: {', '.join(created) if created else 'ninguno'}")
+
+    @app.cli.command('recover-jobs')
+    @click.option('--older-than', type=int, default=None,
+                  help='Segundos sin terminar a partir de los que un trabajo se da por perdido (por defecto JOB_STALE_TIMEOUT)')
+    def recover_jobs_command(older_than):
+        """Marca como error los trabajos interrumpidos: flask --app main recover-jobs"""
+        click.echo(f"Trabajos marcados como error: {recover_jobs(app, older_than)}")
+
+    @app.cli.command('rebuild-report-summary')
+    def rebuild_report_summary_command():
+        """Recalcula la tabla resumen de informes: flask --app main rebuild-report-summary"""
+        from src.managers.report_manager import ReportManager
+        groups = ReportManager().rebuild_summary()
+        click.echo(f"Grupos recalculados: {groups}")
+
+
+def recover_jobs(app, older_than=None):
+    """
+    Marca como error los trabajos que quedaron sin terminar en una ejecución anterior (hook when_ready
+    de gunicorn y comando recover-jobs). Si la base de datos no está disponible no impide arrancar.
+    """
+    from src.managers.job_manager import JobManager
+    with app.app_context():
+        try:
+            return JobManager().recover_stale_jobs(older_than)
+        except Exception as e:
+            app.logger.warning("No se pudieron recuperar los trabajos interrumpidos: %s", e)
+            return 0
+        finally:
+            db.session.remove()
+
+
+def after_fork(app):
+    """
+    Se llama en cada worker justo después del fork (hook post_fork de gunicorn). Con preload la app
+    se crea en el proceso maestro: los pools de conexiones heredados no deben compartirse entre
+    procesos, así que cada worker descarta los suyos (sin cerrar los sockets del maestro) y abre
+    conexiones nuevas bajo demanda.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    # Si el maestro no llegó a importar el cliente de IA no hay nada heredado que descartar
+    if 'ai.ia_client' in sys.modules:
+        sys.modules['ai.ia_client'].reset_ai_client(close=False)
@@ -1,3 +1,11 @@
 import os
+from dotenv import load_dotenv
+
+# Único punto que carga el fichero .env: se importa desde src/__init__.py y ai/__init__.py,
+# antes de que cualquier módulo lea sus variables de entorno
+load_dotenv()
+
 # This file contains the configuration for the task manager, including the data file path.
 DATA_FILE = os.environ.get("DATA_FILE", "tasks.json")
+# false arranca la aplicación sin los endpoints de IA ni el SDK de OpenAI (workers solo CRUD)
+AI_ENABLED = os.getenv("AI_ENABLED", "true").lower() != "false"
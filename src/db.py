@@ -1,9 +1,11 @@
 import os
-from dotenv import load_dotenv
+from collections import defaultdict, deque
+from functools import wraps
+from sqlalchemy import insert
 from flask_sqlalchemy import SQLAlchemy
-from flask import Flask
-
-load_dotenv()
+from sqlalchemy.engine import make_url
+from flask_sqlalchemy.session import Session
+from flask import Flask, current_app, has_request_context, request
 
 # Configuración de la base de datos MySQL en Azure
 MYSQL_USER = os.getenv("MYSQL_USER")
@@ -12,23 +14,149 @@ MYSQL_HOST = os.getenv("MYSQL_HOST")
 MYSQL_DB = os.getenv("MYSQL_DB")
 MYSQL_PORT=os.getenv("MYSQL_PORT")     
 MYSQL_SSL_CA=os.getenv("MYSQL_SSL_CA")
+# Réplica de lectura opcional (mismo usuario, base de datos y certificado que el primario)
+MYSQL_REPLICA_HOST = os.getenv("MYSQL_REPLICA_HOST")
 
+# Pool de conexiones del engine. Azure Database for MySQL cierra las conexiones inactivas:
+# pool_recycle las renueva antes y pool_pre_ping descarta las que ya estén caídas.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "280"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
-def get_database_uri():
+# Clave del bind de la réplica en SQLALCHEMY_BINDS
+REPLICA_BIND_KEY = "replica"
+
+# Filas por sentencia en las inserciones masivas: un INSERT multi-VALUES de MAX_BULK_SIZE filas
+# queda por debajo del límite de parámetros de SQLite (32766) y PostgreSQL (65535)
+DB_INSERT_BATCH_SIZE = int(os.getenv("DB_INSERT_BATCH_SIZE", "1000"))
+
+
+def _mysql_uri(host):
     return (
-        f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+        f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{host}:{MYSQL_PORT}/{MYSQL_DB}"
         f"?ssl_ca={MYSQL_SSL_CA}" if MYSQL_SSL_CA else
-        f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+        f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{host}:{MYSQL_PORT}/{MYSQL_DB}"
     )
 
 
+def get_database_uri():
+    # DATABASE_URL permite usar otra base de datos (p. ej. un fichero SQLite en local)
+    return os.getenv("DATABASE_URL") or _mysql_uri(MYSQL_HOST)
+
+
+def get_replica_uri():
+    """URI de la réplica de lectura (DATABASE_REPLICA_URL o MYSQL_REPLICA_HOST), o None si no hay."""
+    if os.getenv("DATABASE_REPLICA_URL"):
+        return os.getenv("DATABASE_REPLICA_URL")
+    return _mysql_uri(MYSQL_REPLICA_HOST) if MYSQL_REPLICA_HOST else None
+
+
+def _uses_queue_pool(uri):
+    # SQLite en memoria usa SingletonThreadPool/StaticPool, que no admiten las opciones de tamaño del pool
+    url = make_url(uri)
+    if url.get_backend_name() != "sqlite":
+        return True
+    return url.database not in (None, "", ":memory:") and url.query.get("mode") != "memory"
+
+
+def get_engine_options(uri=None):
+    """Opciones del engine para uri; las de tamaño del pool solo si el engine usa QueuePool."""
+    options = {
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if uri is None or _uses_queue_pool(uri):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+class RoutingSession(Session):
+    """
+    Sesión que envía a la réplica las lecturas de las rutas marcadas con read_only (si hay réplica
+    configurada). Los flush y las sentencias INSERT/UPDATE/DELETE van siempre al primario.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and _in_read_only_route()
+            and not getattr(clause, "is_dml", False)
+        ):
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """
+    Marca una ruta como de solo lectura: sus consultas se hacen contra la réplica.
+    La réplica puede ir con retraso respecto al primario, así que no debe usarse en rutas
+    que necesiten leer lo que se acaba de escribir.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+    wrapper.db_read_only = True
+    return wrapper
+
+
+def reads_from_replica():
+    """True si las consultas de la petición en curso van a la réplica (ruta read_only y réplica configurada)."""
+    return _in_read_only_route() and REPLICA_BIND_KEY in db.engines
+
+
+def _in_read_only_route():
+    # Se consulta la vista de la petición en curso (también durante las respuestas en streaming)
+    if not has_request_context() or request.endpoint is None:
+        return False
+    return getattr(current_app.view_functions.get(request.endpoint), "db_read_only", False)
+
+
 # Instancia global de SQLAlchemy (debe ser importada en los modelos)
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 # Función para inicializar la base de datos con la app Flask
+# (la configuración ya presente en app.config, p. ej. la de create_app, tiene prioridad)
 def init_db(app: Flask):
-    app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri()
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', get_database_uri())
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', get_engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    replica_uri = get_replica_uri()
+    if replica_uri and 'SQLALCHEMY_BINDS' not in app.config:
+        # Las opciones del engine por defecto no se heredan en los binds: se repiten para la réplica
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND_KEY: {"url": replica_uri, **get_engine_options(replica_uri)}}
     db.init_app(app)
 
+
+def insert_rows(model, rows):
+    """
+    Inserta rows (diccionarios de columnas con las mismas claves) en una sola ida y vuelta por cada
+    DB_INSERT_BATCH_SIZE filas y devuelve los ids en el orden de entrada, o None si el dialecto no admite
+    RETURNING (MySQL). Se usa executemany con RETURNING sin orden: SQLAlchemy lo agrupa en un INSERT
+    multi-VALUES ya compilado ("insertmanyvalues"), mientras que con sort_by_parameter_order=True SQLite
+    vuelve a un INSERT por fila. Cada id se empareja con su fila por el valor de las columnas insertadas
+    (las filas idénticas son intercambiables).
+    """
+    if not db.session.get_bind().dialect.insert_returning:
+        db.session.execute(insert(model), rows)  # MySQL agrupa el executemany en un INSERT multi-VALUES
+        return None
+    columns = list(rows[0])
+    positions = defaultdict(deque)
+    for i, row in enumerate(rows):
+        positions[_row_key(row[c] for c in columns)].append(i)
+    ids = [None] * len(rows)
+    stmt = insert(model).returning(model.id, *(getattr(model, c) for c in columns))
+    result = db.session.execute(stmt, rows, execution_options={"insertmanyvalues_page_size": DB_INSERT_BATCH_SIZE})
+    for row in result:
+        ids[positions[_row_key(row[1:])].popleft()] = row[0]
+    return ids
+
+
+def _row_key(values):
+    # Los FLOAT de precisión simple (MariaDB) no devuelven exactamente el float insertado
+    return tuple(float(f"{v:.6g}") if isinstance(v, float) else v for v in values)
@@ -0,0 +1,227 @@
+# Caché de lectura de entidades (get_task / get_user_story) con invalidación en las escrituras.
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Configuración (variables de entorno)
+ENTITY_CACHE_BACKEND = os.getenv("ENTITY_CACHE_BACKEND", "memory")  # memory | redis | none
+ENTITY_CACHE_URL = os.getenv("ENTITY_CACHE_URL", "redis://localhost:6379/0")
+ENTITY_CACHE_MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "10000"))
+# Con el backend en memoria cada proceso tiene su copia: el TTL acota cuánto puede durar un dato
+# que otro worker ha modificado. Con un backend compartido la invalidación es global.
+ENTITY_CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", "60"))
+
+
+class MemoryBackend:
+    """LRU en proceso con TTL, seguro entre hilos."""
+
+    def __init__(self, max_entries=ENTITY_CACHE_MAX_ENTRIES, ttl=ENTITY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()  # clave -> (instante de expiración, valor)
+        self._generations = OrderedDict()  # clave -> número de invalidaciones (solo claves invalidadas)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def lease(self, key):
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def set(self, key, value, lease=None):
+        with self._lock:
+            # Si la clave se invalidó después de tomar el lease, el valor puede ser anterior a la escritura
+            if lease is not None and lease != self._generations.get(key, 0):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._generations.move_to_end(key)
+            while len(self._generations) > self.max_entries:
+                # Olvidar una generación la devuelve a 0: se borra también su entrada por si era de un lease antiguo
+                old_key, _ = self._generations.popitem(last=False)
+                self._entries.pop(old_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class SharedBackend:
+    """
+    Backend compartido entre procesos sobre un cliente con la interfaz de redis-py
+    (get, mget, set con ex, delete, incr, expire). En tests se puede sustituir por un objeto local equivalente.
+    Los valores se guardan como JSON junto con la generación de la clave (contador de invalidaciones)
+    vigente cuando se leyeron; al leer, una entrada de una generación anterior se trata como ausente.
+    Las expulsiones las gestiona el propio servidor.
+    """
+
+    def __init__(self, client, ttl=ENTITY_CACHE_TTL, prefix="entity:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _generation_key(self, key):
+        return f"{self.prefix}gen:{key}"
+
+    def get(self, key):
+        raw, generation = self.client.mget(self.prefix + key, self._generation_key(key))
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if entry["generation"] != int(generation or 0):
+            return None
+        return entry["value"]
+
+    def lease(self, key):
+        return int(self.client.get(self._generation_key(key)) or 0)
+
+    def set(self, key, value, lease=None):
+        generation = self.lease(key) if lease is None else lease
+        self.client.set(self.prefix + key, json.dumps({"generation": generation, "value": value}), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+            for key in keys:
+                # El contador dura más que cualquier entrada: al expirar no queda ninguna que pueda coincidir
+                self.client.incr(self._generation_key(key))
+                self.client.expire(self._generation_key(key), self.ttl * 2)
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "shared", "evictions": None}
+
+
+class EntityCache:
+    """
+    Caché read-through de entidades: los managers leen de aquí antes de ir a la base de datos
+    e invalidan las claves al actualizar o eliminar. Los valores son diccionarios (to_dict).
+    Para que un lector lento no vuelva a cachear una fila anterior a una escritura, en un fallo se
+    toma un lease antes de consultar la base de datos y se pasa a set: si entretanto se invalidó
+    la clave, el valor se descarta.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidation_errors = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            # Un fallo del backend compartido no debe tumbar la lectura: se va a la base de datos
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def lease(self, key):
+        """Token de la clave para set; se toma antes de leer de la base de datos."""
+        if self.backend is None:
+            return None
+        try:
+            return self.backend.lease(key)
+        except Exception:
+            return None
+
+    def set(self, key, value, lease=None):
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(key, value, lease)
+        except Exception:
+            pass
+
+    def invalidate(self, *keys):
+        # Se llama después del commit: si el backend compartido falla, la escritura ya está hecha y no debe
+        # responder con error. Las claves que no se pudieron invalidar caducan como mucho en ENTITY_CACHE_TTL
+        if self.backend is None or not keys:
+            return
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            with self._lock:
+                self.invalidation_errors += 1
+            logging.getLogger(__name__).warning("No se pudieron invalidar %d claves del caché de entidades: %s", len(keys), e)
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.misses = self.invalidation_errors = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                "enabled": self.backend is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "invalidation_errors": self.invalidation_errors,
+            }
+        if self.backend is not None:
+            stats.update(self.backend.stats())
+        return stats
+
+
+def create_entity_cache():
+    """Crea el caché según ENTITY_CACHE_BACKEND. redis es una dependencia opcional."""
+    if ENTITY_CACHE_BACKEND == "none":
+        return EntityCache()
+    if ENTITY_CACHE_BACKEND == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("ENTITY_CACHE_BACKEND=redis requiere instalar el paquete 'redis'")
+        return EntityCache(SharedBackend(redis.Redis.from_url(ENTITY_CACHE_URL)))
+    return EntityCache(MemoryBackend())
+
+
+def task_key(task_id):
+    return f"task:{task_id}"
+
+
+def user_story_key(user_story_id):
+    return f"user_story:{user_story_id}"
+
+
+# Instancia compartida por todo el proceso
+entity_cache = create_entity_cache()
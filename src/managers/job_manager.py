@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import func, update
+from src.models.job import Job
+from src.models.enums import JobStatusEnum
+from src.db import db
+
+# Pool de hilos compartido que ejecuta los trabajos en segundo plano
+_job_pool = ThreadPoolExecutor(max_workers=int(os.getenv("JOB_MAX_WORKERS", "4")), thread_name_prefix="jobs")
+# Segundos sin latido tras los que un trabajo sin terminar se da por perdido (su worker murió o se recicló)
+JOB_STALE_TIMEOUT = int(os.getenv("JOB_STALE_TIMEOUT", "600"))
+# Cada cuántos segundos el proceso renueva heartbeat_at de los trabajos que tiene en cola o ejecutando
+JOB_HEARTBEAT_INTERVAL = int(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+STALE_JOB_ERROR = "El trabajo se interrumpió: el proceso que lo ejecutaba terminó antes de completarlo"
+UNFINISHED_STATUSES = (JobStatusEnum.pendiente, JobStatusEnum.en_progreso)
+
+
+# Trabajos encolados o en ejecución en este proceso (id -> app), a los que el hilo de latidos mantiene vivos
+_live_jobs = {}
+_heartbeat_thread = None
+_heartbeat_lock = threading.Lock()
+
+
+def _utcnow():
+    # created_at lo asigna la base de datos en UTC y sin zona horaria
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _last_seen(job):
+    # Los trabajos anteriores a heartbeat_at no tienen latido: cuenta desde su creación
+    return job.heartbeat_at or job.created_at
+
+def _track_job(app, job_id):
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        _live_jobs[job_id] = app
+        # Tras un fork (gunicorn) el hilo del padre no existe en el hijo: se arranca de nuevo
+        if _heartbeat_thread is None or not _heartbeat_thread.is_alive():
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="jobs-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        send_heartbeats()
+
+def send_heartbeats():
+    """
+    Renueva heartbeat_at de los trabajos pendientes o en progreso de este proceso: mientras el proceso
+    viva, un trabajo que espera en una cola llena o tarda más que JOB_STALE_TIMEOUT no se da por perdido.
+    """
+    with _heartbeat_lock:
+        by_app = {}
+        for job_id, app in _live_jobs.items():
+            by_app.setdefault(app, []).append(job_id)
+    for app, job_ids in by_app.items():
+        with app.app_context():
+            try:
+                db.session.execute(
+                    update(Job)
+                    .where(Job.id.in_(job_ids), Job.status.in_(UNFINISHED_STATUSES))
+                    .values(heartbeat_at=_utcnow())
+                )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.warning("No se pudo renovar el latido de los trabajos: %s", e)
+            finally:
+                db.session.remove()
+
+class JobManager:
+    """
+    Cola local de trabajos en segundo plano. El estado se guarda en la tabla jobs para que
+    cualquier proceso pueda responder a las consultas de estado; la ejecución usa un pool de hilos.
+    Mientras el proceso vive renueva heartbeat_at de sus trabajos sin terminar (send_heartbeats). Si el
+    proceso termina con trabajos sin acabar, estos quedan en la tabla: los que llevan más de stale_timeout
+    segundos sin latido se marcan como error al consultarlos (get_job) y al arrancar (recover_stale_jobs),
+    para que los clientes dejen de esperarlos. Los cambios de estado de _run_job son UPDATE condicionales,
+    así que un trabajo ya dado por perdido no vuelve a cambiar.
+    handlers asocia cada tipo de trabajo con la función que lo ejecuta (recibe el payload como kwargs
+    y devuelve un resultado serializable a JSON). También puede ser una función sin argumentos que
+    devuelva ese diccionario: se llama la primera vez que hace falta, para no importar los módulos
+    de los handlers (p. ej. la pila de IA) al arrancar.
+    """
+    def __init__(self, handlers=None, stale_timeout=JOB_STALE_TIMEOUT):
+        self._handlers = handlers or {}
+        self.stale_timeout = stale_timeout
+
+    @property
+    def handlers(self):
+        if callable(self._handlers):
+            self._handlers = self._handlers()
+        return self._handlers
+
+    def submit_job(self, kind, payload):
+        if kind not in self.handlers:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+        job = Job(id=str(uuid.uuid4()), kind=kind, status=JobStatusEnum.pendiente, payload=json.dumps(payload),
+                  heartbeat_at=_utcnow())
+        db.session.add(job)
+        db.session.commit()
+        # El trabajo necesita su propio app_context, ya que se ejecuta fuera de la petición
+        app = current_app._get_current_object()
+        _track_job(app, job.id)
+        _job_pool.submit(self._run_job, app, job.id)
+        return job
+
+    def get_job(self, job_id):
+        # populate_existing: el estado lo cambia otro hilo, no reutilizar la copia de la sesión
+        job = Job.query.populate_existing().get(job_id)
+        last_seen = job and _last_seen(job)
+        if job and job.status in UNFINISHED_STATUSES and last_seen and last_seen.replace(tzinfo=None) < self._stale_cutoff():
+            self.recover_stale_jobs(job_ids=[job_id])
+            job = Job.query.populate_existing().get(job_id)
+        return job
+
+    def recover_stale_jobs(self, older_than=None, job_ids=None):
+        """
+        Marca como error los trabajos pendientes o en progreso sin latido desde hace más de older_than
+        segundos (por defecto stale_timeout), opcionalmente solo los de job_ids. Devuelve cuántos se han
+        marcado. El UPDATE es condicional: un trabajo que termine a la vez conserva su resultado.
+        """
+        last_seen = func.coalesce(Job.heartbeat_at, Job.created_at)
+        stmt = (
+            update(Job)
+            .where(Job.status.in_(UNFINISHED_STATUSES), last_seen < self._stale_cutoff(older_than))
+            .values(status=JobStatusEnum.error, error=STALE_JOB_ERROR, finished_at=datetime.now(timezone.utc))
+        )
+        if job_ids is not None:
+            stmt = stmt.where(Job.id.in_(job_ids))
+        recovered = db.session.execute(stmt).rowcount
+        db.session.commit()
+        return recovered
+
+    def _stale_cutoff(self, older_than=None):
+        return _utcnow() - timedelta(seconds=self.stale_timeout if older_than is None else older_than)
+
+    def _run_job(self, app, job_id):
+        with app.app_context():
+            try:
+                # Solo se ejecuta si sigue pendiente: uno que esperó en la cola y se dio por perdido no
+                now = _utcnow()
+                claimed = db.session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JobStatusEnum.pendiente)
+                    .values(status=JobStatusEnum.en_progreso, started_at=now, heartbeat_at=now)
+                ).rowcount
+                db.session.commit()
+                if not claimed:
+                    return
+                job = Job.query.get(job_id)
+                try:
+                    result = self.handlers[job.kind](**json.loads(job.payload))
+                    outcome = {"status": JobStatusEnum.completado, "result": json.dumps(result)}
+                except Exception as e:
+                    db.session.rollback()
+                    outcome = {"status": JobStatusEnum.error, "error": str(e)}
+                # Si mientras tanto se dio por perdido (recover_stale_jobs), conserva ese estado
+                db.session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JobStatusEnum.en_progreso)
+                    .values(finished_at=datetime.now(timezone.utc), **outcome)
+                )
+                db.session.commit()
+            finally:
+                with _heartbeat_lock:
+                    _live_jobs.pop(job_id, None)
@@ -0,0 +1,80 @@
+from sqlalchemy import func, select
+from src.models.report_summary import ReportSummary
+from src.models.task import Task
+from src.models.user_story import UserStory
+from src.db import db
+from src.summaries import report_summary, summary_value, TASKS, USER_STORIES, TASK_DIMENSIONS, USER_STORY_DIMENSIONS
+
+class ReportManager:
+    """
+    Informes agregados (horas de esfuerzo y story points) calculados en la base de datos.
+    Si la tabla resumen está activa se lee de ella (O(grupos)); si no, o si hay filtros, con GROUP BY.
+    """
+
+    def __init__(self, summary=None):
+        self.summary = summary or report_summary
+
+    def task_totals(self, group_by, project=None):
+        """
+        Número de tareas y horas de esfuerzo agrupadas por project, status, priority o assigned_to,
+        opcionalmente solo de un proyecto. Lanza ValueError si la dimensión no es válida.
+        """
+        if group_by not in TASK_DIMENSIONS:
+            raise ValueError(f"group_by debe ser uno de: {', '.join(TASK_DIMENSIONS)}")
+        if self.summary.enabled and project is None:
+            return [
+                {group_by: row.value or None, 'task_count': row.item_count, 'effort_hours': round(row.effort_hours, 2)}
+                for row in self._summary_rows(TASKS, group_by)
+            ]
+        column = TASK_DIMENSIONS[group_by]
+        query = (
+            select(column, func.count(Task.id), func.coalesce(func.sum(Task.effort_hours), 0))
+            .select_from(Task)
+            .outerjoin(UserStory, Task.user_story_id == UserStory.id)
+            .group_by(column)
+            .order_by(column)
+        )
+        if project is not None:
+            query = query.where(UserStory.project == project)
+        return [
+            {group_by: summary_value(value) or None, 'task_count': count, 'effort_hours': round(effort_hours, 2)}
+            for value, count, effort_hours in db.session.execute(query)
+        ]
+
+    def user_story_totals(self, group_by):
+        """
+        Número de historias, story points y horas de esfuerzo agrupados por project o priority.
+        Lanza ValueError si la dimensión no es válida.
+        """
+        if group_by not in USER_STORY_DIMENSIONS:
+            raise ValueError(f"group_by debe ser uno de: {', '.join(USER_STORY_DIMENSIONS)}")
+        if self.summary.enabled:
+            return [
+                {group_by: row.value, 'story_count': row.item_count, 'story_points': row.story_points,
+                 'effort_hours': round(row.effort_hours, 2)}
+                for row in self._summary_rows(USER_STORIES, group_by)
+            ]
+        column = USER_STORY_DIMENSIONS[group_by]
+        query = select(
+            column, func.count(UserStory.id),
+            func.coalesce(func.sum(UserStory.story_points), 0), func.coalesce(func.sum(UserStory.effort_hours), 0)
+        ).group_by(column).order_by(column)
+        return [
+            {group_by: summary_value(value), 'story_count': count, 'story_points': story_points,
+             'effort_hours': round(effort_hours, 2)}
+            for value, count, story_points, effort_hours in db.session.execute(query)
+        ]
+
+    def rebuild_summary(self):
+        """Recalcula la tabla resumen desde cero y hace commit. Devuelve el número de grupos."""
+        groups = self.summary.rebuild()
+        db.session.commit()
+        return groups
+
+    def _summary_rows(self, source, dimension):
+        # Los grupos que se han quedado sin elementos se conservan con contador 0 y no se muestran
+        return db.session.execute(
+            select(ReportSummary.value, ReportSummary.item_count, ReportSummary.effort_hours, ReportSummary.story_points)
+            .where(ReportSummary.source == source, ReportSummary.dimension == dimension, ReportSummary.item_count > 0)
+            .order_by(ReportSummary.value)
+        ).all()
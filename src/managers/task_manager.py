@@ -1,35 +1,192 @@
+from sqlalchemy import update, delete
+from sqlalchemy.orm.exc import StaleDataError
 from src.models.task import Task
-from src.db import db
+from src.models.user_story import UserStory
+from src.models.enums import PriorityEnum, StatusEnum
+from src.db import db, reads_from_replica, insert_rows
+from src.versioning import bump_table_versions, versioned_update, VersionConflictError
+from src.entity_cache import entity_cache, task_key
+from src.summaries import report_summary
+from src.search import search_index, TASK_SEARCH_COLUMNS
+from src.serializers import TASK_COLUMNS
+from src.utils import DEFAULT_PAGE_SIZE, EXPORT_BATCH_SIZE
 
 class TaskManager:
     def add_task(self, data):
         task = Task.from_dict(data)
         db.session.add(task)
+        db.session.flush()  # asigna el id para el índice de búsqueda
+        search_index.reindex_tasks([task.id])
+        report_summary.record_task_rows([Task.row_from_dict(data)])
+        bump_table_versions('tasks')
         db.session.commit()
         return task
 
+    def add_tasks(self, data_list):
+        """
+        Inserta varias tareas con un único INSERT multi-VALUES (insert_rows) dentro de una sola transacción.
+        Devuelve los ids creados en el orden de entrada si el dialecto admite RETURNING
+        (SQLite, PostgreSQL, MariaDB); en MySQL devuelve None.
+        """
+        rows = [Task.row_from_dict(data) for data in data_list]
+        if not rows:
+            return []
+        ids = insert_rows(Task, rows)
+        if ids is not None:
+            search_index.reindex_tasks(ids)
+        # Sin RETURNING (MySQL) el índice FULLTEXT lo mantiene el propio motor
+        report_summary.record_task_rows(rows)
+        bump_table_versions('tasks')
+        db.session.commit()
+        return ids
+
     def get_task(self, task_id):
-        return Task.query.get(task_id)
+        """
+        Lectura read-through: primero el caché de entidades y, si no está, la base de datos.
+        En un acierto devuelve una tarea transitoria (no asociada a la sesión), válida solo para lectura.
+        """
+        cached = entity_cache.get(task_key(task_id))
+        if cached is not None:
+            return Task.from_cached_dict(cached)
+        lease = entity_cache.lease(task_key(task_id))
+        task = Task.query.get(task_id)
+        # Lo leído de la réplica puede ir con retraso: no se cachea (seguiría sirviéndose tras ponerse al día)
+        if task and not reads_from_replica():
+            entity_cache.set(task_key(task_id), task.to_dict(), lease=lease)
+        return task
 
     def get_all_tasks(self):
         return Task.query.all()
 
+    def get_tasks_by_user_story(self, user_story_id):
+        """
+        Devuelve las filas (columnas, sin objetos ORM) de las tareas de una historia de usuario
+        filtrando en SQL (usa ix_tasks_user_story_id_status).
+        """
+        return Task.query.with_entities(*TASK_COLUMNS).filter(Task.user_story_id == user_story_id).order_by(Task.id).all()
+
+    def get_tasks_page(self, filters=None, limit=DEFAULT_PAGE_SIZE, after_id=None):
+        """
+        Devuelve una página de filas de tareas (columnas, sin objetos ORM) ordenada por id (paginación keyset) y el id
+        a partir del cual pedir la siguiente página, o None si no hay más.
+        Los filtros se aplican en SQL: status, priority, assigned_to, user_story_id y project.
+        """
+        query = self._filtered_query(filters).with_entities(*TASK_COLUMNS)
+        if after_id is not None:
+            query = query.filter(Task.id > after_id)
+        # Se pide un elemento extra para saber si existe una página siguiente
+        tasks = query.order_by(Task.id).limit(limit + 1).all()
+        next_id = tasks[limit - 1].id if len(tasks) > limit else None
+        return tasks[:limit], next_id
+
+    def iter_tasks(self, filters=None, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Devuelve un iterable con las filas de todas las tareas que cumplen los filtros usando un cursor de servidor
+        (yield_per activa stream_results), de modo que solo hay batch_size filas en memoria a la vez.
+        """
+        # La query se construye aquí para que los filtros no válidos fallen antes de empezar a emitir
+        query = self._filtered_query(filters).with_entities(*TASK_COLUMNS).order_by(Task.id)
+        return query.yield_per(batch_size)
+
+    def _filtered_query(self, filters):
+        # Aplica en SQL los filtros admitidos: status, priority, assigned_to, user_story_id y project
+        filters = filters or {}
+        query = Task.query
+        if filters.get('status'):
+            query = query.filter(Task.status == StatusEnum(filters['status']))
+        if filters.get('priority'):
+            query = query.filter(Task.priority == PriorityEnum(filters['priority']))
+        if filters.get('assigned_to'):
+            query = query.filter(Task.assigned_to == filters['assigned_to'])
+        if filters.get('user_story_id') is not None:
+            query = query.filter(Task.user_story_id == int(filters['user_story_id']))
+        if filters.get('project'):
+            query = query.join(UserStory, Task.user_story_id == UserStory.id).filter(UserStory.project == filters['project'])
+        return query
+
     def update_task(self, task_id, updates):
         task = Task.query.get(task_id)
         if not task:
             return None
         # Ignorar campos que no deben actualizarse
-        updates = {k: v for k, v in updates.items() if k not in ('id', 'created_at')}
+        updates = {k: v for k, v in updates.items() if k not in ('id', 'created_at', 'version')}
+        before = report_summary.capture_tasks([task_id])
         for key, value in updates.items():
             if hasattr(task, key):
                 setattr(task, key, value)
-        db.session.commit()
+        if set(updates) & set(TASK_SEARCH_COLUMNS):
+            search_index.reindex_tasks([task_id])
+        report_summary.record_tasks([task_id], before)
+        bump_table_versions('tasks')
+        try:
+            # version_id_col: el UPDATE del ORM incluye WHERE version = <la leída> e incrementa la versión
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            raise VersionConflictError()
+        entity_cache.invalidate(task_key(task_id))
         return task
 
+    def patch_task(self, task_id, changes, version):
+        """
+        Actualización parcial con concurrencia optimista: un único UPDATE con solo las columnas de changes,
+        condicionado a que la tarea siga en la versión indicada. Devuelve la fila actualizada (columnas de
+        TASK_COLUMNS), None si no existe o lanza VersionConflictError si la versión ya no es la actual.
+        """
+        changes = {k: v for k, v in changes.items() if k not in ('id', 'created_at', 'version')}
+        before = report_summary.capture_tasks([task_id])
+        row = versioned_update(Task, task_id, version, changes, TASK_COLUMNS)
+        if row is None:
+            return None
+        if set(changes) & set(TASK_SEARCH_COLUMNS):
+            search_index.reindex_tasks([task_id])
+        report_summary.record_tasks([task_id], before)
+        bump_table_versions('tasks')
+        db.session.commit()
+        entity_cache.invalidate(task_key(task_id))
+        return row
+
+    def update_tasks(self, task_ids, changes):
+        """
+        Aplica los mismos cambios a varias tareas con un único UPDATE ... WHERE id IN (...).
+        Devuelve el número de filas actualizadas.
+        """
+        changes = {k: v for k, v in changes.items() if k not in ('id', 'created_at', 'version')}
+        if not changes:
+            return 0
+        before = report_summary.capture_tasks(task_ids)
+        # El UPDATE masivo también incrementa la versión: los PATCH con una versión anterior recibirán 409
+        result = db.session.execute(update(Task).where(Task.id.in_(task_ids)).values(**changes, version=Task.version + 1))
+        if set(changes) & set(TASK_SEARCH_COLUMNS):
+            search_index.reindex_tasks(task_ids)
+        report_summary.record_tasks(task_ids, before)
+        bump_table_versions('tasks')
+        db.session.commit()
+        entity_cache.invalidate(*[task_key(task_id) for task_id in task_ids])
+        return result.rowcount
+
+    def delete_tasks(self, task_ids):
+        """
+        Elimina varias tareas con un único DELETE ... WHERE id IN (...). Devuelve el número de filas eliminadas.
+        """
+        before = report_summary.capture_tasks(task_ids)
+        result = db.session.execute(delete(Task).where(Task.id.in_(task_ids)))
+        search_index.reindex_tasks(task_ids)
+        report_summary.record_tasks(task_ids, before)
+        bump_table_versions('tasks')
+        db.session.commit()
+        entity_cache.invalidate(*[task_key(task_id) for task_id in task_ids])
+        return result.rowcount
+
     def delete_task(self, task_id):
         task = Task.query.get(task_id)
         if not task:
             return False
+        before = report_summary.capture_tasks([task_id])
         db.session.delete(task)
+        search_index.reindex_tasks([task_id])
+        report_summary.record_tasks([task_id], before)
+        bump_table_versions('tasks')
         db.session.commit()
-        return True
\ No newline at end of file
+        entity_cache.invalidate(task_key(task_id))
+        return True
@@ -1,35 +1,220 @@
+from sqlalchemy import update, delete, select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
 from src.models.user_story import UserStory, PriorityEnum
-from src.db import db
+from src.models.task import Task
+from src.db import db, reads_from_replica, insert_rows
+from src.versioning import bump_table_versions, versioned_update, VersionConflictError
+from src.entity_cache import entity_cache, task_key, user_story_key
+from src.summaries import report_summary
+from src.search import search_index, USER_STORY_SEARCH_COLUMNS
+from src.serializers import USER_STORY_COLUMNS
+from src.utils import DEFAULT_PAGE_SIZE, EXPORT_BATCH_SIZE
 
 class UserStoryManager:
     def add_user_story(self, data):
         user_story = UserStory.from_dict(data)
         db.session.add(user_story)
+        db.session.flush()  # asigna el id para el índice de búsqueda
+        search_index.reindex_user_stories([user_story.id])
+        report_summary.record_user_story_rows([UserStory.row_from_dict(data)])
+        bump_table_versions('user_stories')
         db.session.commit()
         return user_story
 
+    def add_user_stories(self, data_list):
+        """
+        Inserta varias historias con un único INSERT multi-VALUES (insert_rows) dentro de una sola transacción.
+        Devuelve los ids creados en el orden de entrada si el dialecto admite RETURNING
+        (SQLite, PostgreSQL, MariaDB); en MySQL devuelve None.
+        """
+        rows = [UserStory.row_from_dict(data) for data in data_list]
+        if not rows:
+            return []
+        ids = insert_rows(UserStory, rows)
+        if ids is not None:
+            search_index.reindex_user_stories(ids)
+        # Sin RETURNING (MySQL) el índice FULLTEXT lo mantiene el propio motor
+        report_summary.record_user_story_rows(rows)
+        bump_table_versions('user_stories')
+        db.session.commit()
+        return ids
+
     def get_user_story(self, user_story_id):
-        return UserStory.query.get(user_story_id)
+        """
+        Lectura read-through: primero el caché de entidades y, si no está, la base de datos.
+        En un acierto devuelve una historia transitoria (no asociada a la sesión), válida solo para lectura.
+        """
+        cached = entity_cache.get(user_story_key(user_story_id))
+        if cached is not None:
+            return UserStory.from_cached_dict(cached)
+        lease = entity_cache.lease(user_story_key(user_story_id))
+        user_story = UserStory.query.get(user_story_id)
+        # Lo leído de la réplica puede ir con retraso: no se cachea (seguiría sirviéndose tras ponerse al día)
+        if user_story and not reads_from_replica():
+            entity_cache.set(user_story_key(user_story_id), user_story.to_dict(), lease=lease)
+        return user_story
 
     def get_all_user_stories(self):
         return UserStory.query.all()
 
+    def get_all_user_story_rows(self):
+        # Igual que get_all_user_stories pero con filas de columnas, sin hidratar objetos ORM
+        return UserStory.query.with_entities(*USER_STORY_COLUMNS).order_by(UserStory.id).all()
+
+    def get_user_story_with_tasks(self, user_story_id):
+        """
+        Devuelve la historia con sus tareas cargadas en una segunda consulta (selectinload), o None.
+        No pasa por el caché de entidades: las tareas cambian sin invalidar la entrada de la historia.
+        """
+        return self._with_tasks(UserStory.query.filter(UserStory.id == user_story_id)).one_or_none()
+
+    def get_all_user_stories_with_tasks(self):
+        # Historias y tareas en dos consultas, sea cual sea el número de historias (sin N+1)
+        return self._with_tasks(UserStory.query.order_by(UserStory.id)).all()
+
+    def get_user_stories_page(self, filters=None, limit=DEFAULT_PAGE_SIZE, after_id=None, expand_tasks=False):
+        """
+        Devuelve una página de filas de historias de usuario (columnas, sin objetos ORM) ordenada por id (paginación keyset) y el id
+        a partir del cual pedir la siguiente página, o None si no hay más.
+        Los filtros se aplican en SQL: project y priority.
+        Con expand_tasks devuelve objetos ORM con sus tareas, cargadas para toda la página en una única
+        consulta adicional (selectinload: ... WHERE user_story_id IN (...)).
+        """
+        query = self._filtered_query(filters)
+        query = self._with_tasks(query) if expand_tasks else query.with_entities(*USER_STORY_COLUMNS)
+        if after_id is not None:
+            query = query.filter(UserStory.id > after_id)
+        # Se pide un elemento extra para saber si existe una página siguiente
+        user_stories = query.order_by(UserStory.id).limit(limit + 1).all()
+        next_id = user_stories[limit - 1].id if len(user_stories) > limit else None
+        return user_stories[:limit], next_id
+
+    def iter_user_stories(self, filters=None, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Devuelve un iterable con las filas de todas las historias que cumplen los filtros usando un cursor de servidor
+        (yield_per activa stream_results), de modo que solo hay batch_size filas en memoria a la vez.
+        """
+        # La query se construye aquí para que los filtros no válidos fallen antes de empezar a emitir
+        query = self._filtered_query(filters).with_entities(*USER_STORY_COLUMNS).order_by(UserStory.id)
+        return query.yield_per(batch_size)
+
+    def _with_tasks(self, query):
+        return query.options(selectinload(UserStory.tasks))
+
+    def _filtered_query(self, filters):
+        # Aplica en SQL los filtros admitidos: project y priority
+        filters = filters or {}
+        query = UserStory.query
+        if filters.get('project'):
+            query = query.filter(UserStory.project == filters['project'])
+        if filters.get('priority'):
+            query = query.filter(UserStory.priority == PriorityEnum(filters['priority']))
+        return query
+
     def update_user_story(self, user_story_id, updates):
         user_story = UserStory.query.get(user_story_id)
         if not user_story:
             return None
         # Ignorar campos que no deben actualizarse
-        updates = {k: v for k, v in updates.items() if k not in ('id', 'created_at')}
+        updates = {k: v for k, v in updates.items() if k not in ('id', 'created_at', 'version')}
+        # Cambiar el proyecto de la historia mueve también sus tareas en los totales por proyecto
+        task_ids = report_summary.task_ids_for_user_stories([user_story_id])
+        before, before_tasks = report_summary.capture_user_stories([user_story_id]), report_summary.capture_tasks(task_ids)
         for key, value in updates.items():
             if hasattr(user_story, key):
                 setattr(user_story, key, value)
-        db.session.commit()
+        if set(updates) & set(USER_STORY_SEARCH_COLUMNS):
+            search_index.reindex_user_stories([user_story_id])
+        report_summary.record_user_stories([user_story_id], before)
+        report_summary.record_tasks(task_ids, before_tasks)
+        bump_table_versions('user_stories')
+        try:
+            # version_id_col: el UPDATE del ORM incluye WHERE version = <la leída> e incrementa la versión
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            raise VersionConflictError()
+        entity_cache.invalidate(user_story_key(user_story_id))
         return user_story
 
+    def patch_user_story(self, user_story_id, changes, version):
+        """
+        Actualización parcial con concurrencia optimista: un único UPDATE con solo las columnas de changes,
+        condicionado a que la historia siga en la versión indicada. Devuelve la fila actualizada (columnas de
+        USER_STORY_COLUMNS), None si no existe o lanza VersionConflictError si la versión ya no es la actual.
+        """
+        changes = {k: v for k, v in changes.items() if k not in ('id', 'created_at', 'version')}
+        task_ids = report_summary.task_ids_for_user_stories([user_story_id])
+        before, before_tasks = report_summary.capture_user_stories([user_story_id]), report_summary.capture_tasks(task_ids)
+        row = versioned_update(UserStory, user_story_id, version, changes, USER_STORY_COLUMNS)
+        if row is None:
+            return None
+        if set(changes) & set(USER_STORY_SEARCH_COLUMNS):
+            search_index.reindex_user_stories([user_story_id])
+        report_summary.record_user_stories([user_story_id], before)
+        report_summary.record_tasks(task_ids, before_tasks)
+        bump_table_versions('user_stories')
+        db.session.commit()
+        entity_cache.invalidate(user_story_key(user_story_id))
+        return row
+
     def delete_user_story(self, user_story_id):
         user_story = UserStory.query.get(user_story_id)
         if not user_story:
             return False
+        # Las tareas asociadas quedan desvinculadas al borrar la historia: también se invalidan
+        task_ids = [task.id for task in user_story.tasks]
+        before, before_tasks = report_summary.capture_user_stories([user_story_id]), report_summary.capture_tasks(task_ids)
         db.session.delete(user_story)
+        search_index.reindex_user_stories([user_story_id])
+        report_summary.record_user_stories([user_story_id], before)
+        report_summary.record_tasks(task_ids, before_tasks)
+        bump_table_versions('user_stories', 'tasks')
         db.session.commit()
+        entity_cache.invalidate(user_story_key(user_story_id), *[task_key(task_id) for task_id in task_ids])
         return True
+
+    def update_user_stories(self, user_story_ids, changes):
+        """
+        Aplica los mismos cambios a varias historias con un único UPDATE ... WHERE id IN (...).
+        Devuelve el número de filas actualizadas.
+        """
+        changes = {k: v for k, v in changes.items() if k not in ('id', 'created_at', 'version')}
+        if not changes:
+            return 0
+        task_ids = report_summary.task_ids_for_user_stories(user_story_ids)
+        before, before_tasks = report_summary.capture_user_stories(user_story_ids), report_summary.capture_tasks(task_ids)
+        # El UPDATE masivo también incrementa la versión: los PATCH con una versión anterior recibirán 409
+        result = db.session.execute(
+            update(UserStory).where(UserStory.id.in_(user_story_ids)).values(**changes, version=UserStory.version + 1))
+        if set(changes) & set(USER_STORY_SEARCH_COLUMNS):
+            search_index.reindex_user_stories(user_story_ids)
+        report_summary.record_user_stories(user_story_ids, before)
+        report_summary.record_tasks(task_ids, before_tasks)
+        bump_table_versions('user_stories')
+        db.session.commit()
+        entity_cache.invalidate(*[user_story_key(user_story_id) for user_story_id in user_story_ids])
+        return result.rowcount
+
+    def delete_user_stories(self, user_story_ids):
+        """
+        Elimina varias historias con un único DELETE ... WHERE id IN (...). Como en delete_user_story,
+        las tareas asociadas se desvinculan (user_story_id = NULL) en la misma transacción.
+        Devuelve el número de historias eliminadas.
+        """
+        task_ids = list(db.session.scalars(select(Task.id).where(Task.user_story_id.in_(user_story_ids))))
+        before, before_tasks = report_summary.capture_user_stories(user_story_ids), report_summary.capture_tasks(task_ids)
+        db.session.execute(
+            update(Task).where(Task.user_story_id.in_(user_story_ids)).values(user_story_id=None, version=Task.version + 1))
+        result = db.session.execute(delete(UserStory).where(UserStory.id.in_(user_story_ids)))
+        search_index.reindex_user_stories(user_story_ids)
+        report_summary.record_user_stories(user_story_ids, before)
+        report_summary.record_tasks(task_ids, before_tasks)
+        bump_table_versions('user_stories', 'tasks')
+        db.session.commit()
+        entity_cache.invalidate(
+            *[user_story_key(user_story_id) for user_story_id in user_story_ids],
+            *[task_key(task_id) for task_id in task_ids]
+        )
+        return result.rowcount
@@ -0,0 +1,227 @@
+# Métricas de la aplicación en formato de texto de Prometheus (/metrics), sin dependencias externas.
+# Los valores son por proceso: con varios workers, Prometheus debe consultar cada uno (o agregarlos el proxy).
+import bisect
+import threading
+import time
+from flask import Response, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AI_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(labelnames, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono con etiquetas."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas (_bucket, _sum y _count)."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # etiquetas -> [conteos por bucket (no acumulados) + overflow, suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        entry = self._values.get(tuple(labels.get(name, "") for name in self.labelnames))
+        return entry[2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, (("le", _format_value(float(bound))),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Peticiones HTTP
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por endpoint, método y estado",
+    ("endpoint", "method", "status")))
+# Base de datos
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Duración de cada sentencia SQL por tipo de operación", ("operation",)))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "Sentencias SQL ejecutadas por petición HTTP", ("endpoint",), QUERY_COUNT_BUCKETS))
+db_time_per_request = registry.register(Histogram(
+    "db_time_per_request_seconds", "Tiempo total en la base de datos por petición HTTP", ("endpoint",)))
+# IA (Azure OpenAI)
+ai_request_duration = registry.register(Histogram(
+    "ai_request_duration_seconds", "Latencia de las llamadas a Azure OpenAI por tipo de respuesta y resultado",
+    ("response_type", "outcome"), AI_LATENCY_BUCKETS))
+ai_errors = registry.register(Counter(
+    "ai_errors", "Errores de las llamadas a Azure OpenAI por tipo de respuesta y excepción", ("response_type", "error")))
+ai_tokens = registry.register(Counter(
+    "ai_tokens", "Tokens consumidos en Azure OpenAI por tipo de respuesta (prompt o completion)", ("response_type", "kind")))
+ai_cache_hits = registry.register(Counter(
+    "ai_cache_hits", "Llamadas a la IA respondidas desde la caché, sin ir a Azure", ("response_type",)))
+ai_retries = registry.register(Counter(
+    "ai_retries", "Reintentos de llamadas a Azure OpenAI por tipo de respuesta y error", ("response_type", "error")))
+ai_hedged_requests = registry.register(Counter(
+    "ai_hedged_requests", "Peticiones de cobertura (hedging) lanzadas por una llamada lenta", ("response_type",)))
+ai_circuit_rejections = registry.register(Counter(
+    "ai_circuit_rejections", "Llamadas rechazadas sin ir a Azure por tener el circuito abierto", ("response_type",)))
+ai_deduplicated = registry.register(Counter(
+    "ai_deduplicated", "Llamadas a la IA que compartieron el resultado de otra idéntica en curso "
+    "(scope: process o cross_process)", ("response_type", "scope")))
+
+
+def observe_ai_call(response_type, started, usage=None, error=None, cancelled=False):
+    """
+    Registra una llamada a Azure OpenAI iniciada en started (time.perf_counter). cancelled marca los
+    streams que el cliente cortó antes de terminar.
+    """
+    outcome = "error" if error else "cancelled" if cancelled else "ok"
+    ai_request_duration.observe(time.perf_counter() - started, response_type=response_type, outcome=outcome)
+    if error is not None:
+        ai_errors.inc(response_type=response_type, error=type(error).__name__)
+    if usage is not None:
+        for kind in ("prompt", "completion"):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if isinstance(tokens, int):
+                ai_tokens.inc(tokens, response_type=response_type, kind=kind)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Si la sentencia falla no hay after_cursor_execute; la siguiente sobrescribe el inicio
+    started = conn.info.pop("metrics_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    db_query_duration.observe(elapsed, operation=statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "")
+    if has_request_context() and "metrics_db_queries" in g:
+        g.metrics_db_queries += 1
+        g.metrics_db_time += elapsed
+
+
+_engine_events_installed = False
+_engine_events_lock = threading.Lock()
+
+def _install_engine_events():
+    # Se escucha en la clase Engine para cubrir cualquier engine (principal o réplicas) una sola vez
+    global _engine_events_installed
+    with _engine_events_lock:
+        if not _engine_events_installed:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            _engine_events_installed = True
+
+
+def init_metrics(app):
+    """
+    Instrumenta la app (latencia por endpoint, SQL por petición) y registra GET /metrics y
+    GET /cache/entities/stats.
+    """
+    _install_engine_events()
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_queries = 0
+        g.metrics_db_time = 0.0
+
+    @app.after_request
+    def _record_request_metrics(response):
+        # En las respuestas en streaming se mide hasta el envío de las cabeceras
+        if "metrics_start" in g and request.endpoint != "metrics":
+            endpoint = request.endpoint or "unknown"
+            http_request_duration.observe(
+                time.perf_counter() - g.metrics_start,
+                endpoint=endpoint, method=request.method, status=str(response.status_code))
+            db_queries_per_request.observe(g.metrics_db_queries, endpoint=endpoint)
+            db_time_per_request.observe(g.metrics_db_time, endpoint=endpoint)
+        return response
+
+    @app.route("/metrics", methods=["GET"], endpoint="metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    # Estadísticas del caché de entidades (aciertos, fallos, ratio, expulsiones e invalidaciones fallidas)
+    @app.route("/cache/entities/stats", methods=["GET"], endpoint="entity_cache_stats")
+    def entity_cache_stats():
+        from src.entity_cache import entity_cache
+        return jsonify(entity_cache.stats())
+
+    return app
@@ -0,0 +1,54 @@
+# Migraciones ligeras del esquema para despliegues existentes (sin Alembic).
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from src.db import db
+from src.versioning import seed_table_versions, VERSIONED_TABLES
+
+
+def upgrade_schema():
+    """
+    Crea las tablas que falten, las columnas nuevas con valor por defecto (p. ej. version) y los índices
+    declarados en los modelos que todavía no existan en la base de datos. Es idempotente: se puede ejecutar
+    en cada despliegue. Debe llamarse dentro de un app_context. Devuelve los nombres de las columnas
+    (tabla.columna) y de los índices creados.
+    """
+    # Importar los modelos para que queden registrados en los metadatos
+    from src.models.task import Task
+    from src.models.user_story import UserStory
+    from src.models.job import Job
+    from src.models.table_version import TableVersion
+    from src.models.report_summary import ReportSummary
+    from src.search import ensure_search_schema
+
+    db.create_all()
+    inspector = inspect(db.engine)
+    created = []
+    for model in (UserStory, Task, Job, TableVersion, ReportSummary):
+        table = model.__table__
+        created += _add_missing_columns(table, inspector)
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    # Tablas FTS5 (SQLite) o índices FULLTEXT (MySQL) de la búsqueda
+    created += ensure_search_schema()
+    # Contadores de versión de las tablas con ETag: así las escrituras nunca tienen que crearlos
+    seed_table_versions(*VERSIONED_TABLES)
+    db.session.commit()
+    return created
+
+
+def _add_missing_columns(table, inspector):
+    # ALTER TABLE ... ADD COLUMN para las columnas del modelo que faltan en la tabla. Solo se añaden las que
+    # admiten las filas existentes: con valor por defecto en el servidor o que aceptan NULL
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    added = []
+    with db.engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing or (column.server_default is None and not column.nullable):
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {conn.dialect.identifier_preparer.format_table(table)} ADD COLUMN {column_ddl}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
@@ -11,3 +11,9 @@ class StatusEnum(str, Enum):
     en_progreso = 'en progreso'
     en_revision = 'en revisión'
     completada = 'completada'
+
+class JobStatusEnum(str, Enum):
+    pendiente = 'pendiente'
+    en_progreso = 'en progreso'
+    completado = 'completado'
+    error = 'error'
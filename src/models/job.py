@@ -0,0 +1,31 @@
+import json
+from sqlalchemy import Enum as SqlEnum
+from sqlalchemy.sql import func
+from src.db import db
+from src.models.enums import JobStatusEnum
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.String(36), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(SqlEnum(JobStatusEnum), nullable=False, default=JobStatusEnum.pendiente)
+    payload = db.Column(db.Text, nullable=False)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    # Último latido del proceso que tiene el trabajo en cola o ejecutándolo (ver JobManager)
+    heartbeat_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status.value,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,14 @@
+from src.db import db
+
+class ReportSummary(db.Model):
+    """
+    Totales precalculados por (origen, dimensión, valor) para los informes. Las escrituras de los managers
+    los mantienen de forma incremental cuando REPORT_SUMMARY_ENABLED está activo.
+    """
+    __tablename__ = 'report_summaries'
+    source = db.Column(db.String(32), primary_key=True)  # tasks | user_stories
+    dimension = db.Column(db.String(32), primary_key=True)  # project, status, priority, assigned_to
+    value = db.Column(db.String(255), primary_key=True)  # '' representa NULL (p. ej. tareas sin historia)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    effort_hours = db.Column(db.Float, nullable=False, default=0)
+    story_points = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,7 @@
+from src.db import db
+
+class TableVersion(db.Model):
+    """Contador de versión por tabla; las escrituras de los managers lo incrementan en su misma transacción."""
+    __tablename__ = 'table_versions'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
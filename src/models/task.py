@@ -1,12 +1,19 @@
 from sqlalchemy import Enum as SqlEnum, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from datetime import datetime
 from typing import Optional
 from src.db import db
 from src.models.enums import PriorityEnum, StatusEnum
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    # Índices secundarios para los filtros más habituales de los listados
+    __table_args__ = (
+        db.Index('ix_tasks_user_story_id_status', 'user_story_id', 'status'),
+        db.Index('ix_tasks_status_priority', 'status', 'priority'),
+        db.Index('ix_tasks_assigned_to_status', 'assigned_to', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -17,6 +24,9 @@ class Task(db.Model):
     user_story_id = db.Column(db.Integer, ForeignKey('user_stories.id'), nullable=True)
     user_story = relationship('UserStory', backref='tasks')
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    # Versión de la fila para la concurrencia optimista: cada UPDATE la incrementa y solo se aplica si no ha cambiado
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
 
     def to_dict(self):
         return {
@@ -28,17 +38,32 @@ class Task(db.Model):
             'status': self.status.value,
             'assigned_to': self.assigned_to,
             'user_story_id': self.user_story_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'version': self.version
         }
 
     @staticmethod
     def from_dict(data):
-        return Task(
-            title=data['title'],
-            description=data['description'],
-            priority=PriorityEnum(data['priority']),
-            effort_hours=data['effort_hours'],
-            status=StatusEnum(data['status']),
-            assigned_to=data['assigned_to'],
-            user_story_id=data.get('user_story_id')
-        )
\ No newline at end of file
+        return Task(**Task.row_from_dict(data))
+
+    @staticmethod
+    def from_cached_dict(data):
+        # Reconstruye una tarea transitoria (fuera de la sesión) a partir de to_dict(); la usa el caché de entidades
+        task = Task.from_dict(data)
+        task.id = data['id']
+        task.created_at = datetime.fromisoformat(data['created_at']) if data['created_at'] else None
+        task.version = data.get('version')  # Entradas anteriores a la columna version
+        return task
+
+    @staticmethod
+    def row_from_dict(data):
+        # Diccionario de columnas listo para inserciones masivas (insert().values / executemany)
+        return {
+            'title': data['title'],
+            'description': data['description'],
+            'priority': PriorityEnum(data['priority']),
+            'effort_hours': data['effort_hours'],
+            'status': StatusEnum(data['status']),
+            'assigned_to': data['assigned_to'],
+            'user_story_id': data.get('user_story_id')
+        }
@@ -1,10 +1,15 @@
 from sqlalchemy import Enum as SqlEnum
 from sqlalchemy.sql import func
+from datetime import datetime
 from src.db import db
 from src.models.enums import PriorityEnum
 
 class UserStory(db.Model):
     __tablename__ = 'user_stories'
+    # Índice secundario para los filtros por proyecto y prioridad
+    __table_args__ = (
+        db.Index('ix_user_stories_project_priority', 'project', 'priority'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     project = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(255), nullable=False)
@@ -15,6 +20,9 @@ class UserStory(db.Model):
     story_points = db.Column(db.Integer, nullable=False)
     effort_hours = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    # Versión de la fila para la concurrencia optimista: cada UPDATE la incrementa y solo se aplica si no ha cambiado
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
 
     def to_dict(self):
         return {
@@ -27,18 +35,33 @@ class UserStory(db.Model):
             'priority': self.priority.value,
             'story_points': self.story_points,
             'effort_hours': self.effort_hours,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'version': self.version
         }
 
     @staticmethod
     def from_dict(data):
-        return UserStory(
-            project=data['project'],
-            role=data['role'],
-            goal=data['goal'],
-            reason=data['reason'],
-            description=data['description'],
-            priority=PriorityEnum(data['priority']),
-            story_points=data['story_points'],
-            effort_hours=data['effort_hours']
-        )
\ No newline at end of file
+        return UserStory(**UserStory.row_from_dict(data))
+
+    @staticmethod
+    def from_cached_dict(data):
+        # Reconstruye una historia transitoria (fuera de la sesión) a partir de to_dict(); la usa el caché de entidades
+        user_story = UserStory.from_dict(data)
+        user_story.id = data['id']
+        user_story.created_at = datetime.fromisoformat(data['created_at']) if data['created_at'] else None
+        user_story.version = data.get('version')  # Entradas anteriores a la columna version
+        return user_story
+
+    @staticmethod
+    def row_from_dict(data):
+        # Diccionario de columnas listo para inserciones masivas (insert().values / executemany)
+        return {
+            'project': data['project'],
+            'role': data['role'],
+            'goal': data['goal'],
+            'reason': data['reason'],
+            'description': data['description'],
+            'priority': PriorityEnum(data['priority']),
+            'story_points': data['story_points'],
+            'effort_hours': data['effort_hours']
+        }
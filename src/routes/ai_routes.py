@@ -0,0 +1,171 @@
+# Endpoints de IA. Este módulo importa el SDK de OpenAI: create_app solo lo carga si AI_ENABLED,
+# de modo que los workers que solo sirven el CRUD arrancan sin la pila de IA.
+import math
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from src.utils import sse_event, MAX_BULK_SIZE
+from ai.ia_task_manager import create_task_description, create_task_category, create_task_effort_estimate, create_task_audit, enrich_task, check_enrich_fields, run_batch, BATCH_OPERATIONS, stream_task_description, stream_task_audit
+from ai.ia_rate_limit import ai_rate_limiter
+from ai.ia_cache import ai_response_cache
+from ai.ia_singleflight import ai_single_flight
+from ai.ia_resilience import ai_caller, AIError, AITimeoutError, AIRateLimitedError, AICircuitOpenError, AIClientUnavailableError
+
+def ai_cache_preference():
+    # Cache-Control: no-cache en la petición obliga a llamar a la IA sin pasar por la caché
+    return False if 'no-cache' in request.headers.get('Cache-Control', '') else None
+
+def ai_error_response(error, action):
+    # Plazo agotado -> 504; Azure no disponible (circuito abierto, cuota o cliente sin configurar) -> 503; resto -> 502
+    if isinstance(error, AITimeoutError):
+        status = 504
+    elif isinstance(error, (AICircuitOpenError, AIRateLimitedError, AIClientUnavailableError)):
+        status = 503
+    else:
+        status = 502
+    response = jsonify({"error": f"{action}: {str(error)}"})
+    if error.retry_after is not None:
+        response.headers['Retry-After'] = str(math.ceil(error.retry_after))
+    return response, status
+
+def sse_response(task_dict, chunks):
+    # Emite cada fragmento como evento delta y, al terminar, la tarea completa como evento done
+    def generate():
+        try:
+            for field, text in chunks:
+                yield sse_event("delta", {"field": field, "text": text})
+            yield sse_event("done", task_dict)
+        except Exception as e:
+            yield sse_event("error", {"error": f"Error al procesar el mensaje con IA: {str(e)}"})
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def create_ai_blueprint():
+    ai_bp = Blueprint('ai', __name__)
+
+    @ai_bp.route('/ai/tasks/describe', methods=['POST'])
+    def describe_task_ai():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            task_with_desc = create_task_description(data, use_cache=ai_cache_preference())
+            return jsonify(task_with_desc)
+        except AIError as e:
+            return ai_error_response(e, "Error al generar la descripción con IA")
+        except Exception as e:
+            return jsonify({"error": f"Error al generar la descripción con IA: {str(e)}"}), 500
+
+    # Variante SSE: la descripción llega token a token y el evento done trae la tarea completa
+    @ai_bp.route('/ai/tasks/describe/stream', methods=['POST'])
+    def describe_task_ai_stream():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            chunks = stream_task_description(data, use_cache=ai_cache_preference())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return sse_response(data, chunks)
+
+    @ai_bp.route('/ai/tasks/categorize', methods=['POST'])
+    def categorize_task_ai():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            task_with_category = create_task_category(data, use_cache=ai_cache_preference())
+            return jsonify(task_with_category)
+        except AIError as e:
+            return ai_error_response(e, "Error al categorizar la tarea con IA")
+        except Exception as e:
+            return jsonify({"error": f"Error al categorizar la tarea con IA: {str(e)}"}), 500
+
+    @ai_bp.route('/ai/tasks/estimate', methods=['POST'])
+    def estimate_task_effort_ai():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            task_with_effort = create_task_effort_estimate(data, use_cache=ai_cache_preference())
+            return jsonify(task_with_effort)
+        except AIError as e:
+            return ai_error_response(e, "Error al estimar el esfuerzo con IA")
+        except Exception as e:
+            return jsonify({"error": f"Error al estimar el esfuerzo con IA: {str(e)}"}), 500
+
+    @ai_bp.route('/ai/tasks/audit', methods=['POST'])
+    def audit_task_ai():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            audited_task = create_task_audit(data, use_cache=ai_cache_preference())
+            return jsonify(audited_task)
+        except AIError as e:
+            return ai_error_response(e, "Error al auditar la tarea con IA")
+        except Exception as e:
+            return jsonify({"error": f"Error al auditar la tarea con IA: {str(e)}"}), 500
+
+    # Variante SSE de la auditoría: primero el análisis de riesgos y después el plan de mitigación
+    @ai_bp.route('/ai/tasks/audit/stream', methods=['POST'])
+    def audit_task_ai_stream():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            chunks = stream_task_audit(data, use_cache=ai_cache_preference())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return sse_response(data, chunks)
+
+    # Enriquecimiento completo en una sola petición: describe → categorize → estimate / auditoría
+    @ai_bp.route('/ai/tasks/enrich', methods=['POST'])
+    def enrich_task_ai():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            check_enrich_fields(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            return jsonify(enrich_task(data, use_cache=ai_cache_preference()))
+        except AIError as e:
+            return ai_error_response(e, "Error al enriquecer la tarea con IA")
+        except Exception as e:
+            return jsonify({"error": f"Error al enriquecer la tarea con IA: {str(e)}"}), 500
+
+    # Variantes batch de describe/categorize/estimate/audit: lista de tareas, resultados en el mismo orden
+    @ai_bp.route('/ai/tasks/<operation>/batch', methods=['POST'])
+    def batch_task_ai(operation):
+        if operation not in BATCH_OPERATIONS:
+            return jsonify({"error": f"Operación no soportada, debe ser una de {list(BATCH_OPERATIONS)}"}), 404
+        data = request.json
+        if not data or not isinstance(data, list) or not all(isinstance(t, dict) for t in data):
+            return jsonify({"error": "Se esperaba una lista de tareas"}), 400
+        if len(data) > MAX_BULK_SIZE:
+            return jsonify({"error": f"No se admiten más de {MAX_BULK_SIZE} tareas por petición"}), 400
+        results = run_batch(operation, data, use_cache=ai_cache_preference())
+        return jsonify({"results": results, "errors": sum(1 for r in results if "error" in r)})
+
+    @ai_bp.route('/ai/cache/stats', methods=['GET'])
+    def ai_cache_stats():
+        return jsonify(ai_response_cache.stats())
+
+    @ai_bp.route('/ai/rate-limit/stats', methods=['GET'])
+    def ai_rate_limit_stats():
+        return jsonify(ai_rate_limiter.stats())
+
+    # Estado del circuit breaker de Azure OpenAI (closed, open o half_open)
+    @ai_bp.route('/ai/circuit/stats', methods=['GET'])
+    def ai_circuit_stats():
+        return jsonify(ai_caller.breaker.stats())
+
+    # Llamadas idénticas en curso agrupadas en una sola llamada a Azure
+    @ai_bp.route('/ai/singleflight/stats', methods=['GET'])
+    def ai_singleflight_stats():
+        return jsonify(ai_single_flight.stats())
+
+    return ai_bp
@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify
+from src.managers.job_manager import JobManager
+
+def create_jobs_blueprint(job_manager=None):
+    jobs_bp = Blueprint('jobs', __name__)
+    jm = job_manager or JobManager()
+
+    # Consultar el estado (y el resultado, si ha terminado) de un trabajo en segundo plano
+    @jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        job = jm.get_job(job_id)
+        if not job:
+            return jsonify({"error": "Trabajo no encontrado"}), 404
+        return jsonify(job.to_dict())
+
+    return jobs_bp
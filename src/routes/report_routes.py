@@ -0,0 +1,34 @@
+from flask import Blueprint, request, jsonify
+from src.db import read_only
+from src.managers.report_manager import ReportManager
+from src.versioning import conditional_get
+
+def create_reports_blueprint(report_manager=None):
+    reports_bp = Blueprint('reports', __name__)
+    rm = report_manager or ReportManager()
+
+    # Totales de tareas (número y horas de esfuerzo) agrupados en SQL: ?group_by=project|status|priority|assigned_to
+    @reports_bp.route('/reports/tasks', methods=['GET'])
+    @read_only
+    @conditional_get('tasks', 'user_stories')
+    def task_report():
+        group_by = request.args.get('group_by', 'status')
+        try:
+            groups = rm.task_totals(group_by, project=request.args.get('project'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"group_by": group_by, "groups": groups})
+
+    # Totales de historias (número, story points y horas de esfuerzo): ?group_by=project|priority
+    @reports_bp.route('/reports/user_stories', methods=['GET'])
+    @read_only
+    @conditional_get('user_stories')
+    def user_story_report():
+        group_by = request.args.get('group_by', 'project')
+        try:
+            groups = rm.user_story_totals(group_by)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"group_by": group_by, "groups": groups})
+
+    return reports_bp
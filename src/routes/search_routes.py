@@ -0,0 +1,30 @@
+from flask import Blueprint, request, jsonify
+from src.db import read_only
+from src.search import search_index
+from src.utils import parse_limit, parse_offset
+
+def create_search_blueprint(index=None):
+    search_bp = Blueprint('search', __name__)
+    si = index or search_index
+
+    # Búsqueda de texto completo en tareas e historias, ordenada por relevancia:
+    # ?q=...&type=task|user_story&project=...&status=...&limit=...&offset=...
+    @search_bp.route('/search', methods=['GET'])
+    @read_only
+    def search():
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            offset = parse_offset(request.args.get('offset'))
+            results, next_offset = si.search(
+                request.args.get('q', ''),
+                kind=request.args.get('type') or None,
+                project=request.args.get('project') or None,
+                status=request.args.get('status') or None,
+                limit=limit,
+                offset=offset,
+            )
+        except ValueError as e:
+            return jsonify({"error": f"Parámetros de búsqueda no válidos: {str(e)}"}), 400
+        return jsonify({"results": results, "next_offset": next_offset})
+
+    return search_bp
@@ -1,8 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from src.db import read_only
 from src.managers.task_manager import TaskManager
-from src.schemas.task_schema import TaskSchema, TaskSchemas
+from src.schemas.task_schema import TaskSchema, TaskSchemas, TaskPatchSchema, TaskVersionedPatchSchema
+from src.versioning import conditional_get, VersionConflictError
+from src.serializers import dump_tasks_json, task_row_to_dict, json_list_response
 from pydantic import ValidationError
-from ai.ia_task_manager import create_task_description, create_task_category, create_task_effort_estimate, create_task_audit
+from src.utils import encode_cursor, decode_cursor, parse_limit, stream_rows, parse_bulk_ids, EXPORT_FORMATS, MAX_BULK_SIZE
+
+# Filtros admitidos en la query string de GET /tasks
+TASK_FILTERS = ('status', 'priority', 'assigned_to', 'user_story_id', 'project')
+# Columnas de la exportación CSV de tareas
+TASK_EXPORT_FIELDS = ['id', 'title', 'description', 'priority', 'effort_hours', 'status', 'assigned_to', 'user_story_id', 'created_at']
 
 def create_tasks_blueprint(task_manager=None):
     tasks_bp = Blueprint('tasks', __name__)
@@ -21,14 +29,88 @@ def create_tasks_blueprint(task_manager=None):
         task = tm.add_task(validated.model_dump())
         return jsonify(TaskSchema.model_validate(task).model_dump()), 201
 
-    # Leer todas las tareas
+    # Crear varias tareas con un único INSERT en una sola transacción
+    @tasks_bp.route('/tasks/bulk', methods=['POST'])
+    def create_tasks_bulk():
+        data = request.json
+        if not data or not isinstance(data, list):
+            return jsonify({"error": "Se esperaba una lista de tareas"}), 400
+        if len(data) > MAX_BULK_SIZE:
+            return jsonify({"error": f"No se admiten más de {MAX_BULK_SIZE} tareas por petición"}), 400
+        try:
+            validated = TaskSchemas(TaskSchemasList=data)
+        except ValidationError as e:
+            return jsonify({"errors": e.errors()}), 422
+        ids = tm.add_tasks([t.model_dump() for t in validated.TaskSchemasList])
+        return jsonify({"created": len(validated.TaskSchemasList), "ids": ids}), 201
+
+    # Aplicar los mismos cambios a varias tareas con un único UPDATE
+    @tasks_bp.route('/tasks/bulk', methods=['PATCH'])
+    def update_tasks_bulk():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            ids = parse_bulk_ids(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            changes = TaskPatchSchema.model_validate(data.get('changes') or {})
+        except ValidationError as e:
+            # Sin contexto: los ValueError de los validadores no son serializables a JSON
+            return jsonify({"errors": e.errors(include_context=False)}), 422
+        updated = tm.update_tasks(ids, changes.model_dump(exclude_unset=True))
+        return jsonify({"updated": updated})
+
+    # Eliminar varias tareas con un único DELETE
+    @tasks_bp.route('/tasks/bulk', methods=['DELETE'])
+    def delete_tasks_bulk():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            ids = parse_bulk_ids(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        deleted = tm.delete_tasks(ids)
+        return jsonify({"deleted": deleted})
+
+    # Leer las tareas paginadas (keyset por id) y con filtros opcionales; admite If-None-Match (ETag)
     @tasks_bp.route('/tasks', methods=['GET'])
+    @read_only
+    @conditional_get('tasks', 'user_stories')  # El filtro project depende de user_stories
     def get_tasks():
-        tasks = tm.get_all_tasks()
-        return jsonify(TaskSchemas(TaskSchemasList=[TaskSchema.model_validate(t) for t in tasks]).model_dump())
+        filters = {k: request.args.get(k) for k in TASK_FILTERS if request.args.get(k)}
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            after_id = decode_cursor(request.args.get('cursor'))
+            tasks, next_id = tm.get_tasks_page(filters, limit, after_id)
+        except ValueError as e:
+            return jsonify({"error": f"Parámetros de consulta no válidos: {str(e)}"}), 400
+        return json_list_response('TaskSchemasList', dump_tasks_json(tasks), encode_cursor(next_id))
+
+    # Exportar las tareas en streaming (NDJSON o CSV) sin cargar la tabla en memoria
+    @tasks_bp.route('/tasks/export', methods=['GET'])
+    @read_only
+    def export_tasks():
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"format debe ser uno de {list(EXPORT_FORMATS)}"}), 400
+        filters = {k: request.args.get(k) for k in TASK_FILTERS if request.args.get(k)}
+        try:
+            tasks = tm.iter_tasks(filters)
+        except ValueError as e:
+            return jsonify({"error": f"Parámetros de consulta no válidos: {str(e)}"}), 400
+        rows = (task_row_to_dict(t) for t in tasks)
+        return Response(
+            stream_with_context(stream_rows(rows, TASK_EXPORT_FIELDS, export_format)),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f"attachment; filename=tasks.{export_format}"}
+        )
 
     # Leer una tarea específica
     @tasks_bp.route('/tasks/<int:task_id>', methods=['GET'])
+    @read_only
     def get_task(task_id):
         task = tm.get_task(task_id)
         if not task:
@@ -45,11 +127,37 @@ def create_tasks_blueprint(task_manager=None):
             validated = TaskSchema(**data)
         except ValidationError as e:
             return jsonify({"errors": e.errors()}), 422
-        task = tm.update_task(task_id, validated.model_dump())
+        try:
+            task = tm.update_task(task_id, validated.model_dump())
+        except VersionConflictError:
+            return jsonify({'error': 'La tarea ha sido modificada por otra petición'}), 409
         if not task:
             return jsonify({'error': 'Tarea no encontrada'}), 404
         return jsonify(TaskSchema.model_validate(task).model_dump())
 
+    # Actualización parcial: un único UPDATE con los campos enviados, condicionado a la versión que el
+    # cliente leyó (campo version). Si otra petición la modificó antes responde 409 con la versión actual
+    @tasks_bp.route('/tasks/<int:task_id>', methods=['PATCH'])
+    def patch_task(task_id):
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            validated = TaskVersionedPatchSchema.model_validate(data)
+        except ValidationError as e:
+            # Sin contexto: los ValueError de los validadores no son serializables a JSON
+            return jsonify({"errors": e.errors(include_context=False)}), 422
+        changes = validated.model_dump(exclude_unset=True, exclude={'version'})
+        if not changes:
+            return jsonify({"error": "No se proporcionaron campos a modificar"}), 400
+        try:
+            row = tm.patch_task(task_id, changes, validated.version)
+        except VersionConflictError as e:
+            return jsonify({'error': 'La tarea ha sido modificada por otra petición', 'version': e.current_version}), 409
+        if row is None:
+            return jsonify({'error': 'Tarea no encontrada'}), 404
+        return jsonify(task_row_to_dict(row))
+
     # Eliminar una tarea
     @tasks_bp.route('/tasks/<int:task_id>', methods=['DELETE'])
     def delete_task(task_id):
@@ -58,50 +166,5 @@ def create_tasks_blueprint(task_manager=None):
             return jsonify({'error': 'Tarea no encontrada'}), 404
         return jsonify({'result': 'Tarea eliminada'})
 
-    # Endpoints IA (se mantienen igual)
-    @tasks_bp.route('/ai/tasks/describe', methods=['POST'])
-    def describe_task_ai():
-        data = request.json
-        if not data:
-            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
-        try:
-            task_with_desc = create_task_description(data)
-            return jsonify(task_with_desc)
-        except Exception as e:
-            return jsonify({"error": f"Error al generar la descripción con IA: {str(e)}"}), 500
-
-    @tasks_bp.route('/ai/tasks/categorize', methods=['POST'])
-    def categorize_task_ai():
-        data = request.json
-        if not data:
-            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
-        try:
-            task_with_category = create_task_category(data)
-            return jsonify(task_with_category)
-        except Exception as e:
-            return jsonify({"error": f"Error al categorizar la tarea con IA: {str(e)}"}), 500
-
-    @tasks_bp.route('/ai/tasks/estimate', methods=['POST'])
-    def estimate_task_effort_ai():
-        data = request.json
-        if not data:
-            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
-        try:
-            task_with_effort = create_task_effort_estimate(data)
-            return jsonify(task_with_effort)
-        except Exception as e:
-            return jsonify({"error": f"Error al estimar el esfuerzo con IA: {str(e)}"}), 500
-
-    @tasks_bp.route('/ai/tasks/audit', methods=['POST'])
-    def audit_task_ai():
-        data = request.json
-        if not data:
-            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
-        try:
-            audited_task = create_task_audit(data)
-            return jsonify(audited_task)
-        except Exception as e:
-            return jsonify({"error": f"Error al auditar la tarea con IA: {str(e)}"}), 500
-
     return tasks_bp
 
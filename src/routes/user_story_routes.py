@@ -1,19 +1,36 @@
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for
+from flask import Blueprint, Response, current_app, request, jsonify, render_template, url_for, stream_with_context
+from src.db import read_only
 from src.managers.user_story_manager import UserStoryManager
-from src.schemas.user_story_schema import UserStorySchema, UserStorySchemas
-from src.schemas.task_schema import TaskSchema, TaskSchemas
+from src.schemas.user_story_schema import UserStorySchema, UserStorySchemas, UserStoryPatchSchema, UserStoryVersionedPatchSchema
+from src.versioning import conditional_get, VersionConflictError
+from src.serializers import (dump_user_stories_json, user_stories_to_dicts, user_story_row_to_dict, tasks_to_dicts, json_list_response,
+                             dump_user_stories_with_tasks_json, dump_user_story_with_tasks_json, user_stories_with_tasks_to_dicts)
 from src.managers.task_manager import TaskManager
 from pydantic import ValidationError
-from ai.ia_client import process_message_with_AI, ResponseType
-import json
+from src.utils import encode_cursor, decode_cursor, parse_limit, parse_expand, stream_rows, parse_bulk_ids, EXPORT_FORMATS, MAX_BULK_SIZE
+from src.managers.job_manager import JobManager
 
-response_limit = 1500
+# Filtros admitidos en la query string de GET /user_stories
+USER_STORY_FILTERS = ('project', 'priority')
+# Relaciones que se pueden incrustar con ?expand= y tablas de las que depende entonces la respuesta
+USER_STORY_EXPANSIONS = {'tasks': ('tasks',)}
+# Columnas de la exportación CSV de historias de usuario
+USER_STORY_EXPORT_FIELDS = ['id', 'project', 'role', 'goal', 'reason', 'description', 'priority', 'story_points', 'effort_hours', 'created_at']
+
+def load_ai_job_handlers():
+    # La pila de IA (SDK de OpenAI) se importa al encolar el primer trabajo, no al arrancar el worker
+    from ai.ia_user_story_manager import JOB_HANDLERS
+    return JOB_HANDLERS
+
+def ai_disabled_response():
+    return jsonify({"error": "La generación con IA está desactivada (AI_ENABLED=false)"}), 503
 
 #Rutas CRUD básicas para historias de usuario
 
-def create_user_stories_blueprint(user_story_manager=None):
+def create_user_stories_blueprint(user_story_manager=None, job_manager=None):
     user_stories_bp = Blueprint('user_stories', __name__)
     usm = user_story_manager or UserStoryManager()
+    jm = job_manager or JobManager(handlers=load_ai_job_handlers)
 
     @user_stories_bp.route('/user_stories', methods=['POST'])
     def create_user_story():
@@ -27,13 +44,99 @@ def create_user_stories_blueprint(user_story_manager=None):
         user_story = usm.add_user_story(validated.model_dump())
         return jsonify(UserStorySchema.model_validate(user_story).model_dump()), 201
 
+    @user_stories_bp.route('/user_stories/bulk', methods=['POST'])
+    def create_user_stories_bulk():
+        data = request.json
+        if not data or not isinstance(data, list):
+            return jsonify({"error": "Se esperaba una lista de historias de usuario"}), 400
+        if len(data) > MAX_BULK_SIZE:
+            return jsonify({"error": f"No se admiten más de {MAX_BULK_SIZE} historias por petición"}), 400
+        try:
+            validated = UserStorySchemas(UserStorySchemasList=data)
+        except ValidationError as e:
+            return jsonify({"errors": e.errors()}), 422
+        ids = usm.add_user_stories([us.model_dump() for us in validated.UserStorySchemasList])
+        return jsonify({"created": len(validated.UserStorySchemasList), "ids": ids}), 201
+
+    @user_stories_bp.route('/user_stories/bulk', methods=['PATCH'])
+    def update_user_stories_bulk():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            ids = parse_bulk_ids(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            changes = UserStoryPatchSchema.model_validate(data.get('changes') or {})
+        except ValidationError as e:
+            # Sin contexto: los ValueError de los validadores no son serializables a JSON
+            return jsonify({"errors": e.errors(include_context=False)}), 422
+        updated = usm.update_user_stories(ids, changes.model_dump(exclude_unset=True))
+        return jsonify({"updated": updated})
+
+    @user_stories_bp.route('/user_stories/bulk', methods=['DELETE'])
+    def delete_user_stories_bulk():
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            ids = parse_bulk_ids(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        deleted = usm.delete_user_stories(ids)
+        return jsonify({"deleted": deleted})
+
+    # Listado paginado; admite If-None-Match (ETag). Con ?expand=tasks incluye las tareas de cada historia,
+    # su número y su esfuerzo total (una sola consulta adicional para toda la página)
     @user_stories_bp.route('/user_stories', methods=['GET'])
+    @read_only
+    @conditional_get('user_stories', expansions=USER_STORY_EXPANSIONS)
     def get_user_stories():
-        user_stories = usm.get_all_user_stories()
-        return jsonify(UserStorySchemas(UserStorySchemasList=[UserStorySchema.model_validate(us) for us in user_stories]).model_dump())
+        filters = {k: request.args.get(k) for k in USER_STORY_FILTERS if request.args.get(k)}
+        try:
+            expand = parse_expand(request.args.get('expand'), USER_STORY_EXPANSIONS)
+            limit = parse_limit(request.args.get('limit'))
+            after_id = decode_cursor(request.args.get('cursor'))
+            if 'tasks' in expand:
+                user_stories, next_id = usm.get_user_stories_page(filters, limit, after_id, expand_tasks=True)
+                return json_list_response('UserStorySchemasList', dump_user_stories_with_tasks_json(user_stories), encode_cursor(next_id))
+            user_stories, next_id = usm.get_user_stories_page(filters, limit, after_id)
+        except ValueError as e:
+            return jsonify({"error": f"Parámetros de consulta no válidos: {str(e)}"}), 400
+        return json_list_response('UserStorySchemasList', dump_user_stories_json(user_stories), encode_cursor(next_id))
+
+    # Exportar las historias en streaming (NDJSON o CSV) sin cargar la tabla en memoria
+    @user_stories_bp.route('/user_stories/export', methods=['GET'])
+    @read_only
+    def export_user_stories():
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"format debe ser uno de {list(EXPORT_FORMATS)}"}), 400
+        filters = {k: request.args.get(k) for k in USER_STORY_FILTERS if request.args.get(k)}
+        try:
+            user_stories = usm.iter_user_stories(filters)
+        except ValueError as e:
+            return jsonify({"error": f"Parámetros de consulta no válidos: {str(e)}"}), 400
+        rows = (user_story_row_to_dict(us) for us in user_stories)
+        return Response(
+            stream_with_context(stream_rows(rows, USER_STORY_EXPORT_FIELDS, export_format)),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f"attachment; filename=user_stories.{export_format}"}
+        )
 
     @user_stories_bp.route('/user_stories/<int:user_story_id>', methods=['GET'])
+    @read_only
     def get_user_story(user_story_id):
+        try:
+            expand = parse_expand(request.args.get('expand'), USER_STORY_EXPANSIONS)
+        except ValueError as e:
+            return jsonify({"error": f"Parámetros de consulta no válidos: {str(e)}"}), 400
+        if 'tasks' in expand:
+            user_story = usm.get_user_story_with_tasks(user_story_id)
+            if not user_story:
+                return jsonify({"error": "Historia de usuario no encontrada"}), 404
+            return Response(dump_user_story_with_tasks_json(user_story), mimetype='application/json')
         user_story = usm.get_user_story(user_story_id)
         if not user_story:
             return jsonify({"error": "Historia de usuario no encontrada"}), 404
@@ -48,10 +151,35 @@ def create_user_stories_blueprint(user_story_manager=None):
             validated = UserStorySchema(**data)
         except ValidationError as e:
             return jsonify({"errors": e.errors()}), 422
-        user_story = usm.update_user_story(user_story_id, validated.model_dump())
+        try:
+            user_story = usm.update_user_story(user_story_id, validated.model_dump())
+        except VersionConflictError:
+            return jsonify({"error": "La historia de usuario ha sido modificada por otra petición"}), 409
         if not user_story:
             return jsonify({"error": "Historia de usuario no encontrada"}), 404
         return jsonify(UserStorySchema.model_validate(user_story).model_dump())
+
+    # Actualización parcial con un único UPDATE condicionado a la versión leída (409 si ha cambiado)
+    @user_stories_bp.route('/user_stories/<int:user_story_id>', methods=['PATCH'])
+    def patch_user_story(user_story_id):
+        data = request.json
+        if not data:
+            return jsonify({"error": "No se proporcionaron datos de entrada"}), 400
+        try:
+            validated = UserStoryVersionedPatchSchema.model_validate(data)
+        except ValidationError as e:
+            # Sin contexto: los ValueError de los validadores no son serializables a JSON
+            return jsonify({"errors": e.errors(include_context=False)}), 422
+        changes = validated.model_dump(exclude_unset=True, exclude={'version'})
+        if not changes:
+            return jsonify({"error": "No se proporcionaron campos a modificar"}), 400
+        try:
+            row = usm.patch_user_story(user_story_id, changes, validated.version)
+        except VersionConflictError as e:
+            return jsonify({"error": "La historia de usuario ha sido modificada por otra petición", "version": e.current_version}), 409
+        if row is None:
+            return jsonify({"error": "Historia de usuario no encontrada"}), 404
+        return jsonify(user_story_row_to_dict(row))
     
     @user_stories_bp.route('/user_stories/<int:user_story_id>', methods=['DELETE'])
     def delete_user_story(user_story_id):
@@ -65,68 +193,50 @@ def create_user_stories_blueprint(user_story_manager=None):
     # #### Rutas para renderizar la plantilla HTML con las historias de usuario #####
     
     @user_stories_bp.route('/user-stories', methods=['GET'])
+    @read_only
     def user_stories_html():
-        user_stories = usm.get_all_user_stories()
-        # Pasar los objetos ORM convertidos a diccionario para Jinja2
         try:
-            user_stories_dicts = [us.to_dict() for us in user_stories]
+            expand = parse_expand(request.args.get('expand'), USER_STORY_EXPANSIONS)
+        except ValueError as e:
+            return jsonify({"error": f"Parámetros de consulta no válidos: {str(e)}"}), 400
+        # Pasar las filas convertidas a diccionario para Jinja2
+        try:
+            if 'tasks' in expand:
+                user_stories_dicts = user_stories_with_tasks_to_dicts(usm.get_all_user_stories_with_tasks())
+            else:
+                user_stories_dicts = user_stories_to_dicts(usm.get_all_user_story_rows())
         except ValidationError as e:
             return jsonify({"errors": e.errors()}), 422
-        return render_template('user-stories.html', user_stories=user_stories_dicts)
+        return render_template('user-stories.html', user_stories=user_stories_dicts, expand_tasks='tasks' in expand)
 
+    # Las generaciones con IA tardan decenas de segundos: se encolan como trabajos en segundo plano
+    # y se responde 202 con el id del trabajo, que se consulta en GET /jobs/<job_id>
     @user_stories_bp.route('/user-stories', methods=['POST'])
     def generate_user_story_from_prompt():
+        if not current_app.config.get('AI_ENABLED', True):
+            return ai_disabled_response()
         prompt = request.form.get('prompt')
         if not prompt:
             return jsonify({'error': 'No se proporcionó prompt'}), 400
-        # Contexto de rol system para la IA
-        context = [
-            {"role": "system", "content": "Eres un experto en desarrollo de software y en la creación de historias de usuario siguiendo buenas prácticas ágiles. Tu tarea es generar historias de usuario claras, concisas y útiles para equipos de desarrollo."}
-        ]
-        response = process_message_with_AI(prompt, context, ResponseType.ANALYTICS, UserStorySchema)
-        try:
-            user_story_data = json.loads(response)
-            validated = UserStorySchema(**user_story_data)
-        except Exception as e:
-            return f"<script>alert('Respuesta IA inválida: {str(e)}'); window.location.href='{url_for('user_stories.user_stories_html')}';</script>"
-        usm = UserStoryManager()
-        user_story = usm.add_user_story(validated.model_dump())
-        return f"<script>alert('Historia de usuario generada y guardada correctamente'); window.location.href='{url_for('user_stories.user_stories_html')}';</script>"
+        job = jm.submit_job('generate_user_story', {'prompt': prompt})
+        return jsonify(job.to_dict()), 202, {'Location': url_for('jobs.get_job', job_id=job.id)}
 
     @user_stories_bp.route('/user-stories/<int:user_story_id>/generate-tasks', methods=['POST'])
     def generate_tasks_for_user_story(user_story_id):
-        # Obtener la historia de usuario
-        usm = UserStoryManager()
-        user_story = usm.get_user_story(user_story_id)
-        if not user_story:
-            return f"<script>alert('Historia de usuario no encontrada'); window.location.href='{url_for('user_stories.user_stories_html')}';</script>"
-        # Construir prompt para la IA
-        prompt = f"Genera una lista de tareas detalladas para la siguiente historia de usuario: {user_story.to_dict()}"
-
-        context = [
-            {"role": "system", "content": "Eres un experto en gestión de proyectos ágiles y descomposición de historias de usuario en tareas técnicas. Se te va a dar una historia de usuario en formato json y debes devolver SOLO un array de objetos JSON puros (sin saltos de linea) en base al model que tienes en el parámetro response_format. Creame al menos 2 tasks dentro del array pero no más de 4, y cada task que no tenga más de 200 palabras. En cualquier caso el límite total en tu respuesta no puede superar las {response_limit} palabras"},]
-
-        response = process_message_with_AI(prompt, context, ResponseType.CREATIVE, TaskSchemas)
-        try:
-            tasks_data = json.loads(response)
-            validated_tasks = TaskSchemas(**tasks_data)
-        except Exception as e:
-            return f"<script>alert('Respuesta IA inválida: {str(e)}'); window.location.href='{url_for('user_stories.user_stories_html')}';</script>"
-        # Guardar tareas en base de datos
-        tm = TaskManager()
-        for task in validated_tasks.TaskSchemasList:
-            # Crea una copia del modelo con el user_story_id actualizado
-            task_with_us = task.model_copy(update={'user_story_id': user_story_id})
-            tm.add_task(task_with_us.model_dump())
-        return redirect(url_for('user_stories.tasks_for_user_story', user_story_id=user_story_id))
+        if not current_app.config.get('AI_ENABLED', True):
+            return ai_disabled_response()
+        if not usm.get_user_story(user_story_id):
+            return jsonify({"error": "Historia de usuario no encontrada"}), 404
+        job = jm.submit_job('generate_tasks', {'user_story_id': user_story_id})
+        return jsonify(job.to_dict()), 202, {'Location': url_for('jobs.get_job', job_id=job.id)}
 
     @user_stories_bp.route('/user-stories/<int:user_story_id>/tasks', methods=['GET'])
+    @read_only
     def tasks_for_user_story(user_story_id):
-        from src.managers.task_manager import TaskManager
         tm = TaskManager()
-        tasks = [t for t in tm.get_all_tasks() if t.user_story_id == user_story_id]
+        tasks = tm.get_tasks_by_user_story(user_story_id)
         # Convertir a dict para Jinja2
-        tasks_dicts = [t.to_dict() for t in tasks]
+        tasks_dicts = tasks_to_dicts(tasks)
         return render_template('tasks.html', tasks=tasks_dicts, user_story_id=user_story_id)
 
     return user_stories_bp
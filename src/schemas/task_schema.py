@@ -14,6 +14,7 @@ class TaskSchema(BaseModel):
     assigned_to: str
     user_story_id: Optional[int] = None
     created_at: Optional[datetime] = Field(default=None, serialization_only=True)
+    version: Optional[int] = Field(default=None, serialization_only=True)
 
     @field_validator('priority')
     @classmethod
@@ -34,4 +35,25 @@ class TaskSchema(BaseModel):
 class TaskSchemas(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     TaskSchemasList: List[TaskSchema]
-    
+
+class TaskPatchSchema(BaseModel):
+    """Campos modificables de una tarea; solo se aplican los que vienen en la petición."""
+    model_config = ConfigDict(extra='forbid')
+    title: Optional[str] = None
+    description: Optional[str] = None
+    priority: Optional[PriorityEnum] = None
+    effort_hours: Optional[float] = None
+    status: Optional[StatusEnum] = None
+    assigned_to: Optional[str] = None
+    user_story_id: Optional[int] = None
+
+    @field_validator('title', 'description', 'priority', 'effort_hours', 'status', 'assigned_to')
+    @classmethod
+    def not_null(cls, v):
+        if v is None:
+            raise ValueError('el campo no puede ser nulo')
+        return v
+
+class TaskVersionedPatchSchema(TaskPatchSchema):
+    """Cuerpo de PATCH /tasks/<id>: los campos a cambiar y la versión de la tarea que el cliente leyó."""
+    version: int
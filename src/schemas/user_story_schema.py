@@ -15,6 +15,7 @@ class UserStorySchema(BaseModel):
     story_points: int
     effort_hours: float
     created_at: Optional[datetime] = Field(default=None, serialization_only=True)
+    version: Optional[int] = Field(default=None, serialization_only=True)
 
     @field_validator('priority')
     @classmethod
@@ -34,3 +35,26 @@ class UserStorySchema(BaseModel):
 class UserStorySchemas(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     UserStorySchemasList: List[UserStorySchema]
+
+class UserStoryPatchSchema(BaseModel):
+    """Campos modificables de una historia de usuario; solo se aplican los que vienen en la petición."""
+    model_config = ConfigDict(extra='forbid')
+    project: Optional[str] = None
+    role: Optional[str] = None
+    goal: Optional[str] = None
+    reason: Optional[str] = None
+    description: Optional[str] = None
+    priority: Optional[PriorityEnum] = None
+    story_points: Optional[int] = Field(default=None, ge=1, le=8)
+    effort_hours: Optional[float] = None
+
+    @field_validator('project', 'role', 'goal', 'reason', 'description', 'priority', 'story_points', 'effort_hours')
+    @classmethod
+    def not_null(cls, v):
+        if v is None:
+            raise ValueError('el campo no puede ser nulo')
+        return v
+
+class UserStoryVersionedPatchSchema(UserStoryPatchSchema):
+    """Cuerpo de PATCH /user_stories/<id>: los campos a cambiar y la versión de la historia que el cliente leyó."""
+    version: int
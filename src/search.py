@@ -0,0 +1,166 @@
+# Búsqueda de texto completo sobre tareas e historias de usuario.
+# MySQL usa índices FULLTEXT (los mantiene el propio motor); SQLite, tablas virtuales FTS5 que
+# actualizan las escrituras de los managers.
+import re
+from sqlalchemy import DDL, column, delete, event, func, inspect, literal_column, select, table, text
+from sqlalchemy.dialects.mysql import match
+from src.db import db
+from src.models.enums import StatusEnum
+from src.models.task import Task
+from src.models.user_story import UserStory
+from src.utils import DEFAULT_PAGE_SIZE
+
+# Columnas indexadas de cada entidad
+TASK_SEARCH_COLUMNS = ('title', 'description')
+USER_STORY_SEARCH_COLUMNS = ('goal', 'reason', 'description')
+SEARCH_KINDS = ('task', 'user_story')
+
+tasks_fts = table('tasks_fts', column('rowid'), *[column(c) for c in TASK_SEARCH_COLUMNS])
+user_stories_fts = table('user_stories_fts', column('rowid'), *[column(c) for c in USER_STORY_SEARCH_COLUMNS])
+
+# DDL por dialecto; se ejecuta junto a la creación de las tablas (create_all) y en upgrade_schema
+_SQLITE_DDL = {
+    'tasks_fts': f"CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5({', '.join(TASK_SEARCH_COLUMNS)})",
+    'user_stories_fts': f"CREATE VIRTUAL TABLE IF NOT EXISTS user_stories_fts USING fts5({', '.join(USER_STORY_SEARCH_COLUMNS)})",
+}
+_MYSQL_DDL = {
+    'ft_tasks_text': f"CREATE FULLTEXT INDEX ft_tasks_text ON tasks ({', '.join(TASK_SEARCH_COLUMNS)})",
+    'ft_user_stories_text': f"CREATE FULLTEXT INDEX ft_user_stories_text ON user_stories ({', '.join(USER_STORY_SEARCH_COLUMNS)})",
+}
+for _table, _fts, _fulltext in ((Task.__table__, 'tasks_fts', 'ft_tasks_text'), (UserStory.__table__, 'user_stories_fts', 'ft_user_stories_text')):
+    event.listen(_table, 'after_create', DDL(_SQLITE_DDL[_fts]).execute_if(dialect='sqlite'))
+    event.listen(_table, 'after_create', DDL(_MYSQL_DDL[_fulltext]).execute_if(dialect='mysql'))
+    event.listen(_table, 'before_drop', DDL(f"DROP TABLE IF EXISTS {_fts}").execute_if(dialect='sqlite'))
+
+
+def search_terms(query):
+    """Palabras de la consulta; se descarta la sintaxis propia del motor para que la entrada no la rompa."""
+    return re.findall(r"\w+", query or "")
+
+
+class SearchIndex:
+    """Índice de búsqueda: mantenimiento desde los managers y consulta con ranking por relevancia."""
+
+    def _dialect(self):
+        return db.session.get_bind().dialect.name
+
+    def reindex_tasks(self, task_ids):
+        """Vuelve a indexar las tareas indicadas (las eliminadas desaparecen del índice). No hace commit."""
+        if task_ids and self._dialect() == 'sqlite':
+            self._reindex(tasks_fts, Task, TASK_SEARCH_COLUMNS, task_ids)
+
+    def reindex_user_stories(self, user_story_ids):
+        """Vuelve a indexar las historias indicadas (las eliminadas desaparecen del índice). No hace commit."""
+        if user_story_ids and self._dialect() == 'sqlite':
+            self._reindex(user_stories_fts, UserStory, USER_STORY_SEARCH_COLUMNS, user_story_ids)
+
+    def _reindex(self, fts, model, columns, ids):
+        db.session.flush()
+        ids = list(ids)
+        db.session.execute(delete(fts).where(fts.c.rowid.in_(ids)))
+        rows = select(model.id, *[getattr(model, c) for c in columns]).where(model.id.in_(ids))
+        db.session.execute(fts.insert().from_select(['rowid', *columns], rows))
+
+    def rebuild(self):
+        """Reconstruye el índice SQLite completo (p. ej. tras crear las tablas FTS en una base de datos con datos)."""
+        if self._dialect() != 'sqlite':
+            return
+        for fts, model, columns in ((tasks_fts, Task, TASK_SEARCH_COLUMNS), (user_stories_fts, UserStory, USER_STORY_SEARCH_COLUMNS)):
+            db.session.execute(delete(fts))
+            rows = select(model.id, *[getattr(model, c) for c in columns])
+            db.session.execute(fts.insert().from_select(['rowid', *columns], rows))
+
+    def search(self, query, kind=None, project=None, status=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """
+        Busca en tareas y/o historias (kind) y devuelve los resultados ordenados por relevancia
+        y el offset de la página siguiente, o None si no hay más.
+        Filtros: project (ambas) y status (solo tareas; si se indica, no se devuelven historias).
+        Lanza ValueError si la consulta no contiene palabras o los filtros no son válidos.
+        """
+        terms = search_terms(query)
+        if not terms:
+            raise ValueError("La consulta de búsqueda no contiene palabras")
+        if kind is not None and kind not in SEARCH_KINDS:
+            raise ValueError(f"type debe ser uno de: {', '.join(SEARCH_KINDS)}")
+        status = StatusEnum(status) if status else None
+        # Cada origen aporta como mucho offset + limit + 1 resultados; se mezclan por puntuación
+        window = offset + limit + 1
+        results = []
+        if kind in (None, 'task'):
+            results += self._search_tasks(terms, project, status, window)
+        if kind in (None, 'user_story') and status is None:
+            results += self._search_user_stories(terms, project, window)
+        results.sort(key=lambda r: (-r['score'], r['type'], r['id']))
+        page = results[offset:offset + limit]
+        next_offset = offset + limit if len(results) > offset + limit else None
+        return page, next_offset
+
+    def _match(self, fts, model, columns, terms):
+        # Devuelve (puntuación, condición WHERE) para el dialecto en uso
+        if self._dialect() == 'mysql':
+            score = match(*[getattr(model, c) for c in columns], against=" ".join(terms))
+            return score, score > 0
+        # FTS5: bm25 es menor cuanto más relevante; se invierte para ordenar de mayor a menor
+        fts_query = " OR ".join(f'"{term}"' for term in terms)
+        return -func.bm25(literal_column(fts.name)), literal_column(fts.name).op('MATCH')(fts_query)
+
+    def _joined(self, stmt, fts, model):
+        if self._dialect() == 'mysql':
+            return stmt.select_from(model)
+        return stmt.select_from(fts).join(model, model.id == fts.c.rowid)
+
+    def _search_tasks(self, terms, project, status, window):
+        score, condition = self._match(tasks_fts, Task, TASK_SEARCH_COLUMNS, terms)
+        stmt = select(Task.id, Task.title, Task.status, UserStory.project, score.label('score'))
+        stmt = self._joined(stmt, tasks_fts, Task).outerjoin(UserStory, Task.user_story_id == UserStory.id).where(condition)
+        if project:
+            stmt = stmt.where(UserStory.project == project)
+        if status is not None:
+            stmt = stmt.where(Task.status == status)
+        rows = db.session.execute(stmt.order_by(literal_column('score').desc(), Task.id).limit(window)).all()
+        return [
+            {'type': 'task', 'id': row.id, 'title': row.title, 'status': row.status.value,
+             'project': row.project, 'score': float(row.score)}
+            for row in rows
+        ]
+
+    def _search_user_stories(self, terms, project, window):
+        score, condition = self._match(user_stories_fts, UserStory, USER_STORY_SEARCH_COLUMNS, terms)
+        stmt = select(UserStory.id, UserStory.goal, UserStory.project, score.label('score'))
+        stmt = self._joined(stmt, user_stories_fts, UserStory).where(condition)
+        if project:
+            stmt = stmt.where(UserStory.project == project)
+        rows = db.session.execute(stmt.order_by(literal_column('score').desc(), UserStory.id).limit(window)).all()
+        return [
+            {'type': 'user_story', 'id': row.id, 'goal': row.goal, 'project': row.project, 'score': float(row.score)}
+            for row in rows
+        ]
+
+
+def ensure_search_schema():
+    """
+    Crea las estructuras de búsqueda que falten en una base de datos existente y, en SQLite,
+    indexa los datos que ya hubiera. Devuelve los nombres creados. Debe llamarse dentro de un app_context.
+    """
+    dialect = db.engine.dialect.name
+    inspector = inspect(db.engine)
+    created = []
+    if dialect == 'sqlite':
+        existing = set(inspector.get_table_names())
+        created = [name for name in _SQLITE_DDL if name not in existing]
+        for name in created:
+            db.session.execute(text(_SQLITE_DDL[name]))
+        if created:
+            search_index.rebuild()
+        db.session.commit()
+    elif dialect == 'mysql':
+        existing = {ix['name'] for t in ('tasks', 'user_stories') for ix in inspector.get_indexes(t)}
+        created = [name for name in _MYSQL_DDL if name not in existing]
+        for name in created:
+            db.session.execute(text(_MYSQL_DDL[name]))
+        db.session.commit()
+    return created
+
+
+# Instancia compartida por los managers y las rutas
+search_index = SearchIndex()
@@ -0,0 +1,126 @@
+# Serialización rápida de listados: filas de columnas (sin hidratar objetos ORM) -> JSON en bytes.
+import json
+from datetime import datetime
+from typing import List, Optional
+from typing_extensions import TypedDict
+from flask import Response
+from pydantic import TypeAdapter
+from src.models.enums import PriorityEnum, StatusEnum
+from src.models.task import Task
+from src.models.user_story import UserStory
+
+# Columnas que se leen en los listados (mismo orden que TaskSchema/UserStorySchema)
+TASK_COLUMNS = [c for c in Task.__table__.columns if c.key in ('id', 'title', 'description', 'priority', 'effort_hours', 'status', 'assigned_to', 'user_story_id', 'created_at', 'version')]
+USER_STORY_COLUMNS = [c for c in UserStory.__table__.columns if c.key in ('id', 'project', 'role', 'goal', 'reason', 'description', 'priority', 'story_points', 'effort_hours', 'created_at', 'version')]
+
+
+class TaskRow(TypedDict):
+    id: int
+    title: str
+    description: str
+    priority: PriorityEnum
+    effort_hours: float
+    status: StatusEnum
+    assigned_to: str
+    user_story_id: Optional[int]
+    created_at: Optional[datetime]
+    version: int
+
+
+class UserStoryRow(TypedDict):
+    id: int
+    project: str
+    role: str
+    goal: str
+    reason: str
+    description: str
+    priority: PriorityEnum
+    story_points: int
+    effort_hours: float
+    created_at: Optional[datetime]
+    version: int
+
+
+class UserStoryWithTasksRow(UserStoryRow):
+    tasks: List[TaskRow]
+    task_count: int
+    task_effort_hours: float
+
+
+# Adaptadores compilados una sola vez: validan y serializan la lista entera en pydantic-core
+_task_rows_adapter = TypeAdapter(List[TaskRow])
+_user_story_rows_adapter = TypeAdapter(List[UserStoryRow])
+_task_row_adapter = TypeAdapter(TaskRow)
+_user_story_row_adapter = TypeAdapter(UserStoryRow)
+_user_stories_with_tasks_adapter = TypeAdapter(List[UserStoryWithTasksRow])
+_user_story_with_tasks_adapter = TypeAdapter(UserStoryWithTasksRow)
+
+
+def _mappings(rows):
+    # Acepta filas de SQLAlchemy (Row) o diccionarios
+    return [row._mapping if hasattr(row, '_mapping') else row for row in rows]
+
+
+def dump_tasks_json(rows):
+    """Serializa una lista de filas de tareas directamente a JSON (bytes)."""
+    return _task_rows_adapter.dump_json(_task_rows_adapter.validate_python(_mappings(rows)))
+
+
+def dump_user_stories_json(rows):
+    """Serializa una lista de filas de historias de usuario directamente a JSON (bytes)."""
+    return _user_story_rows_adapter.dump_json(_user_story_rows_adapter.validate_python(_mappings(rows)))
+
+
+def tasks_to_dicts(rows):
+    """Convierte filas de tareas en diccionarios con tipos JSON (para las plantillas y las exportaciones)."""
+    return _task_rows_adapter.dump_python(_task_rows_adapter.validate_python(_mappings(rows)), mode='json')
+
+
+def user_stories_to_dicts(rows):
+    """Convierte filas de historias en diccionarios con tipos JSON (para las plantillas y las exportaciones)."""
+    return _user_story_rows_adapter.dump_python(_user_story_rows_adapter.validate_python(_mappings(rows)), mode='json')
+
+
+def task_row_to_dict(row):
+    """Versión de tasks_to_dicts para una sola fila (exportaciones en streaming)."""
+    return _task_row_adapter.dump_python(_task_row_adapter.validate_python(_mappings([row])[0]), mode='json')
+
+
+def user_story_row_to_dict(row):
+    """Versión de user_stories_to_dicts para una sola fila (exportaciones en streaming)."""
+    return _user_story_row_adapter.dump_python(_user_story_row_adapter.validate_python(_mappings([row])[0]), mode='json')
+
+
+def _with_tasks(user_story):
+    # Historia ORM con sus tareas ya cargadas (selectinload) -> fila con las tareas, su número y su esfuerzo total
+    tasks = sorted(user_story.tasks, key=lambda task: task.id)
+    row = {column.key: getattr(user_story, column.key) for column in USER_STORY_COLUMNS}
+    row['tasks'] = [{column.key: getattr(task, column.key) for column in TASK_COLUMNS} for task in tasks]
+    row['task_count'] = len(tasks)
+    row['task_effort_hours'] = float(sum(task.effort_hours or 0 for task in tasks))
+    return row
+
+
+def dump_user_stories_with_tasks_json(user_stories):
+    """Serializa historias (objetos ORM con tasks cargadas) a JSON (bytes), con sus tareas, su número y su esfuerzo total."""
+    return _user_stories_with_tasks_adapter.dump_json(_user_stories_with_tasks_adapter.validate_python([_with_tasks(us) for us in user_stories]))
+
+
+def dump_user_story_with_tasks_json(user_story):
+    """Versión de dump_user_stories_with_tasks_json para una sola historia."""
+    return _user_story_with_tasks_adapter.dump_json(_user_story_with_tasks_adapter.validate_python(_with_tasks(user_story)))
+
+
+def user_stories_with_tasks_to_dicts(user_stories):
+    """Versión de dump_user_stories_with_tasks_json que devuelve diccionarios con tipos JSON (para las plantillas)."""
+    return _user_stories_with_tasks_adapter.dump_python(
+        _user_stories_with_tasks_adapter.validate_python([_with_tasks(us) for us in user_stories]), mode='json')
+
+
+def json_list_response(list_key, items_json, next_cursor=None):
+    """
+    Construye la respuesta de un listado paginado ({list_key: [...], "next_cursor": ...})
+    concatenando los bytes ya serializados, sin pasar por jsonify.
+    """
+    body = b'{"' + list_key.encode() + b'":' + items_json + b',"next_cursor":' + json.dumps(next_cursor).encode() + b'}'
+    return Response(body, mimetype='application/json')
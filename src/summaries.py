@@ -0,0 +1,245 @@
+# Mantenimiento incremental de la tabla report_summaries a partir de las escrituras de los managers.
+import enum
+import os
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from src.db import db
+from src.models.report_summary import ReportSummary
+from src.models.task import Task
+from src.models.user_story import UserStory
+
+# Desactivado por defecto: al activarlo sobre una base de datos con datos hay que ejecutar rebuild-report-summary
+REPORT_SUMMARY_ENABLED = os.getenv("REPORT_SUMMARY_ENABLED", "false").lower() == "true"
+
+TASKS = 'tasks'
+USER_STORIES = 'user_stories'
+
+# Dimensiones por las que se agrupa cada origen y la columna SQL correspondiente
+TASK_DIMENSIONS = {
+    'project': UserStory.project,
+    'status': Task.status,
+    'priority': Task.priority,
+    'assigned_to': Task.assigned_to,
+}
+USER_STORY_DIMENSIONS = {
+    'project': UserStory.project,
+    'priority': UserStory.priority,
+}
+
+
+def summary_value(value):
+    # Valor de la dimensión tal y como se guarda en la tabla resumen
+    if value is None:
+        return ''
+    if isinstance(value, enum.Enum):
+        return value.value
+    return str(value)
+
+
+def _task_fact(project, status, priority, assigned_to, effort_hours):
+    return {
+        'dimensions': {'project': project, 'status': status, 'priority': priority, 'assigned_to': assigned_to},
+        'effort_hours': effort_hours or 0,
+        'story_points': 0,
+    }
+
+
+def _user_story_fact(project, priority, effort_hours, story_points):
+    return {
+        'dimensions': {'project': project, 'priority': priority},
+        'effort_hours': effort_hours or 0,
+        'story_points': story_points or 0,
+    }
+
+
+class ReportSummaryMaintainer:
+    """
+    Aplica a report_summaries la diferencia entre el estado anterior y posterior de las filas que escribe
+    un manager, dentro de su misma transacción. Cada escritura cuesta O(filas tocadas), y la lectura
+    de un informe O(grupos). Sin activar, todos los métodos son no-ops.
+    Las capturas bloquean (SELECT ... FOR UPDATE) las filas que se van a escribir hasta el commit, para que
+    dos escrituras concurrentes sobre las mismas filas no resten dos veces el mismo estado anterior.
+    """
+
+    def __init__(self, enabled=REPORT_SUMMARY_ENABLED):
+        self.enabled = enabled
+
+    # --- Tareas ---
+    def capture_tasks(self, task_ids):
+        """Estado actual de las tareas indicadas (antes de escribir)."""
+        if not self.enabled or not task_ids:
+            return []
+        rows = db.session.execute(
+            select(UserStory.project, Task.status, Task.priority, Task.assigned_to, Task.effort_hours)
+            .select_from(Task)
+            .outerjoin(UserStory, Task.user_story_id == UserStory.id)
+            .where(Task.id.in_(task_ids))
+            .with_for_update(of=Task)
+        ).all()
+        return [_task_fact(*row) for row in rows]
+
+    def record_tasks(self, task_ids, before):
+        """Aplica la diferencia entre before (capture_tasks) y el estado tras la escritura aún sin commit."""
+        if not self.enabled:
+            return
+        db.session.flush()
+        self.apply(TASKS, before, self.capture_tasks(task_ids))
+
+    def record_task_rows(self, rows):
+        """Suma las tareas nuevas a partir de los diccionarios de row_from_dict (sin releerlas)."""
+        if not self.enabled or not rows:
+            return
+        story_ids = {row['user_story_id'] for row in rows if row.get('user_story_id') is not None}
+        # FOR SHARE: un cambio de proyecto concurrente de la historia espera a que estas tareas estén confirmadas
+        projects = dict(db.session.execute(
+            select(UserStory.id, UserStory.project).where(UserStory.id.in_(story_ids)).with_for_update(read=True)
+        ).all()) if story_ids else {}
+        after = [
+            _task_fact(projects.get(row.get('user_story_id')), row['status'], row['priority'], row['assigned_to'], row['effort_hours'])
+            for row in rows
+        ]
+        self.apply(TASKS, [], after)
+
+    def task_ids_for_user_stories(self, user_story_ids):
+        # Tareas cuya dimensión project depende de las historias indicadas
+        if not self.enabled or not user_story_ids:
+            return []
+        # Se bloquean antes las historias: hasta el commit no se les pueden añadir tareas que esta lista no vea
+        db.session.execute(select(UserStory.id).where(UserStory.id.in_(user_story_ids)).with_for_update())
+        return list(db.session.scalars(select(Task.id).where(Task.user_story_id.in_(user_story_ids))))
+
+    # --- Historias de usuario ---
+    def capture_user_stories(self, user_story_ids):
+        """Estado actual de las historias indicadas (antes de escribir)."""
+        if not self.enabled or not user_story_ids:
+            return []
+        rows = db.session.execute(
+            select(UserStory.project, UserStory.priority, UserStory.effort_hours, UserStory.story_points)
+            .where(UserStory.id.in_(user_story_ids))
+            .with_for_update()
+        ).all()
+        return [_user_story_fact(*row) for row in rows]
+
+    def record_user_stories(self, user_story_ids, before):
+        if not self.enabled:
+            return
+        db.session.flush()
+        self.apply(USER_STORIES, before, self.capture_user_stories(user_story_ids))
+
+    def record_user_story_rows(self, rows):
+        if not self.enabled or not rows:
+            return
+        after = [_user_story_fact(row['project'], row['priority'], row['effort_hours'], row['story_points']) for row in rows]
+        self.apply(USER_STORIES, [], after)
+
+    # --- Tabla resumen ---
+    def apply(self, source, before, after):
+        """Resta los hechos de before, suma los de after y escribe solo los grupos que cambian."""
+        deltas = defaultdict(lambda: [0, 0.0, 0])
+        for sign, facts in ((-1, before), (1, after)):
+            for fact in facts:
+                for dimension, value in fact['dimensions'].items():
+                    delta = deltas[(dimension, summary_value(value))]
+                    delta[0] += sign
+                    delta[1] += sign * fact['effort_hours']
+                    delta[2] += sign * fact['story_points']
+        # Orden fijo de los grupos: dos transacciones concurrentes bloquean sus filas en el mismo orden
+        rows = [
+            {'source': source, 'dimension': dimension, 'value': value,
+             'item_count': count, 'effort_hours': effort_hours, 'story_points': story_points}
+            for (dimension, value), (count, effort_hours, story_points) in sorted(deltas.items())
+            if count or effort_hours or story_points
+        ]
+        if rows:
+            self._add_to_groups(rows)
+
+    def _add_to_groups(self, rows):
+        """
+        Suma cada fila a su grupo creándolo si no existe, con un único upsert aditivo: dos primeros
+        escritores concurrentes del mismo grupo no chocan en la clave primaria (como seed_table_versions).
+        """
+        dialect = db.session.get_bind(mapper=ReportSummary).dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            stmt = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(ReportSummary)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ReportSummary.source, ReportSummary.dimension, ReportSummary.value],
+                set_={
+                    'item_count': ReportSummary.item_count + stmt.excluded.item_count,
+                    'effort_hours': ReportSummary.effort_hours + stmt.excluded.effort_hours,
+                    'story_points': ReportSummary.story_points + stmt.excluded.story_points,
+                },
+            )
+        elif dialect in ("mysql", "mariadb"):
+            stmt = mysql_insert(ReportSummary)
+            stmt = stmt.on_duplicate_key_update(
+                item_count=ReportSummary.item_count + stmt.inserted.item_count,
+                effort_hours=ReportSummary.effort_hours + stmt.inserted.effort_hours,
+                story_points=ReportSummary.story_points + stmt.inserted.story_points,
+            )
+        else:
+            # Otros dialectos: UPDATE y, si el grupo no existe, INSERT en un SAVEPOINT; si otro escritor
+            # lo acaba de crear, el INSERT choca y se repite el UPDATE
+            for row in rows:
+                if self._add_to_group(row):
+                    continue
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(insert(ReportSummary), [row])
+                except IntegrityError:
+                    self._add_to_group(row)
+            return
+        db.session.execute(stmt, rows)
+
+    @staticmethod
+    def _add_to_group(row):
+        return db.session.execute(
+            update(ReportSummary)
+            .where(ReportSummary.source == row['source'], ReportSummary.dimension == row['dimension'],
+                   ReportSummary.value == row['value'])
+            .values(
+                item_count=ReportSummary.item_count + row['item_count'],
+                effort_hours=ReportSummary.effort_hours + row['effort_hours'],
+                story_points=ReportSummary.story_points + row['story_points'],
+            )
+        ).rowcount > 0
+
+    def rebuild(self):
+        """
+        Recalcula report_summaries desde cero con GROUP BY. Necesario al activar la tabla resumen sobre
+        datos existentes o tras escrituras hechas fuera de los managers. No hace commit.
+        """
+        db.session.execute(delete(ReportSummary))
+        rows = []
+        for dimension, column in TASK_DIMENSIONS.items():
+            query = (
+                select(column, func.count(Task.id), func.coalesce(func.sum(Task.effort_hours), 0))
+                .select_from(Task)
+                .outerjoin(UserStory, Task.user_story_id == UserStory.id)
+                .group_by(column)
+            )
+            rows += [
+                {'source': TASKS, 'dimension': dimension, 'value': summary_value(value),
+                 'item_count': count, 'effort_hours': effort_hours, 'story_points': 0}
+                for value, count, effort_hours in db.session.execute(query)
+            ]
+        for dimension, column in USER_STORY_DIMENSIONS.items():
+            query = select(
+                column, func.count(UserStory.id),
+                func.coalesce(func.sum(UserStory.effort_hours), 0), func.coalesce(func.sum(UserStory.story_points), 0)
+            ).group_by(column)
+            rows += [
+                {'source': USER_STORIES, 'dimension': dimension, 'value': summary_value(value),
+                 'item_count': count, 'effort_hours': effort_hours, 'story_points': story_points}
+                for value, count, effort_hours, story_points in db.session.execute(query)
+            ]
+        if rows:
+            db.session.execute(insert(ReportSummary), rows)
+        return len(rows)
+
+
+# Instancia compartida por los managers
+report_summary = ReportSummaryMaintainer()
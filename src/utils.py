@@ -1 +1,129 @@
-# Utilidades generales para el proyecto.
\ No newline at end of file
+# Utilidades generales para el proyecto.
+import base64
+import csv
+import io
+import json
+
+# Tamaño de página por defecto y máximo para los listados paginados
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Número máximo de elementos por petición en los endpoints bulk
+MAX_BULK_SIZE = 1000
+# Filas que se leen de la base de datos en cada lote durante las exportaciones
+EXPORT_BATCH_SIZE = 1000
+# Formatos admitidos por los endpoints de exportación
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def encode_cursor(last_id):
+    """
+    Codifica el id del último elemento devuelto en un token opaco para la siguiente página.
+    """
+    if last_id is None:
+        return None
+    raw = json.dumps({"id": last_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(token):
+    """
+    Decodifica un token de paginación y devuelve el id a partir del cual continuar.
+    Lanza ValueError si el token no es válido.
+    """
+    if not token:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return int(data["id"])
+    except Exception:
+        raise ValueError("cursor no válido")
+
+
+def parse_limit(value):
+    """
+    Valida el parámetro limit de la query string. Lanza ValueError si está fuera de rango.
+    """
+    if value is None or value == "":
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit debe ser un número entero")
+    if not (1 <= limit <= MAX_PAGE_SIZE):
+        raise ValueError(f"limit debe estar entre 1 y {MAX_PAGE_SIZE}")
+    return limit
+
+
+def parse_offset(value):
+    """
+    Valida el parámetro offset de la query string (listados ordenados por relevancia). Lanza ValueError si no es válido.
+    """
+    if value is None or value == "":
+        return 0
+    try:
+        offset = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("offset debe ser un número entero")
+    if offset < 0:
+        raise ValueError("offset no puede ser negativo")
+    return offset
+
+
+def parse_expand(value, allowed):
+    """
+    Valida el parámetro expand de la query string (relaciones separadas por comas, p. ej. expand=tasks).
+    Devuelve el conjunto de relaciones pedidas. Lanza ValueError si alguna no está en allowed.
+    """
+    if not value:
+        return set()
+    expand = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = expand - set(allowed)
+    if unknown:
+        raise ValueError(f"expand debe contener solo {list(allowed)}")
+    return expand
+
+
+def stream_rows(rows, fieldnames, export_format):
+    """
+    Generador que serializa los diccionarios de rows uno a uno como NDJSON o CSV,
+    sin acumular la respuesta completa en memoria.
+    """
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if buffer.tell():
+            # No hubo filas: se emite solo la cabecera
+            yield buffer.getvalue()
+    else:
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+
+def parse_bulk_ids(data):
+    """
+    Valida el campo ids de una petición bulk. Lanza ValueError si no es una lista de enteros válida.
+    """
+    ids = data.get("ids") if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("ids debe ser una lista no vacía de enteros")
+    if len(ids) > MAX_BULK_SIZE:
+        raise ValueError(f"no se admiten más de {MAX_BULK_SIZE} elementos por petición")
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError("ids debe ser una lista no vacía de enteros")
+    return ids
+
+
+def sse_event(event, data):
+    """
+    Formatea un evento Server-Sent Events con los datos serializados como JSON.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
@@ -0,0 +1,165 @@
+# Versionado de tablas para ETags y GET condicionales en los listados, y versión de fila para la concurrencia optimista.
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, request
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from src.db import db
+from src.models.table_version import TableVersion
+
+# Entradas del caché en proceso de cuerpos serializados (0 lo desactiva)
+LIST_CACHE_MAX_ENTRIES = int(os.getenv("LIST_CACHE_MAX_ENTRIES", "256"))
+# Tablas cuya versión se incrementa en cada escritura (upgrade-db crea sus contadores)
+VERSIONED_TABLES = ('tasks', 'user_stories')
+
+
+def bump_table_versions(*tables):
+    """
+    Incrementa la versión de las tablas indicadas dentro de la transacción en curso
+    (el commit lo hace el manager que escribe). Crea el contador si todavía no existe.
+    """
+    stmt = update(TableVersion).where(TableVersion.table_name.in_(tables)).values(version=TableVersion.version + 1)
+    if db.session.execute(stmt).rowcount < len(tables):
+        # Falta algún contador (upgrade-db los crea): dos primeros escritores concurrentes podrían insertarlo
+        # a la vez, así que se crea ignorando el conflicto y se repite el UPDATE. Las tablas que ya existían
+        # suben dos versiones, lo que no importa: la versión solo tiene que cambiar
+        seed_table_versions(*tables)
+        db.session.execute(stmt)
+
+
+def seed_table_versions(*tables):
+    """Crea con versión 0 los contadores que no existan (INSERT que ignora los ya creados, también en paralelo)."""
+    dialect = db.session.get_bind(mapper=TableVersion).dialect.name
+    rows = [{"table_name": t, "version": 0} for t in tables]
+    if dialect in ("sqlite", "postgresql"):
+        insert_fn = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = insert_fn(TableVersion).on_conflict_do_nothing(index_elements=[TableVersion.table_name])
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(TableVersion).on_duplicate_key_update(version=TableVersion.version)
+    else:
+        # Otros dialectos: un INSERT por contador en un SAVEPOINT, descartando el que ya exista
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(TableVersion), [row])
+            except IntegrityError:
+                pass
+        return
+    db.session.execute(stmt, rows)
+
+
+def get_table_versions(*tables):
+    """Devuelve un dict tabla -> versión (0 si la tabla nunca se ha escrito)."""
+    rows = db.session.execute(
+        select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(tables))
+    ).all()
+    versions = dict.fromkeys(tables, 0)
+    versions.update({row.table_name: row.version for row in rows})
+    return versions
+
+
+class VersionConflictError(Exception):
+    """La fila ha cambiado desde que el cliente la leyó: su versión ya no es la esperada."""
+
+    def __init__(self, current_version=None):
+        super().__init__(f"La versión actual es {current_version}")
+        self.current_version = current_version
+
+
+def versioned_update(model, row_id, expected_version, changes, columns):
+    """
+    Aplica changes con un único UPDATE ... SET <solo las columnas cambiadas>, version = version + 1
+    WHERE id = :id AND version = :expected_version, dentro de la transacción en curso.
+    Devuelve la fila actualizada con las columnas indicadas (vía RETURNING si el dialecto lo admite;
+    si no, con un SELECT posterior), None si la fila no existe o lanza VersionConflictError si otro
+    cliente la modificó antes.
+    """
+    stmt = (
+        update(model)
+        .where(model.id == row_id, model.version == expected_version)
+        .values(**changes, version=model.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.get_bind().dialect.update_returning:
+        row = db.session.execute(stmt.returning(*columns)).first()
+    else:
+        updated = db.session.execute(stmt).rowcount
+        row = db.session.execute(select(*columns).where(model.id == row_id)).first() if updated else None
+    if row is None:
+        # Sin fila actualizada: o no existe o su versión es otra (consulta solo en el caso de error)
+        current_version = db.session.scalar(select(model.version).where(model.id == row_id))
+        if current_version is not None:
+            raise VersionConflictError(current_version)
+    return row
+
+
+class BodyCache:
+    """LRU en proceso de cuerpos de respuesta ya serializados, indexado por ETag."""
+
+    def __init__(self, max_entries=LIST_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _body_cache():
+    # Un caché por aplicación, para que dos apps (p. ej. en tests) no compartan cuerpos
+    return current_app.extensions.setdefault('list_body_cache', BodyCache())
+
+
+def conditional_get(*tables, expansions=None):
+    """
+    Decorador para rutas GET de listados: calcula un ETag fuerte a partir de las versiones de las tablas
+    y de la URL con su query string. Si coincide con If-None-Match responde 304 sin ejecutar la consulta;
+    si el cuerpo ya está en el caché en proceso lo devuelve sin volver a consultar ni serializar.
+    expansions asocia cada valor de ?expand= con las tablas adicionales de las que depende la respuesta.
+    """
+    expansions = expansions or {}
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            expand = request.args.get('expand', '').split(',')
+            extra = [table for name in expand for table in expansions.get(name.strip(), ())]
+            versions = get_table_versions(*dict.fromkeys((*tables, *extra)))
+            fingerprint = f"{request.full_path}|{sorted(versions.items())}"
+            etag = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            cache = _body_cache()
+            body = cache.get(etag)
+            if body is not None:
+                response = Response(body, mimetype='application/json')
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                cache.set(etag, response.get_data())
+            response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
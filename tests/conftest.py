@@ -0,0 +1,46 @@
+import pytest
+from flask import Flask
+from src.app import TEMPLATES_DIR
+from src.db import db
+from src.entity_cache import entity_cache
+
+def fake_task(**overrides):
+    data = {"title": "Tarea", "description": "Descripción", "priority": "alta", "effort_hours": 2,
+            "status": "pendiente", "assigned_to": "Backend Team", "user_story_id": None}
+    data.update(overrides)
+    return data
+
+def fake_user_story(**overrides):
+    data = {"project": "Proyecto A", "role": "usuario", "goal": "registrarme en la plataforma", "reason": "acceder a mi cuenta",
+            "description": "Formulario de registro con email", "priority": "alta", "story_points": 5, "effort_hours": 10}
+    data.update(overrides)
+    return data
+
+@pytest.fixture
+def blueprints():
+    # Cada módulo de tests redefine este fixture con los blueprints que prueba
+    return []
+
+@pytest.fixture
+def app_config():
+    return {'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}  # Base de datos en memoria
+
+@pytest.fixture
+def app(blueprints, app_config):
+    app = Flask(__name__, template_folder=TEMPLATES_DIR)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(app_config)
+    db.init_app(app)
+    # Cada test usa una base de datos nueva: el caché de entidades no debe arrastrar ids anteriores
+    entity_cache.clear()
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
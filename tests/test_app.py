@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+from sqlalchemy import inspect
+from src.app import create_app, after_fork
+from src.db import db
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def make_app(tmp_path):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+    })
+
+def test_create_app_registers_blueprints_without_creating_schema(tmp_path):
+    app = make_app(tmp_path)
+    assert {'tasks', 'user_stories', 'jobs', 'reports', 'search'} <= set(app.blueprints)
+    assert 'metrics' in app.view_functions
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+
+def test_upgrade_db_command_creates_schema(tmp_path):
+    app = make_app(tmp_path)
+    result = app.test_cli_runner().invoke(args=['upgrade-db'])
+    assert result.exit_code == 0
+    with app.app_context():
+        assert {'tasks', 'user_stories', 'jobs'} <= set(inspect(db.engine).get_table_names())
+
+def test_after_fork_replaces_engine_pools(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        old_pool = db.engine.pool
+    after_fork(app)
+    with app.app_context():
+        assert db.engine.pool is not old_pool
+
+def test_ai_blueprint_is_optional(tmp_path):
+    assert 'ai' in make_app(tmp_path).blueprints
+    app = create_app({'TESTING': True, 'AI_ENABLED': False,
+                      'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}", 'SQLALCHEMY_ENGINE_OPTIONS': {}})
+    assert 'ai' not in app.blueprints
+    client = app.test_client()
+    assert client.post('/ai/tasks/describe', json={"title": "Login"}).status_code == 404
+    assert client.post('/user-stories', data={'prompt': 'Una historia'}).status_code == 503
+
+# Presupuesto del import de src.app (lo que tarda en arrancar un worker antes de servir); configurable en CI
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+
+def test_import_app_skips_ai_stack_within_budget():
+    # Proceso nuevo: en este ya están importados los módulos de IA por otros tests
+    code = ("import sys, src.app; "
+            "print(','.join(m for m in sys.modules if m.split('.')[0] in ('openai', 'ai', 'flask_debugtoolbar')))")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            cwd=ROOT_DIR, check=True)
+    assert result.stdout.strip() == ''
+    # Línea de -X importtime: "import time: self [us] | cumulative | module"
+    cumulative_us = next(int(line.split('|')[1]) for line in result.stderr.splitlines() if line.split('|')[-1].strip() == 'src.app')
+    assert cumulative_us / 1000 < IMPORT_TIME_BUDGET_MS
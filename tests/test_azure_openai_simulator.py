@@ -0,0 +1,74 @@
+import pytest
+import openai
+from openai import AzureOpenAI
+from ai.ia_client import reset_ai_client
+from ai.ia_resilience import classify_error, AIRateLimitedError
+from benchmarks.azure_openai_simulator import SimulatorConfig, start_simulator
+from benchmarks.bench_ai import run_load
+from src.schemas.task_schema import TaskSchemas
+from src.schemas.user_story_schema import UserStorySchema
+
+MESSAGES = [{"role": "system", "content": "Eres un experto."}, {"role": "user", "content": "Historia de registro"}]
+
+@pytest.fixture
+def simulator():
+    servers = []
+
+    def start(**config):
+        server, url = start_simulator(SimulatorConfig(**config))
+        servers.append(server)
+        return AzureOpenAI(azure_endpoint=url, api_key="simulador", api_version="2024-10-21", max_retries=0)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+def test_parse_returns_deterministic_schema_valid_responses(simulator):
+    client = simulator()
+    first = client.beta.chat.completions.parse(model="gpt-4o", messages=MESSAGES, response_format=TaskSchemas)
+    second = client.beta.chat.completions.parse(model="gpt-4o", messages=MESSAGES, response_format=TaskSchemas)
+    tasks = first.choices[0].message.parsed.TaskSchemasList
+    assert 2 <= len(tasks) <= 4
+    assert first.choices[0].message.content == second.choices[0].message.content
+    assert all(task.id is None and task.effort_hours > 0 for task in tasks)
+    story = client.beta.chat.completions.parse(model="gpt-4o", messages=MESSAGES, response_format=UserStorySchema)
+    assert 1 <= story.choices[0].message.parsed.story_points <= 8
+    assert story.usage.total_tokens > 0
+
+def test_stream_matches_plain_response(simulator):
+    client = simulator(latency="fixed", latency_ms=5)
+    plain = client.chat.completions.create(model="gpt-4o", messages=MESSAGES).choices[0].message.content
+    chunks = list(client.chat.completions.create(model="gpt-4o", messages=MESSAGES, stream=True))
+    # Primer chunk del filtro de contenido y último con el uso de tokens, ambos sin choices
+    assert not chunks[0].choices and chunks[-1].usage.total_tokens > 0
+    assert "".join(c.choices[0].delta.content or "" for c in chunks if c.choices) == plain
+
+def test_text_responses_follow_system_prompt(simulator):
+    client = simulator()
+    estimate = [{"role": "system", "content": "Devuelve únicamente un número entero o decimal representando las horas estimadas"},
+                {"role": "user", "content": "Tarea"}]
+    category = [{"role": "system", "content": "Clasifícala en una de las siguientes categorías: Backend, Frontend, Testing, Documentación, Otro."},
+                {"role": "user", "content": "Tarea"}]
+    assert float(client.chat.completions.create(model="gpt-4o", messages=estimate).choices[0].message.content) > 0
+    assert client.chat.completions.create(model="gpt-4o", messages=category).choices[0].message.content in (
+        "Backend", "Frontend", "Testing", "Documentación", "Otro")
+
+def test_rate_limited_responses_carry_retry_after(simulator):
+    client = simulator(rate_limit_rate=1.0, retry_after=2.5)
+    with pytest.raises(openai.RateLimitError) as excinfo:
+        client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+    error = classify_error(excinfo.value)
+    assert isinstance(error, AIRateLimitedError) and error.retry_after == 2.5
+
+def test_run_load_smoke(monkeypatch):
+    # run_load apunta el cliente compartido al simulador: monkeypatch restaura las variables al terminar
+    for name in ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_API_VERSION", "AZURE_OPENAI_MODEL"):
+        monkeypatch.setenv(name, "")
+    routes = {"POST /ai/tasks/describe", "POST /ai/tasks/describe/stream", "POST /user-stories/<id>/generate-tasks"}
+    try:
+        results = run_load(4, 2, SimulatorConfig(), only=routes)
+    finally:
+        reset_ai_client()
+    assert set(results) == routes
+    assert all(r["errors"] == 0 and r["p99_ms"] >= r["p50_ms"] for r in results.values())
+    assert results["POST /user-stories/<id>/generate-tasks"]["status_codes"] == {"202": 4}
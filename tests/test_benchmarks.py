@@ -0,0 +1,16 @@
+from benchmarks.bench_routes import compare, run_scale
+
+def result(p95=2.0, rps=500.0, sql=1.0):
+    return {"requests": 10, "throughput_rps": rps, "p50_ms": 1.0, "p95_ms": p95, "p99_ms": 3.0, "sql_statements_per_request": sql}
+
+def test_compare_flags_regressions_over_thresholds():
+    baseline = {"1000": {"GET /tasks": result(), "POST /tasks": result()}}
+    current = {"1000": {"GET /tasks": result(p95=2.4, rps=400.0), "POST /tasks": result(p95=3.0, rps=300.0, sql=2.0)}}
+    regressions = compare(current, baseline, latency_threshold=0.25, throughput_threshold=0.25)
+    assert len(regressions) == 3
+    assert all("POST /tasks" in r for r in regressions)
+
+def test_run_scale_smoke():
+    results = run_scale(50, 3, only={"GET /tasks", "POST /tasks", "DELETE /tasks/<id>"})
+    assert set(results) == {"GET /tasks", "POST /tasks", "DELETE /tasks/<id>"}
+    assert results["POST /tasks"]["sql_statements_per_request"] >= 1
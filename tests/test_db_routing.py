@@ -0,0 +1,78 @@
+import pytest
+from flask import Flask
+from sqlalchemy import insert
+from src.db import db, init_db, REPLICA_BIND_KEY
+from src.entity_cache import entity_cache, task_key
+from src.models.task import Task
+from src.routes.task_routes import create_tasks_blueprint
+from tests.conftest import fake_task
+
+def forget_replica_bind():
+    # db es compartido entre las apps de los tests: las demás no tienen el bind de la réplica
+    db.metadatas.pop(REPLICA_BIND_KEY, None)
+
+@pytest.fixture
+def blueprints():
+    return [create_tasks_blueprint()]
+
+@pytest.fixture
+def app_config(tmp_path):
+    # Primario y réplica en dos ficheros SQLite distintos (sin replicación entre ellos)
+    return {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+            'SQLALCHEMY_BINDS': {REPLICA_BIND_KEY: f"sqlite:///{tmp_path / 'replica.db'}"}}
+
+@pytest.fixture
+def app(app):
+    db.metadata.create_all(db.engines[REPLICA_BIND_KEY])
+    yield app
+    db.session.remove()
+    db.metadata.drop_all(db.engines[REPLICA_BIND_KEY])
+    forget_replica_bind()
+
+def test_reads_go_to_replica_and_writes_to_primary(app):
+    client = app.test_client()
+    task_id = client.post('/tasks', json=fake_task(title="Solo en el primario")).get_json()['id']
+    with db.engines[REPLICA_BIND_KEY].begin() as conn:
+        conn.execute(insert(Task), [Task.row_from_dict(fake_task(title="Solo en la réplica"))])
+
+    titles = [t['title'] for t in client.get('/tasks').get_json()['TaskSchemasList']]
+    assert titles == ["Solo en la réplica"]
+    assert client.get(f'/tasks/{task_id}').get_json()['title'] == "Solo en la réplica"
+    # Las rutas de escritura leen y escriben en el primario
+    response = client.put(f'/tasks/{task_id}', json=fake_task(title="Actualizada"))
+    assert response.get_json()['title'] == "Actualizada"
+    assert db.session.get(Task, task_id).title == "Actualizada"
+
+def test_replica_reads_do_not_fill_the_entity_cache(app):
+    client = app.test_client()
+    task_id = client.post('/tasks', json=fake_task(title="Nueva")).get_json()['id']
+    # La réplica aún no tiene la tarea: la ruta devuelve 404 y no queda nada en el caché
+    assert client.get(f'/tasks/{task_id}').status_code == 404
+    with db.engines[REPLICA_BIND_KEY].begin() as conn:
+        conn.execute(insert(Task), [Task.row_from_dict(fake_task(title="Versión antigua"))])
+    assert client.get(f'/tasks/{task_id}').get_json()['title'] == "Versión antigua"
+    assert entity_cache.get(task_key(task_id)) is None
+
+def test_init_db_configures_pool_and_replica(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'primary.db'}")
+    monkeypatch.setenv("DATABASE_REPLICA_URL", f"sqlite:///{tmp_path / 'replica.db'}")
+    app = Flask(__name__)
+    init_db(app)
+    options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    assert app.config['SQLALCHEMY_BINDS'] == {REPLICA_BIND_KEY: {"url": f"sqlite:///{tmp_path / 'replica.db'}", **options}}
+    assert options["pool_pre_ping"] is True and options["pool_recycle"] > 0
+    with app.app_context():
+        assert db.engines[REPLICA_BIND_KEY].pool.size() == options["pool_size"]
+        db.session.remove()
+    forget_replica_bind()
+
+def test_init_db_in_memory_sqlite_skips_queue_pool_options(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    monkeypatch.delenv("DATABASE_REPLICA_URL", raising=False)
+    app = Flask(__name__)
+    init_db(app)
+    assert "pool_size" not in app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    with app.app_context():
+        db.create_all()
+        assert db.session.query(Task).count() == 0
+        db.session.remove()
@@ -0,0 +1,122 @@
+import pytest
+from src.entity_cache import EntityCache, MemoryBackend, SharedBackend, entity_cache, task_key
+from src.managers.task_manager import TaskManager
+from src.managers.user_story_manager import UserStoryManager
+from src.metrics import init_metrics
+from src.routes.task_routes import create_tasks_blueprint
+from tests.conftest import fake_task
+
+
+class FakeRedis:
+    # Sustituto local de redis-py con la parte de la interfaz que usa SharedBackend
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        pass
+
+
+@pytest.fixture
+def blueprints():
+    return [create_tasks_blueprint(TaskManager())]
+
+def test_memory_backend_evicts_least_recently_used():
+    cache = EntityCache(MemoryBackend(max_entries=2, ttl=60))
+    cache.set("a", {"id": 1})
+    cache.set("b", {"id": 2})
+    cache.get("a")
+    cache.set("c", {"id": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"id": 1}
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 1
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+
+def test_shared_backend_roundtrip_and_invalidate():
+    client = FakeRedis()
+    cache = EntityCache(SharedBackend(client))
+    cache.set(task_key(1), {"id": 1, "title": "Tarea"})
+    assert cache.get(task_key(1)) == {"id": 1, "title": "Tarea"}
+    cache.invalidate(task_key(1))
+    assert cache.get(task_key(1)) is None
+    assert client.data == {"entity:gen:task:1": 1}
+
+@pytest.mark.parametrize("backend", [lambda: MemoryBackend(), lambda: SharedBackend(FakeRedis())])
+def test_fill_after_concurrent_invalidation_is_discarded(backend):
+    cache = EntityCache(backend())
+    # Un lector toma el lease y lee la fila; antes de cachearla, una escritura la invalida
+    lease = cache.lease(task_key(1))
+    cache.invalidate(task_key(1))
+    cache.set(task_key(1), {"id": 1, "title": "Anterior"}, lease=lease)
+    assert cache.get(task_key(1)) is None
+    # Un lector posterior a la invalidación sí llena el caché
+    cache.set(task_key(1), {"id": 1, "title": "Nuevo"}, lease=cache.lease(task_key(1)))
+    assert cache.get(task_key(1)) == {"id": 1, "title": "Nuevo"}
+
+def test_get_task_reads_through_and_invalidates_on_update(app):
+    tm = TaskManager()
+    task_id = tm.add_task(fake_task()).id
+    first = tm.get_task(task_id)
+    cached = tm.get_task(task_id)
+    assert cached.to_dict() == first.to_dict()
+    assert entity_cache.stats()["hits"] == 1
+
+    tm.update_task(task_id, {"title": "Nuevo título"})
+    assert tm.get_task(task_id).title == "Nuevo título"
+    tm.update_tasks([task_id], {"assigned_to": "QA"})
+    assert tm.get_task(task_id).assigned_to == "QA"
+    tm.delete_tasks([task_id])
+    assert tm.get_task(task_id) is None
+
+def test_delete_user_story_invalidates_linked_tasks(app):
+    usm = UserStoryManager()
+    tm = TaskManager()
+    user_story = usm.add_user_story({"project": "Demo", "role": "usuario", "goal": "algo", "reason": "motivo",
+                                     "description": "Historia", "priority": "media", "story_points": 3, "effort_hours": 5})
+    task_id = tm.add_task(fake_task(user_story_id=user_story.id)).id
+    assert tm.get_task(task_id).user_story_id == user_story.id
+    assert usm.get_user_story(user_story.id).project == "Demo"
+    usm.delete_user_stories([user_story.id])
+    assert usm.get_user_story(user_story.id) is None
+    assert tm.get_task(task_id).user_story_id is None
+
+def test_entity_cache_stats_route(app):
+    init_metrics(app)
+    client = app.test_client()
+    task_id = client.post('/tasks', json=fake_task()).get_json()['id']
+    client.get(f'/tasks/{task_id}')
+    response = client.get(f'/tasks/{task_id}')
+    assert response.get_json()['title'] == "Tarea"
+    stats = client.get('/cache/entities/stats').get_json()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["backend"] == "memory"
+
+class UnavailableRedis(FakeRedis):
+    def delete(self, *keys):
+        raise ConnectionError("Redis no responde")
+
+def test_committed_write_succeeds_when_invalidation_fails(client, monkeypatch):
+    task_id = client.post('/tasks', json=fake_task()).get_json()['id']
+    monkeypatch.setattr(entity_cache, "backend", SharedBackend(UnavailableRedis()))
+    response = client.put(f'/tasks/{task_id}', json=fake_task(title="Nueva"))
+    assert response.status_code == 200
+    assert client.delete(f'/tasks/{task_id}').status_code == 200
+    assert entity_cache.stats()["invalidation_errors"] == 2
@@ -0,0 +1,60 @@
+from unittest.mock import MagicMock, patch
+
+from ai import ia_client
+from ai.ia_cache import AIResponseCache, make_cache_key, ai_response_cache
+
+
+def fake_client(content="respuesta"):
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content=content))]
+    return client
+
+def test_cache_key_depends_on_all_inputs():
+    messages = [{"role": "user", "content": "hola"}]
+    key = make_cache_key("gpt-4", messages, {"temperature": 0.2})
+    assert key == make_cache_key("gpt-4", list(messages), {"temperature": 0.2})
+    assert key != make_cache_key("gpt-4", messages, {"temperature": 0.5})
+    assert key != make_cache_key("gpt-4o", messages, {"temperature": 0.2})
+
+def test_lru_eviction_and_ttl():
+    cache = AIResponseCache(max_entries=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")  # expulsa "b", la menos usada
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    expired = AIResponseCache(ttl=-1)
+    expired.set("a", "1")
+    assert expired.get("a") is None
+
+def test_persistent_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    AIResponseCache(sqlite_path=path).set("a", "1")
+    restarted = AIResponseCache(sqlite_path=path)
+    assert restarted.get("a") == "1"
+    assert restarted.stats()["persistent_hits"] == 1
+
+def test_persistent_tier_purges_expired_and_surplus_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    AIResponseCache(ttl=-1, sqlite_path=path, purge_every=1000).set("caducada", "0")
+    cache = AIResponseCache(sqlite_path=path, sqlite_max_entries=3, purge_every=5)
+    # Al arrancar se borran las filas caducadas que dejó la ejecución anterior
+    assert cache.stats()["persistent_purged"] == 1
+    for i in range(5):
+        cache.set(f"k{i}", str(i))
+    # La quinta escritura limpia el fichero: quedan las 3 más recientes
+    assert cache.stats()["persistent_purged"] == 3
+    restarted = AIResponseCache(sqlite_path=path)
+    assert [restarted.get(f"k{i}") for i in range(5)] == [None, None, "2", "3", "4"]
+
+def test_process_message_uses_cache_for_deterministic_types():
+    ai_response_cache.clear()
+    client = fake_client()
+    with patch.object(ia_client, "get_ai_client", return_value=client):
+        for _ in range(2):
+            assert ia_client.process_message_with_AI("hola", [], ia_client.ResponseType.TECHNICAL) == "respuesta"
+        ia_client.process_message_with_AI("hola", [], ia_client.ResponseType.TECHNICAL, use_cache=False)
+        ia_client.process_message_with_AI("hola", [], ia_client.ResponseType.CREATIVE)
+    assert client.chat.completions.create.call_count == 3
+    assert ai_response_cache.stats()["hits"] == 1
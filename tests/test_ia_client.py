@@ -0,0 +1,71 @@
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ai import ia_client
+from ai.ia_client import ResponseType, get_parameters
+
+
+def test_parameter_profiles_are_immutable():
+    technical = get_parameters(ResponseType.TECHNICAL)
+    assert (technical.temperature, technical.top_p) == (0.2, 0.4)
+    assert get_parameters("desconocido") == get_parameters(ResponseType.DEFAULT)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        technical.temperature = 1.0
+
+def test_shared_client_is_created_once():
+    ia_client.reset_ai_client()
+    with patch.object(ia_client, "create_ai_client", side_effect=lambda: MagicMock()) as factory:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            clients = list(pool.map(lambda _: ia_client.get_ai_client(), range(32)))
+    assert factory.call_count == 1
+    assert all(c is clients[0] for c in clients)
+    ia_client.reset_ai_client()
+
+def test_concurrent_calls_use_their_own_parameters():
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content="ok"))]
+    types = [ResponseType.TECHNICAL, ResponseType.CREATIVE] * 20
+    with patch.object(ia_client, "get_ai_client", return_value=client):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda t: ia_client.process_message_with_AI(t, [], t, use_cache=False), types))
+    for call in client.chat.completions.create.call_args_list:
+        response_type = call.kwargs["messages"][-1]["content"]
+        assert call.kwargs["temperature"] == get_parameters(response_type).temperature
+
+def fake_stream(chunks):
+    # Imita openai.Stream: iterable con close() para liberar la respuesta HTTP
+    stream = MagicMock()
+    stream.__iter__.return_value = iter(chunks)
+    return stream
+
+def test_stream_message_yields_deltas_and_caches_result():
+    from ai.ia_cache import ai_response_cache
+    ai_response_cache.clear()
+
+    def chunk(text):
+        return MagicMock(choices=[MagicMock(delta=MagicMock(content=text))])
+
+    client = MagicMock()
+    client.chat.completions.create.return_value = fake_stream([MagicMock(choices=[]), chunk("Hola"), chunk(" mundo")])
+    with patch.object(ia_client, "get_ai_client", return_value=client):
+        assert list(ia_client.stream_message_with_AI("hola", [], ResponseType.TECHNICAL)) == ["Hola", " mundo"]
+        assert list(ia_client.stream_message_with_AI("hola", [], ResponseType.TECHNICAL)) == ["Hola mundo"]
+    assert client.chat.completions.create.call_args.kwargs["stream"] is True
+    assert client.chat.completions.create.call_count == 1
+    client.chat.completions.create.return_value.close.assert_called_once()
+
+def test_client_disconnect_closes_the_upstream_stream():
+    from src.metrics import ai_request_duration
+    client = MagicMock()
+    stream = client.chat.completions.create.return_value = fake_stream(
+        [MagicMock(choices=[MagicMock(delta=MagicMock(content=text))]) for text in ("uno", "dos", "tres")])
+    before = ai_request_duration.count(response_type=ResponseType.CREATIVE, outcome="cancelled")
+    with patch.object(ia_client, "get_ai_client", return_value=client):
+        chunks = ia_client.stream_message_with_AI("hola", [], ResponseType.CREATIVE)
+        assert next(chunks) == "uno"
+        chunks.close()  # Lo que hace Flask cuando el cliente corta la conexión
+    stream.close.assert_called_once()
+    assert ai_request_duration.count(response_type=ResponseType.CREATIVE, outcome="cancelled") == before + 1
@@ -0,0 +1,63 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from ai import ia_client
+from ai.ia_rate_limit import TokenBucket, AIRateLimiter, estimate_tokens
+from ai.ia_resilience import ResilientCaller, CircuitBreaker, AIThrottledError, AIRateLimitedError
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate_per_minute=600, burst_seconds=1)  # 10 por segundo, ráfaga de 10
+    start = time.monotonic()
+    for _ in range(10):
+        assert bucket.acquire() == 0.0
+    bucket.acquire(5)
+    assert time.monotonic() - start >= 0.45
+
+def test_rate_limiter_unlimited_by_default():
+    limiter = AIRateLimiter(requests_per_minute=0, tokens_per_minute=0)
+    assert limiter.acquire(10_000) == 0.0
+    assert limiter.stats()["calls"] == 1
+
+def test_quota_is_split_between_worker_processes():
+    # 4 workers con 600 RPM y 240000 TPM: 150 peticiones y 60000 tokens por minuto cada uno
+    limiter = AIRateLimiter(requests_per_minute=600, tokens_per_minute=240_000, processes=4)
+    assert limiter.requests.rate == pytest.approx(150 / 60)
+    assert limiter.tokens.rate == pytest.approx(60_000 / 60)
+
+def test_estimate_tokens_includes_max_tokens():
+    messages = [{"role": "user", "content": "x" * 400}]
+    assert estimate_tokens(messages, 100) == 200
+
+def test_acquire_fails_fast_when_the_wait_would_exceed_the_deadline():
+    bucket = TokenBucket(rate_per_minute=60, burst_seconds=1)  # 1 por segundo, ráfaga de 1
+    bucket.acquire()
+    start = time.monotonic()
+    with pytest.raises(AIThrottledError) as excinfo:
+        bucket.acquire(timeout=0.2)
+    assert time.monotonic() - start < 0.1 and excinfo.value.retry_after > 0.2
+    assert bucket.acquire(timeout=2) <= 1.0
+
+def test_limiter_refunds_the_request_when_tokens_time_out():
+    limiter = AIRateLimiter(requests_per_minute=60, tokens_per_minute=60)
+    limiter.tokens.acquire(10)  # Agota la ráfaga de tokens
+    with pytest.raises(AIThrottledError):
+        limiter.acquire(10, timeout=0.1)
+    assert limiter.requests.tokens >= 1.0
+
+def test_throttled_calls_are_bounded_by_the_operation_deadline(monkeypatch):
+    limiter = AIRateLimiter(requests_per_minute=60)
+    limiter.requests.tokens = 0  # Cuota agotada: la siguiente llamada tendría que esperar ~1 s
+    monkeypatch.setattr(ia_client, "ai_rate_limiter", limiter)
+    ai = MagicMock()
+    monkeypatch.setattr(ia_client, "get_ai_client", lambda: ai)
+    caller = ResilientCaller(breaker=CircuitBreaker(), max_retries=3)
+    monkeypatch.setattr(ia_client, "ai_caller", caller)
+    start = time.monotonic()
+    with pytest.raises(AIRateLimitedError):
+        ia_client.process_message_with_AI("hola", [], use_cache=False, deadline=0.3)
+    assert time.monotonic() - start < 0.3
+    ai.chat.completions.create.assert_not_called()
+    assert caller.breaker.stats()["state"] == "closed"
@@ -0,0 +1,134 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import openai
+import pytest
+from flask import Flask
+
+from ai import ia_client
+from ai.ia_client import ResponseType
+from ai.ia_resilience import (ResilientCaller, CircuitBreaker, classify_error, retry_delay, ai_caller,
+                              AITimeoutError, AIRateLimitedError, AIRequestError, AIUpstreamError, AICircuitOpenError)
+from src.routes.ai_routes import create_ai_blueprint
+
+
+def rate_limit_error(headers):
+    request = httpx.Request("POST", "https://azure.example/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("Too Many Requests", response=response, body=None)
+
+def status_error(status):
+    request = httpx.Request("POST", "https://azure.example/chat/completions")
+    return openai.APIStatusError("Error", response=httpx.Response(status, request=request), body=None)
+
+def test_classify_openai_errors():
+    assert isinstance(classify_error(openai.APITimeoutError(request=httpx.Request("POST", "https://azure.example"))), AITimeoutError)
+    assert classify_error(rate_limit_error({"retry-after-ms": "1500"})).retry_after == 1.5
+    assert classify_error(rate_limit_error({"retry-after": "7"})).retry_after == 7.0
+    assert isinstance(classify_error(status_error(503)), AIUpstreamError)
+    error = classify_error(status_error(400))
+    assert isinstance(error, AIRequestError) and not error.retryable
+
+def test_retry_delay_is_jittered_capped_and_honours_retry_after():
+    delays = [retry_delay(3, base=1.0, cap=5.0) for _ in range(200)]
+    assert all(0 <= d <= 5.0 for d in delays) and len(set(delays)) > 100
+    assert retry_delay(0, retry_after=4.0, base=1.0) >= 4.0
+
+def test_retries_transient_errors_then_succeeds():
+    sleeps = []
+    caller = ResilientCaller(breaker=CircuitBreaker(), max_retries=3, sleep=sleeps.append)
+    attempts = MagicMock(side_effect=[rate_limit_error({"retry-after": "2"}), status_error(502), "ok"])
+    assert caller.call(attempts) == "ok"
+    assert attempts.call_count == 3
+    assert sleeps[0] >= 2.0 and len(sleeps) == 2
+
+def test_non_retryable_and_exhausted_errors_are_raised_typed():
+    caller = ResilientCaller(breaker=CircuitBreaker(), max_retries=2, sleep=lambda _: None)
+    bad_request = MagicMock(side_effect=status_error(400))
+    with pytest.raises(AIRequestError):
+        caller.call(bad_request)
+    assert bad_request.call_count == 1
+    throttled = MagicMock(side_effect=rate_limit_error({}))
+    with pytest.raises(AIRateLimitedError):
+        caller.call(throttled)
+    assert throttled.call_count == 3
+
+def test_deadline_bounds_each_attempt_and_the_whole_operation():
+    caller = ResilientCaller(breaker=CircuitBreaker(), max_retries=5, attempt_timeout=10, sleep=lambda _: None)
+    timeouts = []
+
+    def attempt(timeout):
+        timeouts.append(timeout)
+        raise TimeoutError("sin respuesta")
+    with pytest.raises(AITimeoutError):
+        caller.call(attempt, deadline=0.5)
+    # El plazo de cada intento nunca supera lo que queda de la operación
+    assert timeouts[0] <= 0.5
+
+def test_circuit_opens_fails_fast_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    caller = ResilientCaller(breaker=breaker, max_retries=0)
+    failing = MagicMock(side_effect=status_error(500))
+    for _ in range(2):
+        with pytest.raises(AIUpstreamError):
+            caller.call(failing)
+    with pytest.raises(AICircuitOpenError) as excinfo:
+        caller.call(failing)
+    assert failing.call_count == 2 and excinfo.value.retry_after <= 0.2
+    time.sleep(0.25)
+    # Semiabierto: una llamada de prueba correcta cierra el circuito
+    assert caller.call(lambda timeout: "ok") == "ok"
+    assert breaker.stats()["state"] == "closed"
+
+@pytest.mark.parametrize("probe_error", [status_error(400), rate_limit_error({})])
+def test_probe_with_non_availability_error_does_not_leave_circuit_half_open(probe_error):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    caller = ResilientCaller(breaker=breaker, max_retries=0)
+    with pytest.raises(AIUpstreamError):
+        caller.call(MagicMock(side_effect=status_error(500)))
+    time.sleep(0.1)
+    # La llamada de prueba recibe un 4xx/429: Azure responde, así que el circuito se cierra
+    with pytest.raises((AIRequestError, AIRateLimitedError)):
+        caller.call(MagicMock(side_effect=probe_error))
+    assert breaker.stats()["state"] == "closed"
+    assert [caller.call(lambda timeout: "ok") for _ in range(3)] == ["ok"] * 3
+
+def test_probe_that_is_never_attempted_releases_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    caller = ResilientCaller(breaker=breaker, max_retries=0)
+    with pytest.raises(AIUpstreamError):
+        caller.call(MagicMock(side_effect=status_error(500)))
+    time.sleep(0.1)
+    # El plazo se agota tras admitir la llamada de prueba y antes de intentarla
+    with pytest.raises(AITimeoutError):
+        caller.call(lambda timeout: "ok", deadline=1e-9)
+    assert breaker.stats()["state"] == "open"
+    assert caller.call(lambda timeout: "ok") == "ok"
+
+def test_hedged_request_wins_over_slow_primary():
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            time.sleep(0.5)  # La primera petición se queda en la cola larga
+            return "lenta"
+        return "rápida"
+    caller = ResilientCaller(breaker=CircuitBreaker(), hedge_after=0.05, attempt_timeout=5)
+    started = time.perf_counter()
+    assert caller.call(attempt) == "rápida"
+    assert time.perf_counter() - started < 0.4
+    assert len(calls) == 2
+
+def test_ai_routes_map_typed_errors_to_status_codes():
+    app = Flask(__name__)
+    app.register_blueprint(create_ai_blueprint())
+    client = app.test_client()
+    ai = MagicMock()
+    ai.chat.completions.create.side_effect = rate_limit_error({"retry-after": "3"})
+    with patch.object(ia_client, "get_ai_client", return_value=ai), patch.object(ai_caller, "max_retries", 0):
+        response = client.post('/ai/tasks/describe', json={"title": "Login"}, headers={'Cache-Control': 'no-cache'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
+    assert client.get('/ai/circuit/stats').get_json()['state'] == 'closed'
@@ -0,0 +1,149 @@
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ai import ia_client
+from ai.ia_client import ResponseType
+from ai.ia_resilience import AITimeoutError
+from ai.ia_singleflight import SingleFlight, cross_process_lock_dir
+from src.metrics import ai_deduplicated
+
+
+def run_concurrently(fn, count):
+    # Lanza count llamadas a la vez (barrera) y devuelve sus resultados
+    barrier = threading.Barrier(count)
+
+    def task(_):
+        barrier.wait()
+        return fn()
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(task, range(count)))
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "respuesta"
+    results = run_concurrently(lambda: flight.do("clave", slow), 6)
+    assert len(calls) == 1
+    assert sorted(shared or "" for _, shared in results) == [""] + ["process"] * 5
+    assert all(result == "respuesta" for result, _ in results)
+    assert flight.stats()["deduplicated"] == 5 and flight.stats()["in_flight"] == 0
+    # Terminada la llamada, la siguiente con la misma clave vuelve a ejecutar
+    assert flight.do("clave", lambda: "nueva") == ("nueva", None)
+
+def test_followers_receive_the_leader_error():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError("Azure no disponible")
+
+    def call():
+        with pytest.raises(RuntimeError, match="Azure no disponible"):
+            flight.do("clave", failing)
+    run_concurrently(call, 3)
+    assert flight.stats()["leaders"] == 1
+
+def test_followers_give_up_after_their_timeout():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def stuck():
+        started.set()
+        release.wait()
+        return "tarde"
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, "clave", stuck)
+        started.wait()
+        t0 = time.perf_counter()
+        with pytest.raises(AITimeoutError):
+            flight.do("clave", MagicMock(), timeout=0.1)
+        assert time.perf_counter() - t0 < 1
+        release.set()
+        # El líder no se ve afectado por el seguidor que dejó de esperar
+        assert leader.result() == ("tarde", None)
+    assert flight.stats()["follower_timeouts"] == 1 and flight.stats()["deduplicated"] == 0
+
+def test_file_lock_shares_result_across_processes(tmp_path):
+    # Dos instancias con el mismo directorio de bloqueos hacen de dos workers
+    first, second = SingleFlight(lock_dir=str(tmp_path)), SingleFlight(lock_dir=str(tmp_path))
+    shared_cache = {}
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.3)
+        shared_cache["clave"] = "respuesta"
+        return "respuesta"
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(first.do, "clave", slow, lambda: shared_cache.get("clave"))
+        started.wait()
+        upstream = MagicMock()
+        assert second.do("clave", upstream, lambda: shared_cache.get("clave")) == ("respuesta", "cross_process")
+        assert leader.result() == ("respuesta", None)
+    upstream.assert_not_called()
+    assert second.stats()["cross_process_deduplicated"] == 1
+    # Los ficheros de bloqueo se borran al terminar: el directorio no crece con cada clave distinta
+    assert list(tmp_path.iterdir()) == []
+
+def test_waiter_relocks_when_the_lock_file_is_replaced(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path))
+    path = tmp_path / (hashlib.sha256(b"clave").hexdigest() + ".lock")
+    holder = open(path, "a")
+    fcntl.flock(holder, fcntl.LOCK_EX)  # Otro worker es el líder
+
+    def leader_call():
+        # Esta llamada debe tener el bloqueo del fichero actual, no del que borró el líder anterior
+        probe = open(path, "a")
+        with pytest.raises(BlockingIOError):
+            fcntl.flock(probe, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        probe.close()
+        return "respuesta"
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        result = pool.submit(flight.do, "clave", leader_call, lambda: None)
+        time.sleep(0.1)
+        os.unlink(path)  # El líder anterior termina: borra el fichero y suelta el bloqueo
+        fcntl.flock(holder, fcntl.LOCK_UN)
+        holder.close()
+        assert result.result() == ("respuesta", None)
+    assert list(tmp_path.iterdir()) == []
+
+def test_identical_ai_calls_are_coalesced():
+    client = MagicMock()
+
+    def create(**kwargs):
+        time.sleep(0.2)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content="tareas"))])
+    client.chat.completions.create.side_effect = create
+    before = ai_deduplicated.value(response_type=ResponseType.CREATIVE, scope="process")
+    with patch.object(ia_client, "get_ai_client", return_value=client):
+        results = run_concurrently(lambda: ia_client.process_message_with_AI("genera tareas", [], ResponseType.CREATIVE), 4)
+    assert results == ["tareas"] * 4
+    assert client.chat.completions.create.call_count == 1
+    assert ai_deduplicated.value(response_type=ResponseType.CREATIVE, scope="process") == before + 3
+
+def test_cross_process_lock_requires_the_shared_cache_tier(tmp_path, caplog):
+    assert cross_process_lock_dir(str(tmp_path), shared_cache="/data/ai-cache.db") == str(tmp_path)
+    # Sin nivel SQLite los demás workers no pueden leer el resultado: el bloqueo solo los pondría en fila
+    assert cross_process_lock_dir(str(tmp_path), shared_cache=None) is None
+    assert "AI_CACHE_SQLITE_PATH" in caplog.text
+
+def test_memory_only_cache_skips_the_file_lock(tmp_path):
+    client = MagicMock()
+    client.chat.completions.create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="análisis"))])
+    flight = SingleFlight(lock_dir=str(tmp_path))
+    with patch.object(ia_client, "get_ai_client", return_value=client), \
+            patch.object(ia_client, "ai_single_flight", flight), \
+            patch.object(flight, "_open_file_lock") as file_lock:
+        assert ia_client.process_message_with_AI("analiza sin caché compartida", [], ResponseType.ANALYTICS) == "análisis"
+    file_lock.assert_not_called()
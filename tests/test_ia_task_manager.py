@@ -0,0 +1,99 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from ai import ia_task_manager
+
+
+def fake_ai(message, context, response_type=None, schema=None, use_cache=None):
+    # Simula la latencia de la IA y devuelve una respuesta según la etapa
+    time.sleep(0.1)
+    prompt = context[0]["content"]
+    if "clasificarla" in prompt:
+        return "Backend"
+    if "estimar el esfuerzo" in prompt:
+        return "5"
+    if "plan de mitigación" in prompt:
+        return "Plan"
+    if "riesgos" in prompt:
+        return "Riesgos"
+    return "Descripción generada"
+
+def test_enrich_task_runs_independent_stages_concurrently():
+    active = []
+    lock = threading.Lock()
+    peak = [0]
+
+    def tracking_ai(*args, **kwargs):
+        with lock:
+            active.append(1)
+            peak[0] = max(peak[0], len(active))
+        try:
+            return fake_ai(*args, **kwargs)
+        finally:
+            with lock:
+                active.pop()
+
+    with patch.object(ia_task_manager, "process_message_with_AI", side_effect=tracking_ai):
+        result = ia_task_manager.enrich_task({"title": "Login", "priority": "alta"})
+    task = result["task"]
+    assert task["description"] == "Descripción generada"
+    assert task["category"] == "Backend"
+    assert task["effort_hours"] == 5.0
+    assert task["risk_mitigation"] == "Plan"
+    assert set(result["timings_ms"]) == set(ia_task_manager.ENRICH_STAGES)
+    # estimate y risk_analysis se solapan
+    assert peak[0] == 2
+
+def test_enrich_task_skips_stages_already_filled():
+    with patch.object(ia_task_manager, "process_message_with_AI", side_effect=fake_ai) as ai:
+        result = ia_task_manager.enrich_task({"title": "Login", "description": "Formulario", "priority": "alta", "category": "Frontend"})
+    assert result["timings_ms"]["describe"] is None
+    assert result["task"]["category"] == "Frontend"
+    assert ai.call_count == 3
+
+def test_enrich_task_checks_every_required_field_before_calling_ai():
+    with patch.object(ia_task_manager, "process_message_with_AI", side_effect=fake_ai) as ai:
+        # Sin priority la auditoría fallaría después de describir y categorizar
+        with pytest.raises(ValueError, match="priority"):
+            ia_task_manager.enrich_task({"title": "Login"})
+        with pytest.raises(ValueError, match="title"):
+            ia_task_manager.enrich_task({"priority": "alta"})
+    ai.assert_not_called()
+    # Con la auditoría ya hecha priority no hace falta
+    with patch.object(ia_task_manager, "process_message_with_AI", side_effect=fake_ai):
+        result = ia_task_manager.enrich_task({"title": "Login", "risk_analysis": "R", "risk_mitigation": "M"})
+    assert result["task"]["effort_hours"] == 5.0
+
+def test_enrich_task_failure_waits_for_running_stages_and_skips_the_rest():
+    calls, completed = [], []
+
+    def failing_estimate(message, context, **kwargs):
+        prompt = context[0]["content"]
+        calls.append(prompt)
+        if "estimar el esfuerzo" in prompt:
+            raise RuntimeError("Azure no disponible")
+        result = fake_ai(message, context)
+        if "riesgos" in prompt:
+            time.sleep(0.3)  # risk_analysis sigue en curso cuando falla estimate
+            completed.append(prompt)
+        return result
+    with patch.object(ia_task_manager, "process_message_with_AI", side_effect=failing_estimate):
+        with pytest.raises(RuntimeError, match="Azure no disponible"):
+            ia_task_manager.enrich_task({"title": "Login", "priority": "alta"})
+        # risk_analysis terminó antes de propagar el error
+        assert len(completed) == 1
+        time.sleep(0.2)
+    # y risk_mitigation no llegó a lanzarse
+    assert not any("plan de mitigación" in prompt for prompt in calls)
+
+def test_run_batch_keeps_order_and_reports_errors():
+    tasks = [{"title": "A", "description": "a"}, {}, {"title": "C", "description": "c"}]
+    with patch.object(ia_task_manager, "process_message_with_AI", side_effect=fake_ai):
+        results = ia_task_manager.run_batch("categorize", tasks)
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["result"]["category"] == "Backend"
+    assert "error" in results[1]
+    assert results[2]["result"]["title"] == "C"
@@ -0,0 +1,99 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from src.app import recover_jobs
+from src.models.job import Job
+from src.models.enums import JobStatusEnum
+from src.routes.job_routes import create_jobs_blueprint
+from src.managers import job_manager as job_manager_module
+from src.managers.job_manager import JobManager, JOB_STALE_TIMEOUT, STALE_JOB_ERROR
+
+from src.db import db  # Importa la instancia de SQLAlchemy
+
+
+def failing_handler(**payload):
+    raise ValueError("Respuesta IA inválida")
+
+@pytest.fixture
+def job_manager():
+    return JobManager(handlers={"echo": lambda **payload: payload, "fail": failing_handler})
+
+@pytest.fixture
+def blueprints(job_manager):
+    return [create_jobs_blueprint(job_manager)]
+
+def wait_for(client, job_id):
+    for _ in range(100):
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in ('completado', 'error'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("El trabajo no terminó a tiempo")
+
+def test_job_runs_in_background(client, job_manager):
+    job = job_manager.submit_job("echo", {"user_story_id": 3})
+    assert job.to_dict()['status'] == 'pendiente'
+    finished = wait_for(client, job.id)
+    assert finished['status'] == 'completado'
+    assert finished['result'] == {"user_story_id": 3}
+
+def test_failed_job_stores_error(client, job_manager):
+    job = job_manager.submit_job("fail", {})
+    finished = wait_for(client, job.id)
+    assert finished['status'] == 'error'
+    assert 'Respuesta IA inválida' in finished['error']
+
+def test_unknown_job(client, job_manager):
+    assert client.get('/jobs/no-existe').status_code == 404
+    with pytest.raises(ValueError):
+        job_manager.submit_job("desconocido", {})
+
+def add_job(status, age_seconds, job_id, heartbeat_age=None):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    heartbeat_at = None if heartbeat_age is None else now - timedelta(seconds=heartbeat_age)
+    db.session.add(Job(id=job_id, kind="echo", status=status, payload="{}",
+                       created_at=now - timedelta(seconds=age_seconds), heartbeat_at=heartbeat_at))
+    db.session.commit()
+
+def test_stale_job_is_reported_as_error(client):
+    # Trabajo que quedó en progreso cuando murió su worker
+    add_job(JobStatusEnum.en_progreso, JOB_STALE_TIMEOUT + 60, "huerfano")
+    job = client.get('/jobs/huerfano').get_json()
+    assert job['status'] == 'error' and job['error'] == STALE_JOB_ERROR
+
+def test_recover_stale_jobs_on_startup_keeps_recent_and_finished_jobs(app, job_manager):
+    add_job(JobStatusEnum.pendiente, JOB_STALE_TIMEOUT + 60, "viejo")
+    add_job(JobStatusEnum.en_progreso, 5, "reciente")
+    add_job(JobStatusEnum.completado, JOB_STALE_TIMEOUT + 60, "terminado")
+    assert recover_jobs(app) == 1
+    assert job_manager.get_job("viejo").status == JobStatusEnum.error
+    assert job_manager.get_job("reciente").status == JobStatusEnum.en_progreso
+    assert job_manager.get_job("terminado").status == JobStatusEnum.completado
+    # Un trabajo ya dado por perdido no se ejecuta si llega a salir de la cola
+    job_manager._run_job(app, "viejo")
+    assert job_manager.get_job("viejo").error == STALE_JOB_ERROR
+
+def test_job_with_recent_heartbeat_is_not_stale(client):
+    # Lleva más de JOB_STALE_TIMEOUT en marcha, pero su proceso sigue vivo y renueva el latido
+    add_job(JobStatusEnum.en_progreso, JOB_STALE_TIMEOUT + 60, "largo", heartbeat_age=5)
+    assert client.get('/jobs/largo').get_json()['status'] == 'en progreso'
+    add_job(JobStatusEnum.en_progreso, JOB_STALE_TIMEOUT + 60, "sin-latido", heartbeat_age=JOB_STALE_TIMEOUT + 30)
+    assert client.get('/jobs/sin-latido').get_json()['status'] == 'error'
+
+def test_heartbeat_keeps_queued_jobs_alive(app, job_manager, monkeypatch):
+    # Trabajo que espera en la cola de este proceso detrás de un pool ocupado
+    add_job(JobStatusEnum.pendiente, JOB_STALE_TIMEOUT + 60, "en-cola", heartbeat_age=JOB_STALE_TIMEOUT + 30)
+    monkeypatch.setitem(job_manager_module._live_jobs, "en-cola", app)
+    job_manager_module.send_heartbeats()
+    assert job_manager.recover_stale_jobs() == 0
+    assert job_manager.get_job("en-cola").status == JobStatusEnum.pendiente
+
+def test_job_recovered_while_running_keeps_error(app):
+    # El trabajo se da por perdido mientras se ejecuta: su resultado no sobrescribe el error
+    manager = JobManager(handlers={"echo": lambda **payload: manager.recover_stale_jobs(older_than=-60)})
+    add_job(JobStatusEnum.pendiente, 0, "solapado")
+    manager._run_job(app, "solapado")
+    job = manager.get_job("solapado")
+    assert job.status == JobStatusEnum.error and job.error == STALE_JOB_ERROR
+    assert job.result is None and job.started_at is not None
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ai import ia_client
+from ai.ia_client import ResponseType
+from ai.ia_resilience import ai_caller, AITimeoutError
+from src.metrics import Histogram, init_metrics, ai_errors, ai_tokens, ai_request_duration, http_request_duration, db_queries_per_request
+from src.routes.task_routes import create_tasks_blueprint
+
+@pytest.fixture
+def blueprints():
+    return [create_tasks_blueprint()]
+
+@pytest.fixture
+def app(app):
+    init_metrics(app)
+    return app
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo", ("endpoint",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, endpoint="a")
+    histogram.observe(0.5, endpoint="a")
+    histogram.observe(3, endpoint="a")
+    lines = histogram.samples()
+    assert 'demo_seconds_bucket{endpoint="a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{endpoint="a",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{endpoint="a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{endpoint="a"} 3' in lines
+
+def test_requests_and_queries_are_recorded(client):
+    before = http_request_duration.count(endpoint="tasks.get_tasks", method="GET", status="200")
+    queries_before = db_queries_per_request.count(endpoint="tasks.get_tasks")
+    assert client.get('/tasks').status_code == 200
+    assert client.get('/tasks/999').status_code == 404
+    assert http_request_duration.count(endpoint="tasks.get_tasks", method="GET", status="200") == before + 1
+    assert db_queries_per_request.count(endpoint="tasks.get_tasks") == queries_before + 1
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_request_duration_seconds_count{endpoint="tasks.get_task",method="GET",status="404"}' in body
+    assert 'db_query_duration_seconds_count{operation="SELECT"}' in body
+
+def test_ai_calls_record_latency_tokens_and_errors():
+    ai_client = MagicMock()
+    response = ai_client.chat.completions.create.return_value
+    response.choices = [MagicMock(message=MagicMock(content="ok"))]
+    response.usage = SimpleNamespace(prompt_tokens=12, completion_tokens=30)
+    prompt_before = ai_tokens.value(response_type=ResponseType.CREATIVE, kind="prompt")
+    with patch.object(ia_client, "get_ai_client", return_value=ai_client), patch.object(ai_caller, "max_retries", 0):
+        ia_client.process_message_with_AI("hola", [], ResponseType.CREATIVE, use_cache=False)
+        ai_client.chat.completions.create.side_effect = TimeoutError("sin respuesta")
+        errors_before = ai_errors.value(response_type=ResponseType.CREATIVE, error="TimeoutError")
+        with pytest.raises(AITimeoutError, match="Error al procesar"):
+            ia_client.process_message_with_AI("hola", [], ResponseType.CREATIVE, use_cache=False)
+    ai_caller.breaker.reset()
+    assert ai_tokens.value(response_type=ResponseType.CREATIVE, kind="prompt") == prompt_before + 12
+    assert ai_errors.value(response_type=ResponseType.CREATIVE, error="TimeoutError") == errors_before + 1
+    assert ai_request_duration.count(response_type=ResponseType.CREATIVE, outcome="error") >= 1
@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+from src.db import db
+from src.managers.report_manager import ReportManager
+from src.managers.task_manager import TaskManager
+from src.managers.user_story_manager import UserStoryManager
+from src.routes.report_routes import create_reports_blueprint
+from src.summaries import report_summary
+from tests.conftest import fake_task, fake_user_story
+
+@pytest.fixture
+def blueprints():
+    return [create_reports_blueprint()]
+
+@pytest.fixture
+def app_config(tmp_path):
+    # Fichero SQLite: los hilos de los tests concurrentes abren sus propias conexiones a la misma base de datos
+    return {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'reports.db'}"}
+
+@pytest.fixture
+def summary_enabled():
+    report_summary.enabled = True
+    yield
+    report_summary.enabled = False
+
+def populate():
+    usm, tm = UserStoryManager(), TaskManager()
+    a = usm.add_user_story(fake_user_story()).id
+    b, = usm.add_user_stories([fake_user_story(project="Proyecto B", priority="baja", story_points=3, effort_hours=6)])
+    tm.add_tasks([
+        fake_task(user_story_id=a, effort_hours=3),
+        fake_task(user_story_id=a, status="completada", effort_hours=5),
+        fake_task(user_story_id=b, assigned_to="QA", effort_hours=1.5),
+    ])
+    task_id = tm.add_task(fake_task(effort_hours=4)).id
+    return usm, tm, a, b, task_id
+
+def sorted_groups(groups, key):
+    return sorted(groups, key=lambda g: g[key] or '')
+
+def test_task_report_group_by(app):
+    populate()
+    client = app.test_client()
+    body = client.get('/reports/tasks?group_by=project').get_json()
+    assert sorted_groups(body['groups'], 'project') == [
+        {"project": None, "task_count": 1, "effort_hours": 4.0},
+        {"project": "Proyecto A", "task_count": 2, "effort_hours": 8.0},
+        {"project": "Proyecto B", "task_count": 1, "effort_hours": 1.5},
+    ]
+    by_status = client.get('/reports/tasks?group_by=status&project=Proyecto A').get_json()['groups']
+    assert sorted_groups(by_status, 'status') == [
+        {"status": "completada", "task_count": 1, "effort_hours": 5.0},
+        {"status": "pendiente", "task_count": 1, "effort_hours": 3.0},
+    ]
+    stories = client.get('/reports/user_stories?group_by=priority').get_json()['groups']
+    assert sorted_groups(stories, 'priority') == [
+        {"priority": "alta", "story_count": 1, "story_points": 5, "effort_hours": 10.0},
+        {"priority": "baja", "story_count": 1, "story_points": 3, "effort_hours": 6.0},
+    ]
+
+def test_report_invalid_group_by(app):
+    client = app.test_client()
+    assert client.get('/reports/tasks?group_by=title').status_code == 400
+    assert client.get('/reports/user_stories?group_by=status').status_code == 400
+
+def test_summary_table_tracks_manager_writes(app, summary_enabled):
+    usm, tm, a, b, task_id = populate()
+    tm.update_task(task_id, {"status": "en progreso", "effort_hours": 6})
+    tm.update_tasks([task_id], {"assigned_to": "QA"})
+    usm.update_user_story(b, {"project": "Proyecto C"})
+    usm.delete_user_story(a)
+    tm.delete_task(task_id)
+
+    rm = ReportManager()
+    from_summary = {dim: sorted_groups(rm.task_totals(dim), dim) for dim in ('project', 'status', 'priority', 'assigned_to')}
+    stories_from_summary = {dim: sorted_groups(rm.user_story_totals(dim), dim) for dim in ('project', 'priority')}
+    report_summary.enabled = False
+    assert from_summary == {dim: sorted_groups(rm.task_totals(dim), dim) for dim in from_summary}
+    assert stories_from_summary == {dim: sorted_groups(rm.user_story_totals(dim), dim) for dim in stories_from_summary}
+    assert from_summary['project'] == [{"project": None, "task_count": 2, "effort_hours": 8.0},
+                                       {"project": "Proyecto C", "task_count": 1, "effort_hours": 1.5}]
+
+def test_rebuild_summary_matches_group_by(app, summary_enabled):
+    report_summary.enabled = False
+    populate()
+    report_summary.enabled = True
+    rm = ReportManager()
+    assert rm.task_totals('status') == []
+    assert rm.rebuild_summary() > 0
+    from_summary = sorted_groups(rm.task_totals('assigned_to'), 'assigned_to')
+    report_summary.enabled = False
+    assert from_summary == sorted_groups(rm.task_totals('assigned_to'), 'assigned_to')
+
+def test_concurrent_first_writers_of_a_group_share_one_summary_row(app, summary_enabled):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    barrier = threading.Barrier(6)
+
+    def add(i):
+        with app.app_context():
+            barrier.wait()
+            # Todas crean el grupo assigned_to="Equipo nuevo" a la vez
+            TaskManager().add_task(fake_task(assigned_to="Equipo nuevo", effort_hours=i + 1))
+    try:
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            list(pool.map(add, range(6)))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    # Sin UPDATE previo que pueda no encontrar el grupo: un único upsert aditivo por escritura
+    summary_writes = [s for s in statements if 'report_summaries' in s]
+    assert len(summary_writes) == 6 and all('ON CONFLICT' in s for s in summary_writes)
+    rm = ReportManager()
+    assert rm.task_totals('assigned_to') == [{"assigned_to": "Equipo nuevo", "task_count": 6, "effort_hours": 21.0}]
+    report_summary.enabled = False
+    assert rm.task_totals('assigned_to') == [{"assigned_to": "Equipo nuevo", "task_count": 6, "effort_hours": 21.0}]
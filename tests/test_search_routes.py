@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import text
+from src.db import db
+from src.managers.task_manager import TaskManager
+from src.managers.user_story_manager import UserStoryManager
+from src.routes.search_routes import create_search_blueprint
+from tests.conftest import fake_task, fake_user_story
+
+@pytest.fixture
+def blueprints():
+    return [create_search_blueprint()]
+
+def test_search_ranks_and_filters(client):
+    story_id = UserStoryManager().add_user_story(fake_user_story()).id
+    tm = TaskManager()
+    tm.add_tasks([
+        fake_task(title="Endpoint de registro", description="Validar el email del registro", user_story_id=story_id),
+        fake_task(title="Pantalla de login", description="Formulario de acceso", status="completada"),
+    ])
+    tm.add_task(fake_task(title="Documentar API", description="Incluye el registro"))
+
+    results = client.get('/search?q=registro').get_json()['results']
+    assert [(r['type'], r['id']) for r in results][0] == ('task', 1)
+    assert {(r['type'], r['id']) for r in results} == {('task', 1), ('task', 3), ('user_story', story_id)}
+
+    tasks_only = client.get('/search?q=registro&status=pendiente&project=Proyecto A').get_json()['results']
+    assert [r['id'] for r in tasks_only] == [1]
+    stories = client.get('/search?q=registro&type=user_story').get_json()['results']
+    assert [r['goal'] for r in stories] == ["registrarme en la plataforma"]
+
+def test_search_pagination(client):
+    TaskManager().add_tasks([fake_task(title=f"Informe {i}") for i in range(5)])
+    first = client.get('/search?q=informe&limit=2').get_json()
+    assert len(first['results']) == 2 and first['next_offset'] == 2
+    last = client.get('/search?q=informe&limit=2&offset=4').get_json()
+    assert len(last['results']) == 1 and last['next_offset'] is None
+
+def test_search_index_follows_manager_writes(client):
+    tm = TaskManager()
+    task_id = tm.add_task(fake_task(title="Migrar base de datos")).id
+    assert client.get('/search?q=migrar').get_json()['results']
+    tm.update_task(task_id, {"title": "Optimizar consultas"})
+    assert client.get('/search?q=migrar').get_json()['results'] == []
+    assert client.get('/search?q=consultas').get_json()['results'][0]['id'] == task_id
+    tm.update_tasks([task_id], {"description": "Añadir índices compuestos"})
+    assert client.get('/search?q=compuestos').get_json()['results'][0]['id'] == task_id
+    tm.delete_tasks([task_id])
+    assert client.get('/search?q=consultas').get_json()['results'] == []
+
+def test_search_invalid_params(client):
+    assert client.get('/search?q=').status_code == 400
+    assert client.get('/search?q=%22%2A').status_code == 400
+    assert client.get('/search?q=algo&type=proyecto').status_code == 400
+    assert client.get('/search?q=algo&status=inexistente').status_code == 400
+    assert client.get('/search?q=algo&offset=-1').status_code == 400
+
+def test_upgrade_schema_builds_missing_search_index(app):
+    from src.migrations import upgrade_schema
+    TaskManager().add_task(fake_task(title="Tarea previa al índice"))
+    # Simula una base de datos creada antes de la búsqueda
+    db.session.execute(text("DROP TABLE tasks_fts"))
+    db.session.commit()
+    assert 'tasks_fts' in upgrade_schema()
+    response = app.test_client().get('/search?q=previa')
+    assert response.get_json()['results'][0]['title'] == "Tarea previa al índice"
@@ -0,0 +1,230 @@
+import pytest
+from src.routes.task_routes import create_tasks_blueprint
+from src.routes.ai_routes import create_ai_blueprint
+from src.managers.task_manager import TaskManager
+from src.models.user_story import UserStory
+from src.models.enums import PriorityEnum
+
+from src.db import db  # Importa la instancia de SQLAlchemy
+from tests.conftest import fake_task
+
+@pytest.fixture
+def blueprints():
+    return [create_tasks_blueprint(TaskManager()), create_ai_blueprint()]
+
+@pytest.fixture
+def user_story(app):
+    us = UserStory(project="Proyecto Demo", role="Como usuario", goal="registrarme", reason="acceder",
+                   description="Registro", priority=PriorityEnum.alta, story_points=3, effort_hours=8)
+    db.session.add(us)
+    db.session.commit()
+    return us
+
+def test_create_task(client):
+    response = client.post('/tasks', json=fake_task())
+    assert response.status_code == 201
+    assert response.get_json()['id'] is not None
+
+def test_get_tasks_paginated(client):
+    for i in range(5):
+        client.post('/tasks', json=fake_task(title=f"Tarea {i}"))
+    first = client.get('/tasks?limit=2').get_json()
+    assert [t['title'] for t in first['TaskSchemasList']] == ["Tarea 0", "Tarea 1"]
+    assert first['next_cursor']
+    second = client.get(f"/tasks?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [t['title'] for t in second['TaskSchemasList']] == ["Tarea 2", "Tarea 3"]
+    last = client.get(f"/tasks?limit=2&cursor={second['next_cursor']}").get_json()
+    assert [t['title'] for t in last['TaskSchemasList']] == ["Tarea 4"]
+    assert last['next_cursor'] is None
+
+def test_get_tasks_filtered(client, user_story):
+    client.post('/tasks', json=fake_task(status="completada"))
+    client.post('/tasks', json=fake_task(assigned_to="QA Team", user_story_id=user_story.id))
+    response = client.get('/tasks?status=pendiente&assigned_to=QA%20Team')
+    assert len(response.get_json()['TaskSchemasList']) == 1
+    response = client.get('/tasks?project=Proyecto%20Demo')
+    assert [t['user_story_id'] for t in response.get_json()['TaskSchemasList']] == [user_story.id]
+
+def test_get_tasks_invalid_params(client):
+    assert client.get('/tasks?status=desconocido').status_code == 400
+    assert client.get('/tasks?cursor=no-valido').status_code == 400
+    assert client.get('/tasks?limit=100000').status_code == 400
+
+def test_upgrade_schema_creates_missing_indexes(app):
+    from sqlalchemy import inspect
+    from src.migrations import upgrade_schema
+    from src.models.task import Task
+    # Simula un despliegue anterior a los índices
+    for index in Task.__table__.indexes:
+        index.drop(db.engine)
+    created = upgrade_schema()
+    assert set(created) == {ix.name for ix in Task.__table__.indexes}
+    names = {ix['name'] for ix in inspect(db.engine).get_indexes('tasks')}
+    assert 'ix_tasks_user_story_id_status' in names
+    assert upgrade_schema() == []
+    # upgrade-db deja creados los contadores de versión de las tablas
+    from src.versioning import get_table_versions
+    assert get_table_versions('tasks', 'user_stories') == {'tasks': 0, 'user_stories': 0}
+
+def test_export_tasks_ndjson(client):
+    import json
+    for i in range(3):
+        client.post('/tasks', json=fake_task(title=f"Tarea {i}"))
+    response = client.get('/tasks/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [t['title'] for t in lines] == ["Tarea 0", "Tarea 1", "Tarea 2"]
+
+def test_export_tasks_csv(client):
+    client.post('/tasks', json=fake_task(status="completada"))
+    client.post('/tasks', json=fake_task())
+    response = client.get('/tasks/export?format=csv&status=completada')
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0].startswith('id,title,description')
+    assert len(lines) == 2
+    assert 'completada' in lines[1]
+    assert client.get('/tasks/export?format=xml').status_code == 400
+
+def test_bulk_create_update_delete_tasks(client):
+    response = client.post('/tasks/bulk', json=[fake_task(title=f"Tarea {i}") for i in range(3)])
+    assert response.status_code == 201
+    ids = response.get_json()['ids']
+    assert len(ids) == 3
+
+    response = client.patch('/tasks/bulk', json={"ids": ids[:2], "changes": {"status": "completada"}})
+    assert response.get_json() == {"updated": 2}
+    statuses = [t['status'] for t in client.get('/tasks').get_json()['TaskSchemasList']]
+    assert statuses == ["completada", "completada", "pendiente"]
+
+    response = client.delete('/tasks/bulk', json={"ids": ids[1:]})
+    assert response.get_json() == {"deleted": 2}
+    assert len(client.get('/tasks').get_json()['TaskSchemasList']) == 1
+
+def test_bulk_create_is_one_insert_with_ids_in_input_order(client, monkeypatch):
+    from sqlalchemy import event
+    from src import db as db_module
+    # Dos tareas idénticas y lotes de 4 filas: 10 tareas son 3 INSERT multi-VALUES
+    monkeypatch.setattr(db_module, "DB_INSERT_BATCH_SIZE", 4)
+    payload = [fake_task(title=f"Tarea {i}", effort_hours=i + 0.1) for i in range(9)] + [fake_task(title="Tarea 0", effort_hours=0.1)]
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    response = client.post('/tasks/bulk', json=payload)
+    event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 201
+    assert len([s for s in statements if s.startswith('INSERT INTO tasks ')]) == 3
+    ids = response.get_json()['ids']
+    assert len(set(ids)) == 10
+    titles = {t['id']: t['title'] for t in client.get('/tasks?limit=20').get_json()['TaskSchemasList']}
+    assert [titles[i] for i in ids] == [t['title'] for t in payload]
+
+def test_bulk_invalid_payloads(client):
+    assert client.post('/tasks/bulk', json=[fake_task(priority="urgente")]).status_code == 422
+    assert client.patch('/tasks/bulk', json={"ids": [1], "changes": {"title": None}}).status_code == 422
+    assert client.patch('/tasks/bulk', json={"ids": [1], "changes": {"id": 5}}).status_code == 422
+    assert client.delete('/tasks/bulk', json={"ids": "1"}).status_code == 400
+
+def test_describe_stream_sends_deltas_and_final_task(client):
+    from unittest.mock import patch
+    with patch('ai.ia_task_manager.stream_message_with_AI', return_value=iter(["Implementar ", "el login"])):
+        response = client.post('/ai/tasks/describe/stream', json={"title": "Login"})
+        body = response.get_data(as_text=True)
+    assert response.mimetype == 'text/event-stream'
+    assert body.count('event: delta') == 2
+    assert 'event: done\ndata: {"title": "Login", "description": "Implementar el login"}' in body
+    assert client.post('/ai/tasks/describe/stream', json={"priority": "alta"}).status_code == 400
+
+def test_enrich_rejects_missing_fields_before_calling_ai(client):
+    from unittest.mock import patch
+    with patch('ai.ia_task_manager.process_message_with_AI') as ai:
+        response = client.post('/ai/tasks/enrich', json={"title": "Login"})
+    assert response.status_code == 400
+    assert "priority" in response.get_json()['error']
+    ai.assert_not_called()
+
+def test_task_rows_serialize_like_to_dict(client):
+    from src.models.task import Task
+    from src.serializers import tasks_to_dicts
+    client.post('/tasks', json=fake_task(status="en progreso"))
+    task = Task.query.first()
+    rows, _ = TaskManager().get_tasks_page()
+    assert tasks_to_dicts(rows) == [task.to_dict()]
+
+def test_get_tasks_conditional_etag(client):
+    client.post('/tasks', json=fake_task())
+    first = client.get('/tasks')
+    etag = first.headers['ETag']
+    assert client.get('/tasks', headers={'If-None-Match': etag}).status_code == 304
+    # Otra query string produce otro ETag
+    assert client.get('/tasks?limit=1').headers['ETag'] != etag
+    # Cualquier escritura a través del manager invalida el ETag
+    client.post('/tasks', json=fake_task(title="Otra"))
+    second = client.get('/tasks', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert len(second.get_json()['TaskSchemasList']) == 2
+
+def test_table_version_counter_creation_tolerates_concurrent_writers(app, monkeypatch):
+    from sqlalchemy import insert
+    from src import versioning
+    from src.models.table_version import TableVersion
+    seed = versioning.seed_table_versions
+
+    def seed_after_concurrent_writer(*tables):
+        # Otro primer escritor crea el contador entre nuestro UPDATE (sin filas) y nuestro INSERT
+        db.session.execute(insert(TableVersion), [{"table_name": "tasks", "version": 5}])
+        seed(*tables)
+    monkeypatch.setattr(versioning, "seed_table_versions", seed_after_concurrent_writer)
+    versioning.bump_table_versions('tasks')
+    db.session.commit()
+    assert versioning.get_table_versions('tasks') == {'tasks': 6}
+
+def test_patch_task_single_versioned_update(client):
+    from sqlalchemy import event
+    task = client.post('/tasks', json=fake_task()).get_json()
+    assert task['version'] == 1
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    response = client.patch(f"/tasks/{task['id']}", json={"status": "completada", "version": 1})
+    event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200
+    assert response.get_json()['status'] == "completada" and response.get_json()['version'] == 2
+    # Sin SELECT previo: un único UPDATE de tasks con solo la columna enviada (RETURNING en SQLite)
+    task_updates = [s for s in statements if s.startswith('UPDATE tasks')]
+    assert len(task_updates) == 1 and 'RETURNING' in task_updates[0]
+    assert 'title' not in task_updates[0].split('WHERE')[0]
+    assert not any(s.startswith('SELECT') and 'FROM tasks' in s for s in statements)
+    assert client.get(f"/tasks/{task['id']}").get_json()['status'] == "completada"
+
+def test_patch_task_stale_version_conflict(client):
+    task_id = client.post('/tasks', json=fake_task()).get_json()['id']
+    assert client.patch(f'/tasks/{task_id}', json={"title": "Primera", "version": 1}).status_code == 200
+    response = client.patch(f'/tasks/{task_id}', json={"title": "Segunda", "version": 1})
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 2
+    assert client.get(f'/tasks/{task_id}').get_json()['title'] == "Primera"
+    # PUT y los cambios masivos también avanzan la versión
+    client.put(f'/tasks/{task_id}', json=fake_task(title="PUT"))
+    client.patch('/tasks/bulk', json={"ids": [task_id], "changes": {"status": "completada"}})
+    assert client.patch(f'/tasks/{task_id}', json={"title": "Tercera", "version": 2}).status_code == 409
+    assert client.patch(f'/tasks/{task_id}', json={"title": "Tercera", "version": 4}).get_json()['version'] == 5
+
+def test_patch_task_invalid_requests(client):
+    task_id = client.post('/tasks', json=fake_task()).get_json()['id']
+    assert client.patch(f'/tasks/{task_id}', json={"title": "Sin versión"}).status_code == 422
+    assert client.patch(f'/tasks/{task_id}', json={"version": 1}).status_code == 400
+    assert client.patch(f'/tasks/{task_id}', json={"title": None, "version": 1}).status_code == 422
+    assert client.patch('/tasks/999', json={"title": "No existe", "version": 1}).status_code == 404
+
+def test_upgrade_schema_adds_version_column(app):
+    from sqlalchemy import inspect, text
+    from src.migrations import upgrade_schema
+    client = app.test_client()
+    client.post('/tasks', json=fake_task())
+    # Simula una tabla anterior a la columna version
+    db.session.execute(text("ALTER TABLE tasks DROP COLUMN version"))
+    db.session.commit()
+    assert upgrade_schema() == ['tasks.version']
+    assert 'version' in {c['name'] for c in inspect(db.engine).get_columns('tasks')}
+    assert db.session.execute(text("SELECT version FROM tasks")).scalar() == 1
@@ -0,0 +1,76 @@
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from src.db import db
+from src.routes.task_routes import create_tasks_blueprint
+from src.routes.user_story_routes import create_user_stories_blueprint
+from src.routes.job_routes import create_jobs_blueprint
+from src.managers.job_manager import JobManager
+from tests.conftest import fake_task, fake_user_story
+
+@pytest.fixture
+def blueprints():
+    return [create_tasks_blueprint(), create_user_stories_blueprint(job_manager=JobManager()), create_jobs_blueprint()]
+
+@contextmanager
+def count_statements():
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+def create_stories(client, count, tasks_per_story=2):
+    ids = []
+    for i in range(count):
+        us_id = client.post('/user_stories', json=fake_user_story(goal=f"Objetivo {i}")).get_json()['id']
+        for j in range(tasks_per_story):
+            client.post('/tasks', json=fake_task(user_story_id=us_id, title=f"Tarea {i}.{j}", effort_hours=j + 1.5))
+        ids.append(us_id)
+    return ids
+
+def test_expand_tasks_in_list_uses_constant_number_of_queries(client):
+    create_stories(client, 1)
+    with count_statements() as few:
+        client.get('/user_stories?expand=tasks&limit=2')
+    create_stories(client, 9, tasks_per_story=3)
+    with count_statements() as many:
+        response = client.get('/user_stories?expand=tasks&limit=10')
+    # Versiones de las tablas (ETag) + historias + tareas de toda la página, sin una consulta por historia
+    assert len(few) == len(many) == 3
+    stories = response.get_json()['UserStorySchemasList']
+    assert [us['task_count'] for us in stories] == [2] + [3] * 9
+    assert stories[0]['task_effort_hours'] == 4.0
+    assert [t['title'] for t in stories[0]['tasks']] == ["Tarea 0.0", "Tarea 0.1"]
+    assert 'tasks' not in client.get('/user_stories').get_json()['UserStorySchemasList'][0]
+
+def test_expand_tasks_single_user_story(client):
+    us_id = create_stories(client, 1, tasks_per_story=3)[0]
+    with count_statements() as statements:
+        response = client.get(f'/user_stories/{us_id}?expand=tasks')
+    assert len(statements) == 2
+    body = response.get_json()
+    assert body['task_count'] == 3 and body['task_effort_hours'] == 7.5
+    assert client.get('/user_stories/999?expand=tasks').status_code == 404
+    assert client.get(f'/user_stories/{us_id}?expand=jobs').status_code == 400
+
+def test_expand_tasks_etag_depends_on_tasks(client):
+    us_id = create_stories(client, 1)[0]
+    plain_etag = client.get('/user_stories').headers['ETag']
+    expanded_etag = client.get('/user_stories?expand=tasks').headers['ETag']
+    client.post('/tasks', json=fake_task(user_story_id=us_id, title="Nueva"))
+    # Una tarea nueva cambia el listado expandido pero no el simple
+    assert client.get('/user_stories', headers={'If-None-Match': plain_etag}).status_code == 304
+    response = client.get('/user_stories?expand=tasks', headers={'If-None-Match': expanded_etag})
+    assert response.status_code == 200
+    assert response.get_json()['UserStorySchemasList'][0]['task_count'] == 3
+
+def test_user_stories_html_expand_tasks(client):
+    create_stories(client, 3)
+    with count_statements() as statements:
+        response = client.get('/user-stories?expand=tasks')
+    assert len(statements) == 2
+    html = response.get_data(as_text=True)
+    assert "Tarea 2.1" in html and "2 (4.0 horas)" in html
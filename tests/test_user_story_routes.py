@@ -1,7 +1,10 @@
 import pytest
 from flask import Flask
 from src.routes.user_story_routes import create_user_stories_blueprint
+from src.routes.job_routes import create_jobs_blueprint
 from src.managers.user_story_manager import UserStoryManager
+from src.managers.job_manager import JobManager
+from src.versioning import VersionConflictError
 from unittest.mock import MagicMock
 from datetime import datetime, timezone
 
@@ -17,7 +20,8 @@ fake_data_get = {
         "priority": "alta",
         "story_points": 5,
         "effort_hours": 8,
-        "created_at": datetime.now(timezone.utc)  # Campo obligatorio
+        "created_at": datetime.now(timezone.utc),  # Campo obligatorio
+        "version": 1
     }
 
 fake_data_post = {
@@ -45,10 +49,22 @@ def app():
     mock_user_story = MagicMock()
     mock_user_story.to_dict.return_value = fake_data_get
     user_story_manager.get_all_user_stories.return_value = [fake_data_get]
+    user_story_manager.get_user_stories_page.return_value = ([fake_data_get], None)
     user_story_manager.get_user_story.return_value = fake_data_get
     user_story_manager.add_user_story.return_value = fake_data_post
     user_story_manager.update_user_story.return_value = fake_data_get
-    app.register_blueprint(create_user_stories_blueprint(user_story_manager))
+
+    # Simula la concurrencia optimista: solo la versión 1 es la actual
+    def patch_user_story(user_story_id, changes, version):
+        if version != 1:
+            raise VersionConflictError(1)
+        return {**fake_data_get, **changes, "version": 2}
+    user_story_manager.patch_user_story.side_effect = patch_user_story
+    job_manager = MagicMock(spec=JobManager)
+    job_manager.submit_job.return_value.id = "job-1"
+    job_manager.submit_job.return_value.to_dict.return_value = {"id": "job-1", "status": "pendiente"}
+    app.register_blueprint(create_user_stories_blueprint(user_story_manager, job_manager))
+    app.register_blueprint(create_jobs_blueprint(job_manager))
     return app
 
 @pytest.fixture
@@ -65,6 +81,10 @@ def test_get_user_stories(client):
     response = client.get('/user_stories')
     assert response.status_code == 200
 
+def test_get_user_stories_invalid_limit(client):
+    response = client.get('/user_stories?limit=0')
+    assert response.status_code == 400
+
 def test_get_user_story(client):
     response = client.get('/user_stories/1')
     assert response.status_code in [200, 404]
@@ -74,6 +94,15 @@ def test_update_user_story(client):
     response = client.put('/user_stories/1', json=data)
     assert response.status_code in [200, 404]
 
+def test_patch_user_story(client):
+    response = client.patch('/user_stories/1', json={"story_points": 8, "version": 1})
+    assert response.status_code == 200
+    assert response.get_json()['story_points'] == 8 and response.get_json()['version'] == 2
+    response = client.patch('/user_stories/1', json={"story_points": 8, "version": 3})
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 1
+    assert client.patch('/user_stories/1', json={"story_points": 9, "version": 1}).status_code == 422
+
 def test_delete_user_story(client):
     response = client.delete('/user_stories/1')
     assert response.status_code in [200, 404]
@@ -81,4 +110,10 @@ def test_delete_user_story(client):
 def test_generate_user_story_from_prompt(client):
     data = {"prompt": "Como usuario quiero registrarme para acceder a funcionalidades exclusivas."}
     response = client.post('/user-stories', data=data)
-    assert response.status_code in [200, 400]
+    assert response.status_code == 202
+    assert response.headers['Location'].endswith('/jobs/job-1')
+
+def test_generate_tasks_for_user_story_returns_job(client):
+    response = client.post('/user-stories/1/generate-tasks')
+    assert response.status_code == 202
+    assert response.get_json()['id'] == "job-1"